@@ -1,17 +1,43 @@
+import os
 import traceback
 import json
-import re
 import time
+import asyncio
+import contextvars
 import concurrent.futures
-from typing import Optional
+from typing import AsyncIterator, Optional
 
-from langchain_ollama import OllamaLLM
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from langchain_ollama import ChatOllama
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from tools.registry import TOOLS
+from tools.cache import normalize_input, cache_bypassed, is_error_output
+from tools.cancel import CancelScope, cancel_scope
+from tools.circuit import breakers
+from tracing import span, current_trace
+from singleflight import SingleFlight
+from router import route_call
+from json_stream import JsonStream
 
-# Local LLM
-llm = OllamaLLM(model="gemma3:latest", base_url="http://localhost")
+# Local LLM. OLLAMA_BASE_URL / OLLAMA_MODEL override endpoint and model
+# (the pinned langchain-ollama client reads the endpoint from OLLAMA_HOST).
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "gemma3:latest")
+# Keep the model (and its cached context) loaded between rounds and requests
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Context window in tokens (0 = model default); the whole run's history must fit
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "0"))
+# JSON mode: Ollama constrains every reply to one JSON object (tool call, parallel
+# tool calls or final answer); generation is stopped as soon as it is complete.
+AGENT_JSON_MODE = os.getenv("AGENT_JSON_MODE", "on") == "on"
+
+# Chat model: each round resends the same message history plus the new turns,
+# so Ollama can reuse its cached prefix instead of re-reading everything.
+llm = ChatOllama(
+    model=OLLAMA_MODEL,
+    base_url=OLLAMA_BASE_URL,
+    keep_alive=OLLAMA_KEEP_ALIVE,
+    num_ctx=OLLAMA_NUM_CTX or None,
+)
 
 # -------------------------------
 # REACT-LIKE PROMPT
@@ -28,10 +54,27 @@ RULES:
 - Think step-by-step.
 - If a tool is needed, output ONLY a JSON dict:
   {{"tool": "<toolname>", "input": "<text>"}}
+- If several independent lookups are needed, output ONLY a JSON list of such dicts
+  (they run in parallel and all results come back together):
+  [{{"tool": "<toolname>", "input": "<text>"}}, {{"tool": "<toolname>", "input": "<text>"}}]
 - Otherwise respond normally with your final answer.
 """
 
-HUMAN = "{input}"
+SYSTEM_JSON = """
+You are an intelligent assistant that can use tools when needed.
+
+You have access to the following tools:
+{tool_list}
+
+RULES:
+- Think step-by-step, but reply with ONLY one JSON object and nothing else.
+- If a tool is needed:
+  {{"tool": "<toolname>", "input": "<text>"}}
+- If several independent lookups are needed (they run in parallel and all results come back together):
+  {{"tool_calls": [{{"tool": "<toolname>", "input": "<text>"}}, {{"tool": "<toolname>", "input": "<text>"}}]}}
+- Otherwise give your final answer:
+  {{"answer": "<your final answer>"}}
+"""
 
 # Convert tool registry to readable text
 def format_tool_list(tools):
@@ -40,27 +83,18 @@ def format_tool_list(tools):
         lines.append(f"- {t.name}: {t.description}")
     return "\n".join(lines)
 
-prompt = ChatPromptTemplate.from_messages([
-    ("system", SYSTEM),
-    ("human", HUMAN),
-])
-
-parser = StrOutputParser()
-
-chain = prompt | llm | parser
+# Static for the life of the process: built once, identical bytes every round
+SYSTEM_PROMPT = (SYSTEM_JSON if AGENT_JSON_MODE else SYSTEM).format(tool_list=format_tool_list(TOOLS))
 
 
 # -------------------------------
 # NEW JSON EXTRACTION FIX
 # -------------------------------
 def extract_json(s: str):
-    match = re.search(r"\{.*\}", s, re.DOTALL)
-    if not match:
-        return None
-    try:
-        return json.loads(match.group())
-    except:
-        return None
+    """Parse the first complete JSON object or list in a finished completion (tool call or list of tool calls)."""
+    parser = JsonStream()
+    parser.feed(s)
+    return parser.value
 
 
 # ------------------------------------------------------------
@@ -70,23 +104,436 @@ def extract_json(s: str):
 TOOL_CALL_TIMEOUT = 100         # seconds per tool call (prevent slow/blocking tools)
 AGENT_TOTAL_TIMEOUT = 1000     # seconds total budget for the whole agent run
 MAX_SAME_TOOL_CALLS = 3       # abort if the same tool is requested > this many times
+MAX_PARALLEL_TOOL_CALLS = 4   # tool calls honoured from a single LLM step
+TOOL_EXECUTOR_WORKERS = 8     # threads shared by all tool calls in this process
+
+# Per-tool timeout overrides (seconds); others use TOOL_CALL_TIMEOUT
+TOOL_TIMEOUTS = {
+    "agnikul_rag_search": 60,
+    "bibtex": 30,
+}
+
+# Hedged calls: if a tool is slower than TOOL_HEDGE_AFTER seconds (or failing, or
+# its circuit is open), its equivalent is started too and the first good result wins
+TOOL_HEDGING = os.getenv("TOOL_HEDGING", "on") == "on"
+TOOL_HEDGE_AFTER = float(os.getenv("TOOL_HEDGE_AFTER", "5"))
+TOOL_HEDGES = {
+    "wikipedia_search": "duckduckgo_search",
+}
+
+# One bounded executor shared by every run in this process
+_tool_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=TOOL_EXECUTOR_WORKERS, thread_name_prefix="agent-tool"
+)
+
+# Identical tool calls in flight at the same time (same tool, normalized input,
+# cache mode) share one execution, across all runs in this process
+_tool_flights = SingleFlight("tool")
+
+
+_ROLES = {"user": HumanMessage, "assistant": AIMessage}
+
+
+def _new_conversation(question: str, context: Optional[dict] = None) -> list:
+    """
+    Message history for one run: static system prompt, then (in a session) the
+    summary of older turns and the recent turns verbatim, then the question.
+    """
+    messages = [SystemMessage(content=SYSTEM_PROMPT)]
+    if context:
+        if context.get("summary"):
+            messages.append(SystemMessage(content=f"Earlier in this conversation (summary):\n{context['summary']}"))
+        messages += [_ROLES[m["role"]](content=m["content"]) for m in context.get("history", [])]
+    messages.append(HumanMessage(content=question))
+    return messages
+
+
+def _session_tools(context: Optional[dict]) -> dict:
+    """Tool results from a session's earlier turns, by (tool, normalized input)."""
+    return {(tool, normalize_input(tool_input)): output for tool, tool_input, output in (context or {}).get("tools", [])}
+
+
+def _finish_turn(turn: Optional[dict], messages: list, first: int, ai_msg: str, answer: str, outcomes: list):
+    """Fill in `turn` for the session: this run's messages (from the question on), the answer, new tool results."""
+    if turn is None:
+        return
+    turn["messages"] = [{"role": "assistant" if isinstance(m, AIMessage) else "user", "content": m.content}
+                        for m in messages[first:]] + [{"role": "assistant", "content": ai_msg}]
+    turn["answer"] = answer
+    turn["tools"] = [[o["tool"], o["input"], o["output"]] for o in outcomes if o["status"] == "ok"]
+
+
+def _append_round(messages: list, ai_msg: str, tool_results: str):
+    """Append only this round's new turns: the model's tool call and the tool results."""
+    messages.append(AIMessage(content=ai_msg))
+    messages.append(HumanMessage(content=f"Tool result:\n{tool_results}"))
+
+
+def _parse_tool_calls(parsed) -> list:
+    """Normalize a parsed completion to a list of {"tool", "input"} dicts (empty = final answer)."""
+    if isinstance(parsed, dict) and isinstance(parsed.get("tool_calls"), list):
+        parsed = parsed["tool_calls"]
+    if isinstance(parsed, dict):
+        parsed = [parsed]
+    if not isinstance(parsed, list):
+        return []
+    calls = [c for c in parsed if isinstance(c, dict) and "tool" in c]
+    return calls[:MAX_PARALLEL_TOOL_CALLS]
+
+
+def _final_answer(parsed, ai_msg: str) -> str:
+    """The answer text: the "answer" field of a JSON-mode reply, else the completion itself."""
+    if isinstance(parsed, dict) and "answer" in parsed and not _parse_tool_calls(parsed):
+        return str(parsed["answer"])
+    return ai_msg
+
+
+def _is_complete_step(parsed) -> bool:
+    """Whether a complete JSON value ends the step (so generation can stop there)."""
+    return AGENT_JSON_MODE or bool(_parse_tool_calls(parsed))
+
+
+def _stream_kwargs() -> dict:
+    return {"format": "json"} if AGENT_JSON_MODE else {}
+
+
+def _tool_timeout(tool_name: str) -> float:
+    return TOOL_TIMEOUTS.get(tool_name, TOOL_CALL_TIMEOUT)
+
+
+def _check_tool_calls(calls: list, tool_call_counts: dict) -> Optional[str]:
+    """Count requested tools; return an abort message if one is requested too often."""
+    for call in calls:
+        tool_name = call["tool"]
+        tool_call_counts[tool_name] = tool_call_counts.get(tool_name, 0) + 1
+        if tool_call_counts[tool_name] > MAX_SAME_TOOL_CALLS:
+            return (f"Agent aborted: tool '{tool_name}' requested more than "
+                    f"{MAX_SAME_TOOL_CALLS} times. Possible loop or malformed tool usage.")
+    return None
+
+
+def _tool_outcome(call: dict, status: str, output: str) -> dict:
+    return {"tool": call["tool"], "input": call.get("input", ""), "status": status, "output": output}
+
+
+def _timed_call(scope: CancelScope, func, tool_input: str, timing: dict):
+    """Run a tool, noting when it actually started/finished (it may sit in the executor queue first)."""
+    timing["start"] = time.time()
+    try:
+        with cancel_scope(scope):
+            scope.check()   # given up on while still queued
+            return func(tool_input)
+    finally:
+        timing["end"] = time.time()
+
+
+def _submit_tool(tool, tool_input: str, deadline: float):
+    """
+    Start the tool on the shared executor, or join the identical call already running.
+    Returns (future, flight key, joined); the execution's timing dict is future.timing
+    and its CancelScope (deadline + cancel flag, see tools/cancel.py) future.scope.
+    """
+    key = (tool.name, normalize_input(tool_input), cache_bypassed())
+    # copy_context: per-request settings (e.g. cache bypass, trace) follow the call
+    ctx = contextvars.copy_context()
+
+    def start():
+        timing = {"submitted": time.time()}
+        scope = CancelScope(deadline)
+        future = _tool_executor.submit(ctx.run, _timed_call, scope, tool.func, tool_input, timing)
+        future.timing, future.scope = timing, scope
+        return future
+
+    future, joined = _tool_flights.submit(key, start)
+    return future, key, joined
+
+
+def _abandon_tool(key, future):
+    """This caller gave up on the call: cancel it unless another caller still waits for it."""
+    if _tool_flights.release(key, future):
+        future.cancel()
+        future.scope.cancel()   # already running: stops at its next wait/attempt
+
+
+def _trace_tool(tool_name: str, status: str, timing: dict, joined: bool = False, hedge: bool = False):
+    """Record a tool span; timed-out calls are charged up to the moment we gave up on them."""
+    start = timing.get("start") or timing.get("submitted") or time.time()
+    end = timing.get("end") or time.time()
+    trace = current_trace()
+    if trace is not None:
+        attrs = {"coalesced": True} if joined else {}
+        if hedge:
+            attrs["hedge"] = True
+        trace.add("tool", max(0.0, end - start), start=start, tool=tool_name, status=status, **attrs)
+
+
+def _find_tool(name: str):
+    return next((t for t in TOOLS if t.name == name), None)
+
+
+class _Attempt:
+    """One execution for a tool call: the requested tool, or its hedge."""
+
+    __slots__ = ("tool", "future", "key", "joined", "hedge")
+
+    def __init__(self, tool, future, key, joined: bool, hedge: bool):
+        self.tool, self.future, self.key, self.joined, self.hedge = tool, future, key, joined, hedge
+
+
+def _launch(tool, tool_input: str, deadline: float, hedge: bool = False) -> Optional[_Attempt]:
+    """Start `tool` unless its circuit breaker is open."""
+    if not breakers.get(tool.name).allow():
+        print(f" Tool '{tool.name}' skipped: circuit open (retry in {breakers.get(tool.name).retry_in():.0f}s).")
+        now = time.time()
+        _trace_tool(tool.name, "circuit_open", {"start": now, "end": now}, hedge=hedge)
+        return None
+    print(f" Executing tool: {tool.name}" + (" (hedge)" if hedge else ""))
+    future, key, joined = _submit_tool(tool, tool_input, deadline)
+    return _Attempt(tool, future, key, joined, hedge)
+
+
+def _report(attempt: _Attempt, outcome: Optional[str]):
+    """
+    Tell the tool's circuit breaker how an execution went ("success"/"failure"; None
+    = neither). Only the caller that started the execution reports it, so one failed
+    upstream call counts once however many coalesced callers waited on it; joiners
+    just free a half-open trial their allow() may have taken.
+    """
+    breaker = breakers.get(attempt.tool.name)
+    if attempt.joined or outcome is None:
+        breaker.release()
+    elif outcome == "failure":
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def _settle(attempt: _Attempt):
+    """(status, output, failed) of a finished attempt; reported to its circuit breaker and the trace."""
+    try:
+        result = attempt.future.result()
+        status, output, failed = "ok", str(result), is_error_output(result)
+    except Exception as e:
+        # Tool raised an exception: show stacktrace to LLM but continue
+        print(f" Tool '{attempt.tool.name}' raised an exception: {e}")
+        status, output, failed = "error", f"Tool error: {e}\n{traceback.format_exc()}", True
+    _report(attempt, "failure" if failed else "success")
+    _trace_tool(attempt.tool.name, status, attempt.future.timing, attempt.joined, attempt.hedge)
+    return status, output, failed
+
+
+def _give_up(attempt: _Attempt, status: str):
+    """Stop waiting for an attempt (timeout, or the other attempt won) and cancel it."""
+    _abandon_tool(attempt.key, attempt.future)
+    _report(attempt, "failure" if status == "timeout" else None)
+    _trace_tool(attempt.tool.name, status, attempt.future.timing, attempt.joined, attempt.hedge)
 
-def run_agent(question: str) -> str:
+
+def _tool_call_steps(call: dict, reuse: Optional[dict] = None):
+    """
+    One tool call as a generator: yields (futures, wake_at) to wait for and is
+    sent back the finished futures; returns the outcome dict. Driven by
+    _run_tool_calls (blocking) and _arun_tool_call (event loop).
+
+    An open circuit fails the call fast. A tool listed in TOOL_HEDGES gets its
+    equivalent started as well after TOOL_HEDGE_AFTER seconds (at once if it
+    fails or its circuit is open); the first good result wins and the other
+    attempt is cancelled. At the deadline, whatever still runs is cancelled.
+    A call already answered earlier in the session (`reuse`) is not run again.
+    Closed before it returns (the caller was cancelled), it cancels whatever
+    still runs and frees the attempts' circuit breaker trials.
+    """
+    tool_name = call["tool"]
+    tool_input = call.get("input", "")
+    if reuse and (tool_name, normalize_input(tool_input)) in reuse:
+        print(f" Tool '{tool_name}' answered from earlier in the session.")
+        now = time.time()
+        _trace_tool(tool_name, "session", {"start": now, "end": now})
+        return {**_tool_outcome(call, "ok", reuse[(tool_name, normalize_input(tool_input))]), "reused": True}
+    tool = _find_tool(tool_name)
+    if not tool:
+        return _tool_outcome(call, "error", f"ERROR: Unknown tool '{tool_name}'")
+    timeout = _tool_timeout(tool_name)
+    deadline = time.time() + timeout
+    hedge = _find_tool(TOOL_HEDGES.get(tool_name, "")) if TOOL_HEDGING else None
+    hedge_at = time.time() + TOOL_HEDGE_AFTER if hedge else None
+
+    running = []
+    try:
+        failure = ("error", f"Tool '{tool_name}' is failing repeatedly and was skipped (circuit open).")
+        first = _launch(tool, tool_input, deadline)
+        if first:
+            running.append(first)
+        elif hedge_at is not None:
+            hedge_at = time.time()
+
+        while running or hedge_at is not None:
+            if hedge_at is not None and (time.time() >= hedge_at or not running):
+                hedge_at = None
+                attempt = _launch(hedge, tool_input, deadline, hedge=True)
+                if attempt:
+                    running.append(attempt)
+                continue
+            if time.time() >= deadline:
+                break
+            done = yield [a.future for a in running], deadline if hedge_at is None else min(deadline, hedge_at)
+            for attempt in [a for a in running if a.future in done]:
+                running.remove(attempt)
+                status, output, failed = _settle(attempt)
+                if not failed:
+                    for other in running:
+                        _give_up(other, "cancelled")
+                    if attempt.hedge:
+                        output = f"(answered by {attempt.tool.name}: {tool_name} was too slow or failing)\n{output}"
+                    return _tool_outcome(call, status, output)
+                failure = (status, output)
+                if hedge_at is not None:
+                    hedge_at = time.time()   # failed before the hedge started: fall back now
+
+        if running:
+            for attempt in running:
+                _give_up(attempt, "timeout")
+            print(f" Tool '{tool_name}' timed out after {timeout}s.")
+            return _tool_outcome(call, "timeout", f"Tool '{tool_name}' exceeded {timeout}s and was aborted.")
+        return _tool_outcome(call, *failure)
+    except BaseException:
+        # closed mid-wait (the caller's task was cancelled, or the client went away):
+        # cancel what still runs and free its breaker trial
+        for attempt in running:
+            _give_up(attempt, "cancelled")
+        raise
+
+
+def _advance(steps, done=None):
+    """Next (futures, wake_at) of a _tool_call_steps generator, or its outcome once finished."""
+    try:
+        return steps.send(done)
+    except StopIteration as stop:
+        return stop.value
+
+
+def _prompt_chars(messages: list) -> int:
+    return sum(len(m.content) for m in messages)
+
+
+def _token_counts(usage: Optional[dict]) -> dict:
+    """
+    Ollama's per-call counts: prompt_tokens is what the model actually had to
+    evaluate (prompt_eval_count, excludes a reused cached prefix); completion_tokens
+    is what it generated (eval_count).
+    """
+    usage = usage or {}
+    return {"prompt_tokens": usage.get("input_tokens"), "completion_tokens": usage.get("output_tokens")}
+
+
+def _log_round(round_no: int, tokens: dict):
+    print(f" Round {round_no}: {tokens['prompt_tokens']} prompt tokens evaluated, "
+          f"{tokens['completion_tokens']} generated")
+
+
+def _invoke_llm(messages: list, round_no: int):
+    """
+    One completion, streamed and parsed as it arrives: generation is stopped as
+    soon as a complete tool call (in JSON mode, any complete object) is in.
+    Returns (text, parsed JSON or None). Traced as an "llm" span with token
+    counts; after an early stop Ollama's final counts never arrive, so the
+    generated tokens are counted from the stream and prompt tokens are unknown.
+    """
+    with span("llm", round=round_no, prompt_chars=_prompt_chars(messages)) as info:
+        parser, usage, pieces, stopped = JsonStream(), None, 0, False
+        stream = llm.stream(messages, **_stream_kwargs())
+        try:
+            for chunk in stream:
+                usage = chunk.usage_metadata or usage
+                pieces += bool(chunk.content)
+                if parser.feed(chunk.content) is not None and _is_complete_step(parser.value):
+                    stopped = True
+                    break
+        finally:
+            stream.close()   # closes the HTTP stream: Ollama stops generating
+        ai_msg = parser.text[:parser.end] if stopped else parser.text
+        info["response_chars"] = len(ai_msg)
+        info.update(_token_counts(usage))
+        if stopped:
+            info["early_stop"] = True
+            info["completion_tokens"] = info["completion_tokens"] or pieces
+    _log_round(round_no, info)
+    return ai_msg, parser.value
+
+
+def _run_tool_calls(calls: list, reuse: Optional[dict] = None) -> list:
+    """
+    Run the requested tools concurrently on the shared executor.
+    Each call gets its own timeout; returns one outcome dict per call, in order.
+    """
+    steps = [_tool_call_steps(call, reuse) for call in calls]
+    try:
+        states = [_advance(s) for s in steps]   # every call is started before any is waited on
+        while True:
+            waiting = [i for i, st in enumerate(states) if not isinstance(st, dict)]
+            if not waiting:
+                return states
+            futures = {f for i in waiting for f in states[i][0]}
+            wake_at = min(states[i][1] for i in waiting)
+            done, _ = concurrent.futures.wait(futures, timeout=max(0.0, wake_at - time.time()),
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            for i in waiting:
+                mine, wake = states[i]
+                if time.time() >= wake or done.intersection(mine):
+                    states[i] = _advance(steps[i], done)
+    finally:
+        for s in steps:
+            s.close()   # no-op once finished; otherwise cancels its attempts
+
+
+def _format_tool_results(outcomes: list) -> str:
+    """Render tool outcomes for the next prompt (single call keeps the original format)."""
+    labels = {"ok": "[TOOL RESULT]", "timeout": "[TOOL TIMEOUT]", "error": "[TOOL ERROR]"}
+    if len(outcomes) == 1:
+        return f"{labels[outcomes[0]['status']]}\n{outcomes[0]['output']}"
+    blocks = [f"{labels[o['status']]} {o['tool']}({o['input']})\n{o['output']}" for o in outcomes]
+    return "\n\n".join(blocks)
+
+
+def _routed_round(messages: list, call: dict, tool_call_counts: dict) -> str:
+    """
+    A router-chosen call, written as the JSON the LLM would have produced (so the
+    next round reads like a normal tool round) and counted toward MAX_SAME_TOOL_CALLS.
+    """
+    tool_call_counts[call["tool"]] = tool_call_counts.get(call["tool"], 0) + 1
+    return json.dumps(call, ensure_ascii=False)
+
+
+def run_agent(question: str, context: Optional[dict] = None, turn: Optional[dict] = None) -> str:
     """
     Runs lightweight ReAct-style loop:
+    0. If the tool router is confident, run its tool call without asking the LLM
     1. Ask LLM what to do
-    2. If tool call → run tool (with a per-tool timeout)
-    3. Feed result back until final answer
+    2. If tool call(s) → run them concurrently (each with its own timeout)
+    3. Feed results back until final answer
+
+    In a session, `context` is sessions.Session.context() (earlier turns, their
+    tool results) and `turn` is filled in for Session.add_turn once there is an
+    answer. Follow-up questions skip the router: they rarely name their subject.
     """
 
     loop_limit = 5
-    last_output = ""
+    messages = _new_conversation(question, context)
+    first = len(messages) - 1
+    reuse = _session_tools(context)
+    outcomes = []
     start_time = time.time()
 
     # Track how many times each tool was requested in this run
     tool_call_counts = {}
 
-    for _ in range(loop_limit):
+    routed = None if context and context.get("history") else route_call(question)
+    if routed:
+        ai_msg = _routed_round(messages, routed, tool_call_counts)
+        outcomes += _run_tool_calls([routed], reuse)
+        _append_round(messages, ai_msg, _format_tool_results(outcomes[-1:]))
+
+    for round_no in range(loop_limit):
 
         # Check overall time budget
         elapsed = time.time() - start_time
@@ -94,58 +541,190 @@ def run_agent(question: str) -> str:
             return f"Agent aborted: exceeded overall timeout of {AGENT_TOTAL_TIMEOUT} seconds."
 
         # Ask LLM for next step
-        ai_msg = chain.invoke({
-            "tool_list": format_tool_list(TOOLS),
-            "input": question if not last_output else f"{question}\n\nTool result:\n{last_output}"
-        })
-
-        # Try to detect JSON tool call using improved extractor
-        tool_call = extract_json(ai_msg)
-
-        # ---- If LLM requests a tool ----
-        if isinstance(tool_call, dict) and "tool" in tool_call:
-            tool_name = tool_call["tool"]
-            tool_input = tool_call.get("input", "")
-            print(f" LLM requested tool: {tool_name} with input: {tool_input}")
-
-            # Find tool
-            tool = next((t for t in TOOLS if t.name == tool_name), None)
-            if not tool:
-                return f"ERROR: Unknown tool '{tool_name}'"
-
-            # Increment usage count for this tool
-            tool_call_counts[tool_name] = tool_call_counts.get(tool_name, 0) + 1
-            if tool_call_counts[tool_name] > MAX_SAME_TOOL_CALLS:
-                return (f"Agent aborted: tool '{tool_name}' requested more than "
-                        f"{MAX_SAME_TOOL_CALLS} times. Possible loop or malformed tool usage.")
-
-            try:
-                print(f" Executing tool: {tool_name}")
-
-                # Run the tool with a per-tool timeout so it cannot block forever.
-                # We use a short ThreadPoolExecutor for each tool invocation.
-                with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
-                    future = ex.submit(tool.func, tool_input)
-                    try:
-                        result = future.result(timeout=TOOL_CALL_TIMEOUT)
-                    except concurrent.futures.TimeoutError:
-                        # Tool timed out: inform LLM and let it try another tool
-                        last_output = (f"[TOOL TIMEOUT]\nTool '{tool_name}' exceeded "
-                                       f"{TOOL_CALL_TIMEOUT}s and was aborted.")
-                        print(f" Tool '{tool_name}' timed out after {TOOL_CALL_TIMEOUT}s.")
-                        continue
-
-                # Normal successful tool result
-                last_output = f"[TOOL RESULT]\n{result}"
-                continue
+        ai_msg, parsed = _invoke_llm(messages, round_no)
 
-            except Exception as e:
-                # Tool raised an exception: show stacktrace to LLM in last_output but continue
-                last_output = f"Tool error: {e}\n{traceback.format_exc()}"
-                print(f" Tool '{tool_name}' raised an exception: {e}")
-                continue
+        # JSON tool call(s), parsed while the completion streamed in
+        calls = _parse_tool_calls(parsed)
+
+        # ---- If LLM requests tools ----
+        if calls:
+            for call in calls:
+                print(f" LLM requested tool: {call['tool']} with input: {call.get('input', '')}")
+
+            abort = _check_tool_calls(calls, tool_call_counts)
+            if abort:
+                return abort
+
+            results = _run_tool_calls(calls, reuse)
+            outcomes += results
+            _append_round(messages, ai_msg, _format_tool_results(results))
+            continue
 
         # ---- Not a tool call → final answer ----
-        return ai_msg
+        answer = _final_answer(parsed, ai_msg)
+        _finish_turn(turn, messages, first, ai_msg, answer, outcomes)
+        return answer
+
+    return "Agent exceeded reasoning loop limit."
+
+
+# ------------------------------------------------------------
+# ASYNC AGENT RUNNER (streaming)
+# ------------------------------------------------------------
+def _looks_like_tool_call(text: str) -> bool:
+    """Decide from the first characters of a completion whether it is a JSON tool call."""
+    head = text.lstrip()
+    return head.startswith(("{", "[", "`"))
+
+
+async def _arun_tool_call(call: dict, reuse: Optional[dict] = None) -> dict:
+    """Run one tool call (with its hedge, if any) on the shared executor without blocking the event loop."""
+    steps = _tool_call_steps(call, reuse)
+    try:
+        state = _advance(steps)
+        while not isinstance(state, dict):
+            futures, wake_at = state
+            # not cancelled on timeout here: a call other runs are waiting on keeps going
+            waiters = [asyncio.wrap_future(f) for f in futures]
+            for w in waiters:
+                # read by _settle from the real future; mark it retrieved if we stopped waiting first
+                w.add_done_callback(lambda w: w.cancelled() or w.exception())
+            await asyncio.wait(waiters, timeout=max(0.0, wake_at - time.time()), return_when=asyncio.FIRST_COMPLETED)
+            state = _advance(steps, {f for f in futures if f.done()})
+        return state
+    finally:
+        steps.close()   # task cancelled (stream timeout, client gone): give up on the attempts
+
+
+async def astream_agent(question: str, context: Optional[dict] = None,
+                        turn: Optional[dict] = None) -> AsyncIterator[dict]:
+    """
+    Async version of run_agent that yields events as they happen:
+      {"event": "tool_call",   "tool": ..., "input": ...}
+      {"event": "tool_result", "tool": ..., "input": ..., "status": "ok"|"timeout"|"error", "output": ...}
+      {"event": "token",       "text": ...}     (final-answer tokens)
+      {"event": "final",       "answer": ...}
+      {"event": "error",       "error": ...}
+    Tools run on the shared tool executor, so many sessions can share one event loop.
+    `context` / `turn`: as for run_agent.
+    """
+
+    loop_limit = 5
+    messages = _new_conversation(question, context)
+    first = len(messages) - 1
+    reuse = _session_tools(context)
+    outcomes = []
+    start_time = time.time()
+    tool_call_counts = {}
+
+    routed = None if context and context.get("history") else await asyncio.to_thread(route_call, question)
+    if routed:
+        ai_msg = _routed_round(messages, routed, tool_call_counts)
+        yield {"event": "tool_call", "tool": routed["tool"], "input": routed["input"], "routed": True}
+        outcome = await _arun_tool_call(routed, reuse)
+        outcomes.append(outcome)
+        yield {"event": "tool_result", **outcome}
+        _append_round(messages, ai_msg, _format_tool_results([outcome]))
+
+    for round_no in range(loop_limit):
+
+        elapsed = time.time() - start_time
+        if elapsed > AGENT_TOTAL_TIMEOUT:
+            yield {"event": "error", "error": f"Agent aborted: exceeded overall timeout of {AGENT_TOTAL_TIMEOUT} seconds."}
+            return
+
+        # Stream the completion, parsed as it arrives. Final-answer text is passed
+        # through (in JSON mode: the decoded "answer" string); generation is
+        # stopped as soon as a complete step is in.
+        parser = JsonStream()
+        shown = ""
+        streaming = None
+        usage = None
+        pieces = 0
+        stopped = False
+        llm_start = time.time()
+        first_token = None
+        stream = llm.astream(messages, **_stream_kwargs())
+        try:
+            async for chunk in stream:
+                usage = chunk.usage_metadata or usage
+                text = chunk.content
+                pieces += bool(text)
+                if first_token is None and text:
+                    first_token = time.time() - llm_start
+                done = parser.feed(text) is not None and _is_complete_step(parser.value)
+                if AGENT_JSON_MODE:
+                    partial = parser.partial_answer()
+                    if partial is not None and len(partial) > len(shown):
+                        yield {"event": "token", "text": partial[len(shown):]}
+                        shown = partial
+                elif streaming is None and parser.text.strip():
+                    streaming = not _looks_like_tool_call(parser.text)
+                    if streaming:
+                        shown = parser.text
+                        yield {"event": "token", "text": shown}
+                elif streaming and text:
+                    shown += text
+                    yield {"event": "token", "text": text}
+                if done:
+                    stopped = True
+                    break
+        finally:
+            await stream.aclose()   # closes the HTTP stream: Ollama stops generating
+            await asyncio.sleep(0)  # let the client's inner stream generators finalize
+        ai_msg = parser.text[:parser.end] if stopped else parser.text
+        tokens = _token_counts(usage)
+        if stopped:
+            tokens["completion_tokens"] = tokens["completion_tokens"] or pieces
+        _log_round(round_no, tokens)
+        trace = current_trace()
+        if trace is not None:
+            trace.add("llm", time.time() - llm_start, start=llm_start, round=round_no,
+                      prompt_chars=_prompt_chars(messages), response_chars=len(ai_msg),
+                      first_token_seconds=round(first_token, 4) if first_token is not None else None,
+                      early_stop=stopped, **tokens)
+
+        parsed = parser.value
+        calls = _parse_tool_calls(parsed)
+
+        # ---- If LLM requests tools ----
+        if calls:
+            for call in calls:
+                yield {"event": "tool_call", "tool": call["tool"], "input": call.get("input", "")}
+
+            abort = _check_tool_calls(calls, tool_call_counts)
+            if abort:
+                yield {"event": "error", "error": abort}
+                return
+
+            # Results are reported as each tool finishes, fed back together
+            tasks = [asyncio.ensure_future(_arun_tool_call(call, reuse)) for call in calls]
+            for next_done in asyncio.as_completed(tasks):
+                outcome = await next_done
+                yield {"event": "tool_result", **outcome}
+            results = [t.result() for t in tasks]
+            outcomes += results
+            _append_round(messages, ai_msg, _format_tool_results(results))
+            continue
+
+        # ---- Not a tool call → final answer ----
+        answer = _final_answer(parsed, ai_msg)
+        _finish_turn(turn, messages, first, ai_msg, answer, outcomes)
+        if not shown:
+            yield {"event": "token", "text": answer}
+        elif answer.startswith(shown) and len(answer) > len(shown):
+            yield {"event": "token", "text": answer[len(shown):]}
+        yield {"event": "final", "answer": answer}
+        return
+
+    yield {"event": "final", "answer": "Agent exceeded reasoning loop limit."}
+
 
+async def arun_agent(question: str) -> str:
+    """Async counterpart of run_agent: returns only the final answer (or error text)."""
+    async for event in astream_agent(question):
+        if event["event"] == "final":
+            return event["answer"]
+        if event["event"] == "error":
+            return event["error"]
     return "Agent exceeded reasoning loop limit."
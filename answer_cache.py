@@ -0,0 +1,152 @@
+# answer_cache.py
+import os
+import time
+import sqlite3
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+# -------------------------------
+# CONFIG
+# -------------------------------
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "./answer_cache.sqlite3")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))  # min cosine similarity for a hit
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))        # seconds
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+
+# run_agent returns these as plain text; they are never cached
+_NON_ANSWER_PREFIXES = ("Agent aborted", "Agent exceeded", "ERROR")
+
+
+def _normalize(vec) -> np.ndarray:
+    v = np.asarray(vec, dtype=np.float32)
+    n = np.linalg.norm(v)
+    return v / n if n else v
+
+
+class SemanticAnswerCache:
+    """
+    Final-answer cache keyed by query embedding.
+
+    Entries live in SQLite (survive restarts); the embeddings of live entries
+    are kept in memory as one normalized matrix so a lookup is a single
+    matrix-vector product. Entries created against another dataset version
+    (see vector.dataset_version) are treated as stale and purged.
+    """
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 ttl: float = ANSWER_CACHE_TTL, max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._data_version = None
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._matrix = None
+
+    # ---- storage ----
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, query TEXT, answer TEXT, embedding BLOB,"
+                " dataset_version TEXT, created_at REAL, last_used REAL)"
+            )
+            self._conn = conn
+            self._pid = os.getpid()
+            self._data_version = None
+        return self._conn
+
+    def _refresh(self, db, version: str):
+        """Drop expired/stale rows and reload the matrix if the table changed."""
+        purged = db.execute("DELETE FROM answers WHERE created_at < ? OR dataset_version != ?",
+                            (time.time() - self.ttl, version)).rowcount
+        data_version = db.execute("PRAGMA data_version").fetchone()[0]
+        if self._matrix is not None and not purged and data_version == self._data_version:
+            return
+        rows = db.execute("SELECT id, embedding FROM answers").fetchall()
+        self._ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self._matrix = (np.stack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+                        if rows else None)
+        self._data_version = data_version
+
+    @staticmethod
+    def _dataset_version() -> str:
+        from vector import dataset_version
+        return dataset_version()
+
+    @staticmethod
+    def embed(query: str) -> np.ndarray:
+        from vector import embeddings
+        return _normalize(embeddings.embed_query(query))
+
+    # ---- public API ----
+    def lookup(self, query: str, embedding: Optional[np.ndarray] = None) -> Tuple[Optional[dict], np.ndarray]:
+        """
+        Return (hit, embedding). `hit` is {"answer", "query", "similarity"} when a
+        stored answer is similar enough, else None. Pass the embedding on to
+        store() to avoid embedding the query twice.
+        """
+        if embedding is None:
+            embedding = self.embed(query)
+        version = self._dataset_version()
+        with self._lock:
+            db = self._db()
+            self._refresh(db, version)
+            if self._matrix is None or self._matrix.shape[1] != embedding.shape[0]:
+                return None, embedding
+            sims = self._matrix @ embedding
+            best = int(np.argmax(sims))
+            score = float(sims[best])
+            if score < self.threshold:
+                return None, embedding
+            row_id = int(self._ids[best])
+            row = db.execute("SELECT query, answer FROM answers WHERE id = ?", (row_id,)).fetchone()
+            if row is None:
+                return None, embedding
+            db.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), row_id))
+        return {"query": row[0], "answer": row[1], "similarity": round(score, 4)}, embedding
+
+    def store(self, query: str, answer: str, embedding: Optional[np.ndarray] = None):
+        if not answer or answer.startswith(_NON_ANSWER_PREFIXES):
+            return
+        if embedding is None:
+            embedding = self.embed(query)
+        embedding = _normalize(embedding)
+        now = time.time()
+        version = self._dataset_version()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT INTO answers (query, answer, embedding, dataset_version, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (query, answer, embedding.tobytes(), version, now, now),
+            )
+            # evict least recently used beyond the size bound
+            db.execute("DELETE FROM answers WHERE id IN ("
+                       " SELECT id FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                       (self.max_entries,))
+            # our own writes don't bump PRAGMA data_version: force a reload
+            self._matrix = None
+
+    def invalidate(self):
+        """Drop every cached answer (e.g. after re-ingesting the dataset)."""
+        with self._lock:
+            self._db().execute("DELETE FROM answers")
+            self._matrix = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            n = self._db().execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        return {"entries": n, "threshold": self.threshold, "ttl_seconds": self.ttl,
+                "max_entries": self.max_entries}
+
+
+# Shared instance used by the API
+answer_cache = SemanticAnswerCache()
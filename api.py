@@ -2,24 +2,43 @@
 import os
 import uuid
 import json
-import traceback
-import multiprocessing
-from multiprocessing import Queue, Process
+import time
+import asyncio
+import threading
+import concurrent.futures
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Union
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
-from fastapi.responses import JSONResponse
+from starlette.requests import ClientDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 
-# Import your agent runner and tool registry
-from agent import run_agent
-from tools.registry import TOOLS
+# Tool registry (lightweight descriptors; backends load on first use).
+# The agent itself is imported lazily, so /health and /v1/tools are up immediately.
+from tools.registry import TOOLS, warm_up, loaded_backends
+from tools.cache import bypass_cache, tool_cache, normalize_input
+from worker_pool import WorkerPool, PoolSaturated
+from job_queue import JobQueue, QueueFull, JOB_PRIORITIES
+from jobstore import SharedJobQueue, open_store, JOB_STORE, JOB_STORE_WORKER
+from singleflight import SingleFlight
+from answer_cache import answer_cache
+from sessions import session_store
+from batch import run_batch, BatchStats, BATCH_CONCURRENCY, BATCH_MAX_ITEMS
+from upload_stream import MultipartUpload, UploadTooLarge, UploadInvalid
+import router
+import tracing
 
 # CONFIG
 UPLOADS_DIR = Path("uploads")
 UPLOADS_DIR.mkdir(exist_ok=True)
 DEFAULT_TIMEOUT = 60  # seconds for /v1/query if not provided
+TOOLS_WARM_UP = os.getenv("TOOLS_WARM_UP", "background")  # "background" | "off": load tool backends in the API process
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))  # larger uploads get 413
+UPLOAD_CHUNK_BYTES = 1024 * 1024   # uploads are written/hashed this much at a time
+UPLOAD_FORM_OVERHEAD = 64 * 1024   # multipart headers/boundaries allowed on top of UPLOAD_MAX_BYTES
+INGEST_EXTENSIONS = {".csv", ".txt", ".md", ".bib"}
+INGEST_JOBS_KEEP = 200             # finished ingest jobs remembered for /v1/ingest
 
 app = FastAPI(title="Agnikul Agent API", version="0.1")
 
@@ -27,67 +46,581 @@ app = FastAPI(title="Agnikul Agent API", version="0.1")
 class QueryRequest(BaseModel):
     query: str
     timeout: Optional[int] = DEFAULT_TIMEOUT
+    no_cache: Optional[bool] = False  # skip cached answers and tool results for this request
+    priority: Optional[str] = "normal"  # job queue class: high | normal | low
+    session_id: Optional[str] = None    # continue a conversation (/v1/query, /v1/query/stream); unknown ids start one
 
 
-def _worker_run(question: str, out_q: Queue):
-    """Worker process target to call run_agent and send result back via queue."""
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    query: str
+
+
+class BatchRequest(BaseModel):
+    queries: List[Union[str, BatchItem]]
+    timeout: Optional[int] = DEFAULT_TIMEOUT        # per question
+    concurrency: Optional[int] = BATCH_CONCURRENCY
+    no_cache: Optional[bool] = False
+    priority: Optional[str] = "low"                 # batches yield to interactive queries by default
+    skip_ids: Optional[List[str]] = None            # resume: ids already answered in a partial output
+
+
+def _worker_run(payload: dict):
+    """
+    Worker process target: run the agent for one request payload; returns answer + trace spans
+    (+ the new turn, for a session's payload["session"] context).
+    """
+    from agent import run_agent
+    turn = {} if payload.get("session") is not None else None
+    with tracing.start_trace(payload.get("request_id")) as trace, bypass_cache(bool(payload.get("no_cache"))):
+        answer = run_agent(payload["query"], context=payload.get("session"), turn=turn)
+    return {"answer": answer, "spans": trace.to_dict()["spans"], "turn": turn}
+
+
+def _worker_warm_up():
+    """Runs once in each worker process before it takes requests."""
+    import agent  # noqa: F401  (LLM client + system prompt)
+    warm_up()     # every tool backend, incl. vector store
+    if router.TOOL_ROUTER == "on":
+        router.tool_router.warm_up()   # example embeddings
+
+
+# Warm agent workers; started with the app, used by every /v1/query
+agent_pool = WorkerPool(target=_worker_run, initializer=_worker_warm_up)
+
+# Admission control: /v1/query and /v1/jobs runs wait here (bounded, by priority);
+# a fixed number of dispatcher threads feeds them to the pool. With JOB_STORE set,
+# the queue and results are shared by every replica and worker node (jobstore.py).
+if JOB_STORE:
+    job_queue = SharedJobQueue(open_store(JOB_STORE), run=lambda job: _run_job(job))
+else:
+    job_queue = JobQueue(run=lambda job: _run_job(job))
+
+# Identical /v1/query requests in flight at the same time share one pool run
+_query_flights = SingleFlight("query")
+# one thread per job the queue admits: a flight holds a queue slot or is turned away at once
+_flight_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=job_queue.concurrency + job_queue.max_queue, thread_name_prefix="query-flight")
+FLIGHT_GRACE = 0.5  # seconds
+
+# Scraped at /metrics (request/stage/tool metrics are defined in tracing.py)
+ANSWER_CACHE_HITS = tracing.metrics.counter("agent_answer_cache_hits_total", "Requests served from the answer cache.",
+                                            ("endpoint",))
+tracing.metrics.gauge("agent_pool_idle_workers", "Warm workers waiting for a request.",
+                      lambda: agent_pool.stats()["idle"])
+tracing.metrics.gauge("agent_pool_waiting_requests", "Requests queued for a free worker.",
+                      lambda: agent_pool.stats()["waiting"])
+tracing.metrics.gauge("agent_jobs_queued", "Jobs waiting in the job queue.", lambda: job_queue.stats()["queued"])
+tracing.metrics.gauge("agent_jobs_running", "Jobs running on the pool.", lambda: job_queue.stats()["running"])
+
+
+@app.on_event("startup")
+def _start_pool():
+    if not JOB_STORE or JOB_STORE_WORKER == "on":
+        agent_pool.start()
+    job_queue.start()
+    # /v1/query/stream runs the agent in this process: load backends off the request path
+    if TOOLS_WARM_UP == "background":
+        warm_up(background=True)
+
+
+@app.on_event("shutdown")
+def _stop_pool():
+    job_queue.shutdown()
+    agent_pool.shutdown()
+    _ingest_executor.shutdown(wait=False, cancel_futures=True)
+    _flight_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_job(job) -> dict:
+    """JobQueue runner (dispatcher thread)."""
+    if job.payload.get("endpoint") == "jobs":
+        return _async_job(job)
+    return _pool_run(job)
+
+
+def _pool_run(job) -> dict:
+    """
+    Run the agent on a warm pool worker; the worker is killed and replaced if it exceeds
+    the job's time budget or the job is cancelled. The worker's spans (llm/tool/retrieval/
+    summarize) come back as result["spans"], preceded by queue_wait (job queue + pool)
+    and run spans measured here. A killed worker's spans are lost.
+    """
     try:
-        result = run_agent(question)
-        out_q.put({"ok": True, "result": result})
-    except Exception:
-        out_q.put({
-            "ok": False,
-            "error": traceback.format_exc()
-        })
-
-
-def run_agent_with_timeout(question: str, timeout: int):
-    """Spawn a process to run the agent and kill it if it exceeds timeout."""
-    q: Queue = multiprocessing.Queue()
-    p: Process = multiprocessing.Process(target=_worker_run, args=(question, q), daemon=True)
-    p.start()
+        result = agent_pool.submit(job.payload, timeout=job.remaining(), cancel=job.cancel_event)
+    except PoolSaturated as e:
+        return {"status": "busy", "error": f"Server busy: {e}", "spans": []}
+
+    queue_wait = (job.started - job.created) + result.get("queue_wait_seconds", 0.0)
+    spans = [
+        {"name": "queue_wait", "start": 0.0, "duration": round(queue_wait, 4)},
+        {"name": "run", "start": round(queue_wait, 4), "duration": result.get("run_seconds", 0.0)},
+    ]
+    if result.get("status") == "ok":
+        reply = result.pop("result")
+        result["response"] = reply["answer"]
+        if reply.get("turn"):
+            result["turn"] = reply["turn"]
+        # worker span offsets are relative to when it picked the request up
+        spans += [{**s, "start": round(s["start"] + queue_wait, 4)} for s in reply.get("spans", [])]
+    result["spans"] = spans
+    return result
+
+
+def _async_job(job) -> dict:
+    """/v1/jobs run: answer cache first, then the pool; recorded like a request when it finishes."""
+    payload = job.payload
+    hit = None if payload["no_cache"] else _cached_answer(payload["query"])[0]
+    if hit:
+        ANSWER_CACHE_HITS.inc(endpoint="jobs")
+        result = {"status": "ok", "response": hit["answer"], "cached": True,
+                  "cache_similarity": hit["similarity"], "spans": []}
+    else:
+        result = _pool_run(job)
+        if result.get("status") == "ok":
+            _store_answer(payload["query"], result["response"], None)
+    _record_request("jobs", job.id, result.get("status", "error"), result.get("spans", []),
+                    time.time() - job.created)
+    return result
+
+
+def _run_on_pool(question: str, timeout: float, no_cache: bool, request_id: Optional[str],
+                 priority: str = "normal", context: Optional[dict] = None) -> dict:
+    """Queue one agent run (deadline = now + timeout) and wait for it; busy if the queue is full."""
+    payload = {"query": question, "no_cache": no_cache, "request_id": request_id}
+    if context is not None:
+        payload["session"] = context
     try:
-        payload = q.get(timeout=timeout)
-        # ensure process cleaned up
-        p.join(timeout=1)
-        if payload.get("ok"):
-            return {"status": "ok", "response": payload.get("result")}
-        else:
-            return {"status": "error", "error": payload.get("error")}
+        job = job_queue.submit(payload, priority=priority, timeout=timeout, deadline=time.time() + timeout)
+    except QueueFull as e:
+        return {"status": "busy", "error": f"Server busy: {e}", "retry_after": e.retry_after, "spans": []}
+    if not job.wait(timeout + 2 * FLIGHT_GRACE):
+        job_queue.cancel(job.id)
+        return {"status": "timeout", "error": f"Agent timed out after {timeout} seconds.", "spans": []}
+    return dict(job.result)
+
+
+def _run_flight(question: str, deadline: float, no_cache: bool, request_id: Optional[str], priority: str) -> dict:
+    """A coalesced run (flight executor): the pool budget is what is left of `deadline` once it starts."""
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        return {"status": "timeout", "error": "Agent timed out before it could be queued.", "spans": []}
+    return _run_on_pool(question, remaining, no_cache, request_id, priority)
+
+
+def run_agent_with_timeout(question: str, timeout: int, no_cache: bool = False, request_id: Optional[str] = None,
+                           priority: str = "normal"):
+    """
+    Run the agent for one request. Concurrent requests for the same normalized query
+    (and cache mode) share one pool run; each caller still waits at most its own
+    timeout. A caller that joined a run with a shorter budget than its own and saw
+    it time out starts a fresh run with the time it has left.
+    result["coalesced"] is True when another request's run was reused.
+    """
+    key = (normalize_input(question), bool(no_cache))
+    deadline = time.time() + timeout
+    while True:
+        remaining = deadline - time.time()
+        future, joined = _query_flights.submit(
+            key, lambda: _flight_executor.submit(_run_flight, question, deadline, no_cache, request_id, priority))
+        try:
+            # small grace so the pool's own timeout (same budget) reports first, with its timings
+            result = future.result(timeout=max(0.0, remaining) + FLIGHT_GRACE)
+        except concurrent.futures.TimeoutError:
+            _query_flights.release(key, future)   # the run carries on for anyone else waiting
+            return {"status": "timeout", "error": f"Agent timed out after {timeout} seconds.",
+                    "spans": [], "coalesced": joined}
+        if joined and result.get("status") == "timeout" and deadline - time.time() >= 1:
+            continue
+        return {**result, "spans": list(result.get("spans", [])), "coalesced": joined}
+
+
+def _timing(spans: list, total: float) -> dict:
+    """Per-request breakdown: seconds per stage plus the raw spans."""
+    stages = {}
+    for s in spans:
+        stages[s["name"]] = round(stages.get(s["name"], 0.0) + s["duration"], 4)
+    return {"total_seconds": round(total, 4), "stages": stages, "spans": spans}
+
+
+def _record_request(endpoint: str, request_id: str, status: str, spans: list, total: float,
+                    observe_spans: bool = True):
+    """Feed one finished request into /metrics and log its breakdown."""
+    if observe_spans:   # False for coalesced requests: their spans belong to another request's run
+        tracing.observe_spans(spans)
+    tracing.REQUESTS.inc(endpoint=endpoint, status=status)
+    tracing.REQUEST_SECONDS.observe(total, endpoint=endpoint)
+    stages = " ".join(f"{k}={v:.3f}s" for k, v in _timing(spans, total)["stages"].items())
+    print(f" [{request_id}] {endpoint} {status} in {total:.3f}s {stages}")
+
+
+def _session_turn(session, question: str, timeout: int, no_cache: bool, request_id: str, priority: str) -> dict:
+    """
+    One turn of a session on the pool: the session's context goes with the job and the
+    new turn is recorded when it succeeds. Turns of one session run one at a time; they
+    are never coalesced with other requests.
+    """
+    if not session.lock.acquire(timeout=1):
+        return {"status": "busy", "error": "Another turn of this session is still running.", "retry_after": 1,
+                "spans": [], "coalesced": False}
+    try:
+        result = _run_on_pool(question, timeout, no_cache, request_id, priority, context=session.context())
+        turn = result.pop("turn", None)
+        if result.get("status") == "ok" and turn:   # no turn for aborted runs
+            _add_turn(session, question, turn)
+    finally:
+        session.lock.release()
+    return {**result, "spans": list(result.get("spans", [])), "coalesced": False}
+
+
+def _add_turn(session, question: str, turn: dict):
+    session.add_turn(question, turn)
+    session_store.update(session)
+
+
+def _cached_answer(query: str):
+    """Semantic answer cache lookup; returns (hit or None, query embedding or None)."""
+    try:
+        return answer_cache.lookup(query)
     except Exception as e:
-        # Timeout or other errors — ensure child process is terminated
-        if p.is_alive():
-            p.terminate()
-            p.join(timeout=1)
-        if isinstance(e, multiprocessing.queues.Empty) or isinstance(e, TimeoutError):
-            return {"status": "timeout", "error": f"Agent timed out after {timeout} seconds."}
-        return {"status": "error", "error": str(e)}
+        print(f" Answer cache lookup failed: {e}")
+        return None, None
+
+
+def _store_answer(query: str, answer: str, embedding):
+    try:
+        answer_cache.store(query, answer, embedding=embedding)
+    except Exception as e:
+        print(f" Answer cache store failed: {e}")
 
 
 @app.post("/v1/query")
 def query_endpoint(req: QueryRequest):
     """
     Synchronous query endpoint.
-    Body: { "query": "<text>", "timeout": <seconds, optional> }
+    Body: { "query": "<text>", "timeout": <seconds, optional>, "no_cache": <bool, optional>,
+            "priority": "high" | "normal" | "low" (optional), "session_id": "<id>" (optional) }
+    Goes through the job queue: 429 + Retry-After when it is full.
+    With a session_id, the question continues that conversation (see /v1/sessions).
     """
-    if not req.query or not isinstance(req.query, str):
-        raise HTTPException(status_code=400, detail="`query` must be a non-empty string.")
+    _validate_query(req)
 
     # unique request id for tracing
     request_id = str(uuid.uuid4())
     timeout = int(req.timeout or DEFAULT_TIMEOUT)
+    started = time.time()
+    session = session_store.get_or_create(req.session_id) if req.session_id else None
+    session_body = {"session_id": session.id} if session else {}
+
+    # Near-identical question answered before? Serve it without running the agent.
+    # (Not for follow-ups: their answer depends on the conversation.)
+    with tracing.start_trace(request_id) as trace:
+        with tracing.span("answer_cache"):
+            hit, embedding = (None, None) if req.no_cache or (session and session.turns) else _cached_answer(req.query)
+    if hit:
+        ANSWER_CACHE_HITS.inc(endpoint="query")
+        if session:
+            _add_turn(session, req.query, {"answer": hit["answer"]})
+        total = time.time() - started
+        _record_request("query", request_id, "ok", trace.spans, total)
+        return {
+            "request_id": request_id,
+            **session_body,
+            "timeout_seconds": timeout,
+            "status": "ok",
+            "response": hit["answer"],
+            "cached": True,
+            "cache_similarity": hit["similarity"],
+            "timing": _timing(trace.spans, total),
+        }
+
+    # Run agent on a pooled worker process (killed + replaced on timeout)
+    if session:
+        result = _session_turn(session, req.query, timeout, bool(req.no_cache), request_id,
+                               req.priority or "normal")
+    else:
+        result = run_agent_with_timeout(req.query, timeout, no_cache=bool(req.no_cache), request_id=request_id,
+                                        priority=req.priority or "normal")
+    if result.get("status") == "ok" and not result["coalesced"] and not (session and session.turn_count > 1):
+        _store_answer(req.query, result["response"], embedding)
 
-    # Run agent in a separate process and kill on timeout
-    result = run_agent_with_timeout(req.query, timeout)
+    offset = trace.spans[-1]["duration"] if trace.spans else 0.0
+    spans = trace.spans + [{**s, "start": round(s["start"] + offset, 4)} for s in result.pop("spans", [])]
+    total = time.time() - started
+    _record_request("query", request_id, result.get("status", "error"), spans, total,
+                    observe_spans=not result["coalesced"])
 
     body = {
         "request_id": request_id,
+        **session_body,
         "timeout_seconds": timeout,
-        **result
+        "cached": False,
+        **result,
+        "timing": _timing(spans, total),
     }
 
-    status_code = 200 if result.get("status") == "ok" else 500 if result.get("status") == "error" else 504
-    return JSONResponse(status_code=status_code, content=body)
+    status_code = {"ok": 200, "error": 500, "busy": 429}.get(result.get("status"), 504)
+    headers = {"Retry-After": str(result["retry_after"])} if "retry_after" in result else None
+    return JSONResponse(status_code=status_code, content=body, headers=headers)
+
+
+def _validate_query(req: QueryRequest):
+    if not req.query or not isinstance(req.query, str):
+        raise HTTPException(status_code=400, detail="`query` must be a non-empty string.")
+    if (req.priority or "normal") not in JOB_PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"`priority` must be one of: {', '.join(JOB_PRIORITIES)}.")
+
+
+def _job_body(job) -> dict:
+    body = job.to_dict()
+    if job.status == "queued":
+        body["position"] = job_queue.position(job)
+    result = body.pop("result")
+    if result is not None:
+        result = dict(result)
+        spans = result.pop("spans", [])
+        body.update(result)
+        body["status"] = job.status   # queued | running | done | cancelled; the outcome is in "outcome"
+        body["outcome"] = result.get("status")
+        body["timing"] = _timing(spans, (job.finished or time.time()) - job.created)
+    return body
+
+
+@app.post("/v1/jobs", status_code=202)
+def submit_job(req: QueryRequest):
+    """
+    Queue an agent run and return at once.
+    Body: as /v1/query, plus "priority": "high" | "normal" | "low".
+    Poll GET /v1/jobs/{job_id}; DELETE it to cancel. 429 + Retry-After when the queue is full.
+    """
+    _validate_query(req)
+    timeout = int(req.timeout or DEFAULT_TIMEOUT)
+    job_id = uuid.uuid4().hex
+    payload = {"query": req.query, "no_cache": bool(req.no_cache), "request_id": job_id, "endpoint": "jobs"}
+    try:
+        job = job_queue.submit(payload, priority=req.priority or "normal", timeout=timeout, job_id=job_id)
+    except QueueFull as e:
+        tracing.REQUESTS.inc(endpoint="jobs", status="busy")
+        return JSONResponse(status_code=429, content={"status": "busy", "error": f"Server busy: {e}",
+                                                      "retry_after": e.retry_after},
+                            headers={"Retry-After": str(e.retry_after)})
+    body = _job_body(job)
+    body["timeout_seconds"] = timeout
+    return JSONResponse(status_code=202, content=body, headers={"Location": f"/v1/jobs/{job.id}"})
+
+
+@app.get("/v1/jobs/{job_id}")
+def job_status(job_id: str):
+    """Job state (queued with position, running, done, cancelled) and, once finished, its result."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id (finished jobs expire).")
+    return _job_body(job)
+
+
+@app.delete("/v1/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """Cancel a job: dropped if still queued, its worker killed if running; no-op once finished."""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id (finished jobs expire).")
+    job.wait(1)   # a running job's worker is killed within a poll interval
+    return _job_body(job)
+
+
+@app.get("/v1/jobs")
+def jobs_stats():
+    """Queue depth, running jobs, limits and average run time."""
+    return job_queue.stats()
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/v1/query/stream")
+async def query_stream_endpoint(req: QueryRequest):
+    """
+    Streaming query endpoint (Server-Sent Events).
+    Body: { "query": "<text>", "timeout": <seconds, optional>, "no_cache": <bool, optional>,
+            "session_id": "<id>" (optional) }
+    Events: start, tool_call, tool_result, token, final, error, timeout.
+    Runs the async agent loop in this event loop instead of a worker process.
+    """
+    if not req.query or not isinstance(req.query, str):
+        raise HTTPException(status_code=400, detail="`query` must be a non-empty string.")
+
+    request_id = str(uuid.uuid4())
+    timeout = int(req.timeout or DEFAULT_TIMEOUT)
+    session = session_store.get_or_create(req.session_id) if req.session_id else None
+    session_body = {"session_id": session.id} if session else {}
+
+    from agent import astream_agent
+
+    async def event_stream():
+        started = time.time()
+        yield _sse("start", {"request_id": request_id, **session_body, "timeout_seconds": timeout})
+        if session and not await asyncio.to_thread(session.lock.acquire, True, 1):
+            yield _sse("error", {"request_id": request_id, "error": "Another turn of this session is still running."})
+            return
+        try:
+            async for event in answer_events(started):
+                yield event
+        finally:
+            if session:
+                session.lock.release()
+
+    async def answer_events(started: float):
+        follow_up = bool(session and session.turns)
+        hit, embedding = ((None, None) if req.no_cache or follow_up
+                          else await asyncio.to_thread(_cached_answer, req.query))
+        if hit:
+            ANSWER_CACHE_HITS.inc(endpoint="stream")
+            if session:
+                _add_turn(session, req.query, {"answer": hit["answer"]})
+            _record_request("stream", request_id, "ok", [], time.time() - started)
+            yield _sse("token", {"request_id": request_id, "event": "token", "text": hit["answer"]})
+            yield _sse("final", {"request_id": request_id, "event": "final", "answer": hit["answer"],
+                                 "cached": True, "cache_similarity": hit["similarity"]})
+            return
+
+        status = "error"
+        context = session.context() if session else None
+        turn = {} if session else None
+        with bypass_cache(bool(req.no_cache)), tracing.start_trace(request_id) as trace:
+            events = astream_agent(req.query, context, turn).__aiter__()
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            try:
+                while True:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    try:
+                        event = await asyncio.wait_for(events.__anext__(), timeout=remaining)
+                    except StopAsyncIteration:
+                        break
+                    if event["event"] == "final":
+                        status = "ok"
+                        if session and turn:
+                            _add_turn(session, req.query, turn)
+                        if not follow_up:
+                            await asyncio.to_thread(_store_answer, req.query, event["answer"], embedding)
+                        event = {**event, "cached": False,
+                                 "timing": _timing(trace.to_dict()["spans"], time.time() - started)}
+                    yield _sse(event["event"], {"request_id": request_id, **event})
+            except asyncio.TimeoutError:
+                status = "timeout"
+                yield _sse("timeout", {"request_id": request_id, "error": f"Agent timed out after {timeout} seconds."})
+            except Exception as e:
+                yield _sse("error", {"request_id": request_id, "error": str(e)})
+            finally:
+                await events.aclose()
+                _record_request("stream", request_id, status, trace.to_dict()["spans"], time.time() - started)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Request-ID": request_id},
+    )
+
+
+def _batch_query(question: str, timeout: float, no_cache: bool, priority: str) -> dict:
+    """One /v1/batch question: answer cache, then the job queue; waits out 429s within its timeout."""
+    request_id = str(uuid.uuid4())
+    started = time.time()
+    hit, embedding = (None, None) if no_cache else _cached_answer(question)
+    if hit:
+        ANSWER_CACHE_HITS.inc(endpoint="batch")
+        _record_request("batch", request_id, "ok", [], time.time() - started)
+        return {"status": "ok", "response": hit["answer"]}
+    deadline = started + timeout
+    while True:
+        result = run_agent_with_timeout(question, max(1, int(deadline - time.time())), no_cache=no_cache,
+                                        request_id=request_id, priority=priority)
+        if result.get("status") != "busy" or time.time() + result.get("retry_after", 1) >= deadline:
+            break
+        time.sleep(result.get("retry_after", 1))
+    if result.get("status") == "ok" and not result["coalesced"]:
+        _store_answer(question, result["response"], embedding)
+    _record_request("batch", request_id, result.get("status", "error"), result.get("spans", []),
+                    time.time() - started, observe_spans=not result["coalesced"])
+    return result
+
+
+@app.post("/v1/batch")
+def batch_endpoint(req: BatchRequest):
+    """
+    Batch of questions, answered as NDJSON while they finish.
+    Body: { "queries": ["<text>" | {"id": "...", "query": "<text>"}, ...], "timeout": <seconds per question>,
+            "concurrency": <n>, "no_cache": <bool>, "priority": "low" (default) | "normal" | "high",
+            "skip_ids": [ids already answered, to resume] }
+    Lines: {"id", "query", "status", "answer" | "error", "seconds", "deduped"} per question (identical
+    questions run once), then {"summary": {...}} with counts, throughput and latency percentiles.
+    """
+    if not req.queries:
+        raise HTTPException(status_code=400, detail="`queries` must be a non-empty list.")
+    if len(req.queries) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} queries per batch.")
+    priority = req.priority or "low"
+    if priority not in JOB_PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"`priority` must be one of: {', '.join(JOB_PRIORITIES)}.")
+    items = []
+    for n, q in enumerate(req.queries, 1):
+        item = {"id": str(n), "query": q} if isinstance(q, str) else {"id": q.id or str(n), "query": q.query}
+        if not item["query"].strip():
+            raise HTTPException(status_code=400, detail=f"Query {item['id']} is empty.")
+        items.append(item)
+
+    timeout = int(req.timeout or DEFAULT_TIMEOUT)
+    concurrency = max(1, min(int(req.concurrency or BATCH_CONCURRENCY), job_queue.concurrency + job_queue.max_queue))
+    no_cache = bool(req.no_cache)
+    stats = BatchStats(len(items))
+    batch_id = str(uuid.uuid4())
+
+    def lines():
+        records = run_batch(items, lambda q, t: _batch_query(q, t, no_cache, priority), concurrency, timeout,
+                            done={i: {} for i in req.skip_ids or []}, stats=stats)
+        try:
+            for record in records:
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+            summary = stats.summary()
+            print(f" [{batch_id}] batch of {summary['items']} in {summary['wall_seconds']:.3f}s "
+                  f"({summary['questions_per_second']} q/s)")
+            yield json.dumps({"summary": summary}) + "\n"
+        finally:
+            records.close()   # client went away: questions not started are dropped
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Batch-ID": batch_id})
+
+
+@app.post("/v1/sessions", status_code=201)
+def create_session():
+    """Start a conversation; pass the returned session_id with /v1/query or /v1/query/stream."""
+    return session_store.get_or_create().to_dict()
+
+
+@app.get("/v1/sessions/{session_id}")
+def session_info(session_id: str):
+    """Turns so far, the summary of compacted turns and memory held."""
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown session id (idle sessions expire).")
+    return session.to_dict()
+
+
+@app.delete("/v1/sessions/{session_id}")
+def end_session(session_id: str):
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Unknown session id (idle sessions expire).")
+    return {"session_id": session_id, "deleted": True}
+
+
+@app.get("/v1/sessions")
+def sessions_stats():
+    """Sessions held, their memory and the limits (sessions live in this replica's memory)."""
+    return session_store.stats()
 
 
 @app.get("/v1/tools")
@@ -97,35 +630,197 @@ def tools_list():
     return {"tools": tools}
 
 
+@app.get("/v1/cache/stats")
+def cache_stats():
+    """Tool result cache counters per tool, plus semantic answer cache size."""
+    return {"tools": tool_cache.stats(), "answers": answer_cache.stats()}
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus exposition: request/stage/tool latency histograms, counters, pool gauges."""
+    return PlainTextResponse(tracing.metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "pool": agent_pool.stats(), "jobs": job_queue.stats(), "tools_loaded": loaded_backends()}
+
+
+# -------------------------------
+# UPLOADS + BACKGROUND INGESTION
+# -------------------------------
+_ingest_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+_ingest_jobs = {}   # job_id -> job dict (insertion ordered)
+_ingest_jobs_lock = threading.Lock()
+_uploads_lock = threading.Lock()   # serialises the content-addressed check-then-store
 
 
-@app.post("/v1/upload")
-async def upload_file(file: UploadFile = File(...)):
+@app.middleware("http")
+async def _reject_oversized_uploads(request: Request, call_next):
+    """413 before the multipart body is read, when Content-Length already says it is too big."""
+    if request.url.path == "/v1/upload":
+        length = request.headers.get("content-length", "")
+        if length.isdigit() and int(length) > UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD:
+            return JSONResponse(status_code=413,
+                                content={"detail": f"Upload exceeds {UPLOAD_MAX_BYTES} bytes."})
+    return await call_next(request)
+
+
+def _form_bool(value: str, name: str) -> bool:
+    """A boolean form field, read the way FastAPI's Form(bool) reads it."""
+    value = value.strip().lower()
+    if value in ("", "0", "false", "f", "no", "n", "off"):
+        return False
+    if value in ("1", "true", "t", "yes", "y", "on"):
+        return True
+    raise HTTPException(status_code=422, detail=f"Form field '{name}' must be a boolean.")
+
+
+def _store_upload(tmp_path: Path, sha256: str, filename: str):
     """
-    Upload a file. Returns the absolute filepath where the file is saved.
-    Minimal behavior: file saved to uploads/<uuid>/<original_filename>.
-    NOTE: For security, do not expose this endpoint publicly without auth and size limits.
+    Move a hashed upload to uploads/<sha256>/<filename>; returns (path, deduplicated).
+    Known bytes under a new name are hard-linked to the stored copy, so the returned
+    path always carries this upload's name and extension (which picks the ingest parser).
     """
-    # Basic validation
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="Missing filename.")
+    dest_dir = UPLOADS_DIR / sha256
+    dest_path = dest_dir / filename
+    with _uploads_lock:
+        existing = next(dest_dir.iterdir(), None) if dest_dir.is_dir() else None
+        if existing is None:
+            dest_dir.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, dest_path)
+            return dest_path, False
+        if not dest_path.exists():
+            try:
+                os.link(existing, dest_path)
+            except OSError:   # no hard links on this filesystem: keep the new copy
+                os.replace(tmp_path, dest_path)
+        tmp_path.unlink(missing_ok=True)
+        return dest_path, True
 
-    # Create a request-scoped folder
-    upload_id = str(uuid.uuid4())
-    dest_dir = UPLOADS_DIR / upload_id
-    dest_dir.mkdir(parents=True, exist_ok=True)
-    dest_path = dest_dir / Path(file.filename).name
 
-    # Save file
+def _start_ingest(path: str, sha256: str, filename: str) -> dict:
+    """Queue a background ingest of an uploaded file; the same content and file type is only ingested once."""
+    suffix = Path(filename).suffix.lower()
+    with _ingest_jobs_lock:
+        for job in _ingest_jobs.values():
+            if (job["sha256"] == sha256 and Path(job["filename"]).suffix.lower() == suffix
+                    and job["status"] != "error"):
+                return job
+        job = {"job_id": str(uuid.uuid4()), "status": "queued", "filename": filename, "sha256": sha256,
+               "filepath": path, "added": 0, "duplicates": 0, "error": None,
+               "queued_at": time.time(), "started_at": None, "finished_at": None}
+        _ingest_jobs[job["job_id"]] = job
+        finished = [j for j in _ingest_jobs.values() if j["status"] in ("done", "error")]
+        for old in finished[:max(0, len(finished) - INGEST_JOBS_KEEP)]:
+            del _ingest_jobs[old["job_id"]]
+    _ingest_executor.submit(_run_ingest, job)
+    return job
+
+
+def _run_ingest(job: dict):
+    """Ingest job body (ingest thread): embed into vector.vector_store + lexical index."""
+    job.update(status="running", started_at=time.time())
     try:
-        with dest_path.open("wb") as f:
-            contents = await file.read()
-            f.write(contents)
+        import vector
+        from ingest import ingest_file
+
+        stats = ingest_file(job["filepath"], vector.vector_store, vector.db_location,
+                            lexical_index=vector.lexical_index, source=job["filename"],
+                            progress=lambda added: job.update(added=added))
+        job.update(status="done", **stats)
+        if stats["added"]:
+            # cached answers may be missing the new content
+            answer_cache.invalidate()
+        print(f" Ingested upload {job['filename']}: {stats}")
     except Exception as e:
+        print(f" Ingest of {job['filename']} failed: {e}")
+        job.update(status="error", error=str(e))
+    finally:
+        job["finished_at"] = time.time()
+
+
+@app.post("/v1/upload", openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {
+    "schema": {"type": "object", "required": ["file"],
+               "properties": {"file": {"type": "string", "format": "binary"},
+                              "ingest": {"type": "boolean", "default": False}}}}}}})
+async def upload_file(request: Request):
+    """
+    Upload a file (multipart form: file, ingest). Returns the absolute filepath where the file is saved.
+    The form is parsed straight off the request stream: the file is written to disk and
+    hashed in the same pass, and stored content-addressed at uploads/<sha256>/<original_filename>;
+    uploading the same bytes again reuses that file (linked under the new name if it differs).
+    Files over UPLOAD_MAX_BYTES get 413 as soon as the limit is passed, chunked uploads too.
+    With ingest=true, CSV/text/BibTeX files are chunked and embedded into the RAG index by a
+    background job (see /v1/ingest/{job_id}).
+    NOTE: For security, do not expose this endpoint publicly without auth.
+    """
+    incoming = UPLOADS_DIR / ".incoming"
+    incoming.mkdir(parents=True, exist_ok=True)
+    tmp_path = incoming / uuid.uuid4().hex
+
+    # Stream to disk: memory stays at one chunk, file I/O stays off the event loop
+    try:
+        upload = MultipartUpload(request.headers.get("content-type", ""), tmp_path, UPLOAD_MAX_BYTES,
+                                 UPLOAD_FORM_OVERHEAD, chunk_bytes=UPLOAD_CHUNK_BYTES)
+        await upload.read(request.stream())
+    except UploadTooLarge as e:
+        tmp_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadInvalid as e:
+        tmp_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=422, detail=str(e))
+    except ClientDisconnect:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
+
+    # Basic validation
+    try:
+        if not upload.filename:
+            raise HTTPException(status_code=400, detail="Missing filename.")
+        filename = Path(upload.filename).name
+        ingest = _form_bool(upload.fields.get("ingest", ""), "ingest")
+        if ingest and Path(filename).suffix.lower() not in INGEST_EXTENSIONS:
+            raise HTTPException(status_code=400,
+                                detail=f"Can only ingest {', '.join(sorted(INGEST_EXTENSIONS))} files.")
+    except HTTPException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    # Content-addressed: identical bytes map to one stored file
+    sha256 = upload.sha256
+    try:
+        dest_path, deduplicated = await asyncio.to_thread(_store_upload, tmp_path, sha256, filename)
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
 
     # Return the absolute path (you can pass this path as input to tools like bibtex)
-    return {"upload_id": upload_id, "filepath": str(dest_path.resolve())}
+    body = {"upload_id": sha256, "filepath": str(dest_path.resolve()), "sha256": sha256,
+            "size_bytes": upload.size, "deduplicated": deduplicated}
+    if ingest:
+        job = _start_ingest(str(dest_path.resolve()), sha256, filename)
+        body["ingest_job"] = job["job_id"]
+        body["ingest_status"] = job["status"]
+    return body
+
+
+@app.get("/v1/ingest/{job_id}")
+def ingest_status(job_id: str):
+    """Status of a background ingest job: queued | running | done | error, with chunk counts."""
+    job = _ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown ingest job.")
+    return dict(job)
+
+
+@app.get("/v1/ingest")
+def ingest_jobs():
+    """Recent ingest jobs, newest first."""
+    with _ingest_jobs_lock:
+        jobs = [dict(j) for j in _ingest_jobs.values()]
+    return {"jobs": jobs[::-1]}
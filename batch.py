@@ -0,0 +1,184 @@
+# batch.py
+import os
+import json
+import time
+import concurrent.futures
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from tools.cache import normalize_input
+
+# -------------------------------
+# CONFIG (override with env vars)
+# -------------------------------
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))      # questions running at once
+BATCH_TIMEOUT = int(os.getenv("BATCH_TIMEOUT", "1000"))            # seconds per question
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))        # per /v1/batch request
+QUESTION_FIELDS = ("query", "question", "prompt")                  # first one present is the question
+ID_FIELDS = ("id", "request_id")
+
+
+def parse_item(line: str, n: int) -> Optional[dict]:
+    """
+    One input line -> {"id", "query"}. JSON objects use the first of
+    QUESTION_FIELDS (or "title" + "body", as in requests.jsonl) and ID_FIELDS;
+    a JSON string or a non-JSON line is the question itself. Blank lines are skipped.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        obj = json.loads(line)
+    except ValueError:
+        obj = line
+    if isinstance(obj, str):
+        return {"id": str(n), "query": obj}
+    if not isinstance(obj, dict):
+        raise ValueError(f"line {n}: expected a JSON object or string")
+    query = next((obj[f] for f in QUESTION_FIELDS if obj.get(f)), None)
+    if query is None and obj.get("title"):
+        query = "\n\n".join(str(obj[f]) for f in ("title", "body") if obj.get(f))
+    if not query or not isinstance(query, str):
+        raise ValueError(f"line {n}: no question ({' / '.join(QUESTION_FIELDS)} or title + body)")
+    item_id = next((obj[f] for f in ID_FIELDS if obj.get(f) is not None), n)
+    return {"id": str(item_id), "query": query}
+
+
+def read_items(lines: Iterable[str]) -> List[dict]:
+    items = [parse_item(line, n) for n, line in enumerate(lines, 1)]
+    return [item for item in items if item is not None]
+
+
+def load_done(path: str) -> Dict[str, dict]:
+    """
+    Finished records of a partial output file, by id (the last one wins). Only
+    "ok" records count: errors and timeouts are run again. A torn last line
+    (the previous run was killed mid-write) is ignored.
+    """
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and "id" in record and record.get("status") == "ok":
+                done[str(record["id"])] = record
+    return done
+
+
+def open_output(path: str, resume: bool):
+    """Output file for results: appended to when resuming (after a newline if the last line was torn)."""
+    if not resume or not os.path.exists(path):
+        return open(path, "w", encoding="utf-8")
+    torn = False
+    if os.path.getsize(path):
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            torn = f.read(1) != b"\n"
+    out = open(path, "a", encoding="utf-8")
+    if torn:
+        out.write("\n")
+    return out
+
+
+class BatchStats:
+    """Outcome counts plus latency percentiles and throughput for one batch."""
+
+    def __init__(self, items: int):
+        self.items = items
+        self.resumed = 0
+        self.duplicates = 0
+        self.statuses: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.started = time.time()
+
+    def add(self, record: dict):
+        self.statuses[record["status"]] = self.statuses.get(record["status"], 0) + 1
+        if record.get("deduped"):
+            self.duplicates += 1
+        else:
+            self.latencies.append(record["seconds"])
+
+    def summary(self) -> dict:
+        wall = time.time() - self.started
+        lat = np.array(self.latencies or [0.0])
+        return {
+            "items": self.items,
+            "resumed": self.resumed,
+            "duplicates": self.duplicates,
+            "runs": len(self.latencies),
+            **{status: n for status, n in sorted(self.statuses.items())},
+            "wall_seconds": round(wall, 3),
+            "questions_per_second": round((self.items - self.resumed) / wall, 3) if wall else 0.0,
+            "latency_p50_seconds": round(float(np.percentile(lat, 50)), 3),
+            "latency_p95_seconds": round(float(np.percentile(lat, 95)), 3),
+            "latency_max_seconds": round(float(lat.max()), 3),
+        }
+
+
+def format_summary(s: dict) -> str:
+    outcomes = ", ".join(f"{k} {s[k]}" for k in ("ok", "error", "timeout", "busy", "cancelled") if k in s)
+    return (f"Batch: {s['items']} questions ({s['duplicates']} duplicates, {s['resumed']} resumed) in "
+            f"{s['wall_seconds']:.1f}s, {s['questions_per_second']:.2f} q/s\n"
+            f"  {outcomes or 'nothing to run'}; latency p50 {s['latency_p50_seconds']:.2f}s "
+            f"p95 {s['latency_p95_seconds']:.2f}s max {s['latency_max_seconds']:.2f}s")
+
+
+def run_batch(items: List[dict], run: Callable[[str, float], dict], concurrency: int = BATCH_CONCURRENCY,
+              timeout: float = BATCH_TIMEOUT, done: Optional[Dict[str, dict]] = None,
+              stats: Optional[BatchStats] = None) -> Iterator[dict]:
+    """
+    Run each distinct question once, `concurrency` at a time, and yield one
+    record per item as its question finishes:
+        {"id", "query", "status", "answer" | "error", "seconds", "deduped"}
+    `run(question, timeout)` returns {"status", "response" | "error"}.
+    Questions match after normalize_input (case, quotes, whitespace). Items
+    whose id is in `done` (load_done) are skipped, and their answers are
+    reused for duplicates of the same question. Closing the iterator cancels
+    the questions that have not started.
+    """
+    done = done or {}
+    stats = stats or BatchStats(len(items))
+    previous = {normalize_input(r.get("query", "")): r for r in done.values()}
+    groups: Dict[str, List[dict]] = {}
+    for item in items:
+        if item["id"] in done:
+            stats.resumed += 1
+            continue
+        groups.setdefault(normalize_input(item["query"]), []).append(item)
+
+    def records(group: List[dict], outcome: dict, seconds: float, reused: bool) -> Iterator[dict]:
+        for i, item in enumerate(group):
+            record = {"id": item["id"], "query": item["query"], "status": outcome.get("status", "error")}
+            if record["status"] == "ok":
+                record["answer"] = outcome.get("response", outcome.get("answer"))
+            else:
+                record["error"] = outcome.get("error", "")
+            record["seconds"] = round(seconds, 4)
+            record["deduped"] = reused or i > 0
+            stats.add(record)
+            yield record
+
+    for key in [k for k in groups if k in previous]:
+        yield from records(groups.pop(key), previous[key], 0.0, reused=True)
+
+    def timed(question: str):
+        start = time.time()
+        try:
+            outcome = run(question, timeout)
+        except Exception as e:
+            outcome = {"status": "error", "error": repr(e)}
+        return outcome, time.time() - start
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch")
+    try:
+        futures = {executor.submit(timed, group[0]["query"]): group for group in groups.values()}
+        for future in concurrent.futures.as_completed(futures):
+            outcome, seconds = future.result()
+            yield from records(futures[future], outcome, seconds, reused=False)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
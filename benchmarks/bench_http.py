@@ -0,0 +1,208 @@
+# benchmarks/bench_http.py
+"""
+Self-check and benchmark for the shared HTTP transport (tools/http_transport.py)
+against a local stub of the Wikipedia and arXiv APIs.
+
+    python -m benchmarks.bench_http --clients 8 --requests 64 --latency 0.05 --fail-every 5
+
+The stub answers /w/api.php (MediaWiki JSON) and /api/query (arXiv Atom) with
+canned results, optionally slowly and with a 503 + Retry-After every Nth
+request. wiki_search/arxiv_search run from N client threads; the report
+compares TCP connections the stub accepted with requests it served
+(keep-alive reuse), and counts retries and throttle events from the "http"
+spans. Exits non-zero if a check fails (wrong output, errors, no reuse,
+concurrency limit exceeded). The transport's behaviour is asserted under
+pytest in tests/test_http_transport.py against the same stub.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import concurrent.futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WIKI_PAGES = [
+    {"title": "Agnikul Cosmos", "index": 1, "fullurl": "https://en.wikipedia.org/wiki/Agnikul_Cosmos",
+     "extract": "Agnikul Cosmos is an Indian aerospace manufacturer based in Chennai."},
+    {"title": "Agnibaan", "index": 2, "fullurl": "https://en.wikipedia.org/wiki/Agnibaan",
+     "extract": "Agnibaan is a two-stage launch vehicle developed by Agnikul Cosmos."},
+]
+
+ARXIV_FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <entry>
+    <id>http://arxiv.org/abs/2401.00001v1</id>
+    <published>2024-01-01T00:00:00Z</published>
+    <title>Additively manufactured
+      semi-cryogenic engines</title>
+    <summary>We study 3D-printed engines for small launchers.</summary>
+    <author><name>A. Author</name></author>
+    <author><name>B. Author</name></author>
+  </entry>
+</feed>
+"""
+
+
+class StubServer:
+    """Threaded stub of the Wikipedia/arXiv endpoints; tracks connections and concurrency."""
+
+    def __init__(self, latency: float = 0.0, fail_every: int = 0, retry_after: float = 0.05):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.retry_after = retry_after
+        self.counts = {"requests": 0, "connections": 0, "failed": 0, "max_concurrent": 0}
+        self._active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="http-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.counts["connections"] += 1
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.counts["requests"] += 1
+                    n = stub.counts["requests"]
+                    stub._active += 1
+                    stub.counts["max_concurrent"] = max(stub.counts["max_concurrent"], stub._active)
+                try:
+                    if stub.latency:
+                        time.sleep(stub.latency)
+                    if stub.fail_every and n % stub.fail_every == 0:
+                        with stub._lock:
+                            stub.counts["failed"] += 1
+                        return self._send(503, b"busy", "text/plain", {"Retry-After": str(stub.retry_after)})
+                    parts = urlsplit(self.path)
+                    query = parse_qs(parts.query)
+                    if parts.path == "/w/api.php":
+                        limit = int(query.get("gsrlimit", ["2"])[0])
+                        body = {"batchcomplete": True, "query": {"pages": list(reversed(WIKI_PAGES[:limit]))}}
+                        return self._send(200, json.dumps(body).encode(), "application/json")
+                    if parts.path == "/api/query":
+                        return self._send(200, ARXIV_FEED.encode(), "application/atom+xml")
+                    self._send(404, b"not found", "text/plain")
+                finally:
+                    with stub._lock:
+                        stub._active -= 1
+
+        return Handler
+
+
+def run(args) -> dict:
+    stub = StubServer(latency=args.latency, fail_every=args.fail_every).start()
+    os.environ["WIKI_API_URL"] = f"{stub.url}/w/api.php"
+    os.environ["ARXIV_API_URL"] = f"{stub.url}/api/query"
+
+    import tracing
+    from tools.http_transport import transport
+    from tools.wiki_tool import wiki_search
+    from tools.arxiv_tool import arxiv_search
+
+    transport.configure_host("127.0.0.1", rate=args.rate, burst=args.burst, concurrency=args.concurrency)
+
+    latencies, failures, spans = [], [], []
+    lock = threading.Lock()
+
+    def one(i: int):
+        tool, expect = (wiki_search, "Page: Agnikul Cosmos") if i % 2 == 0 else (arxiv_search, "Title: Additively")
+        t = time.perf_counter()
+        with tracing.start_trace(f"bench-{i}") as trace:
+            out = tool(f"agnikul {i}")
+        with lock:
+            latencies.append(time.perf_counter() - t)
+            spans.extend(trace.spans)
+            if expect not in out:
+                failures.append(out[:200])
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.clients) as ex:
+        list(ex.map(one, range(args.requests)))
+    wall = time.perf_counter() - start
+    pool = transport.stats()
+    stub.stop()
+
+    latencies.sort()
+    http_spans = [s for s in spans if s["name"] == "http"]
+    retries = sum(len(s.get("retried", ())) for s in http_spans)
+    throttled = {}
+    for s in http_spans:
+        for reason in s.get("throttled", ()):
+            throttled[reason] = throttled.get(reason, 0) + 1
+    checks = {
+        "outputs_ok": not failures,
+        "connections_reused": stub.counts["connections"] < stub.counts["requests"],
+        "concurrency_limit_held": stub.counts["max_concurrent"] <= args.concurrency,
+        "failures_retried": retries >= stub.counts["failed"],
+    }
+    return {
+        "requests": args.requests,
+        "errors": len(failures),
+        "error_samples": failures[:3],
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "wall_s": round(wall, 3),
+        "server": dict(stub.counts),
+        "pool": pool,
+        "retries": retries,
+        "throttled": throttled,
+        "checks": checks,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--clients", type=int, default=8, help="concurrent client threads")
+    ap.add_argument("--requests", type=int, default=64, help="tool calls (alternating wiki/arXiv)")
+    ap.add_argument("--latency", type=float, default=0.02, help="stub seconds per request")
+    ap.add_argument("--fail-every", type=int, default=5, help="answer every Nth request with 503 (0 = never)")
+    ap.add_argument("--rate", type=float, default=200.0, help="token bucket rate for the stub host")
+    ap.add_argument("--burst", type=int, default=10)
+    ap.add_argument("--concurrency", type=int, default=4, help="per-host concurrency limit")
+    args = ap.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if not all(report["checks"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/bench_import_time.py
+"""
+Import-time regression check for the startup path.
+
+    python -m benchmarks.bench_import_time [--repeat 5] [--budget tools.registry=0.5 ...]
+
+Each module is imported in a fresh interpreter `--repeat` times; the median
+wall time is compared against its budget. It also checks that importing
+the registry does not pull in heavy tool backends. Prints JSON and exits 1
+on any regression, so it can gate CI.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Median import seconds allowed per module
+DEFAULT_BUDGETS = {
+    "tools.registry": 0.5,
+    "api": 3.0,
+}
+
+# Must NOT be imported as a side effect of importing the registry
+FORBIDDEN_AFTER_REGISTRY = [
+    "vector", "pandas", "chromadb", "langchain_chroma", "langchain_ollama",
+    "tools.rag_tool", "tools.wiki_tool", "tools.arxiv_tool", "tools.bibtex_tool", "tools.duckduckgo_tool",
+]
+
+_PROBE = """
+import sys, time, json
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def probe(module: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", _PROBE.format(module=module)], cwd=ROOT,
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--budget", action="append", default=[], help="module=seconds (overrides defaults)")
+    args = ap.parse_args()
+
+    budgets = dict(DEFAULT_BUDGETS)
+    for item in args.budget:
+        module, seconds = item.split("=", 1)
+        budgets[module] = float(seconds)
+
+    failures = []
+    results = {}
+    for module, budget in budgets.items():
+        try:
+            runs = [probe(module) for _ in range(args.repeat)]
+        except subprocess.CalledProcessError as e:
+            results[module] = {"error": (e.stderr or "").strip().splitlines()[-1:]}
+            failures.append(f"{module}: import failed")
+            continue
+        median = statistics.median(r["seconds"] for r in runs)
+        results[module] = {"median_s": round(median, 4), "budget_s": budget,
+                           "min_s": round(min(r["seconds"] for r in runs), 4)}
+        if median > budget:
+            failures.append(f"{module}: {median:.3f}s > budget {budget}s")
+        if module == "tools.registry":
+            leaked = sorted(set(runs[0]["modules"]) & set(FORBIDDEN_AFTER_REGISTRY))
+            results[module]["eager_backends"] = leaked
+            if leaked:
+                failures.append(f"tools.registry eagerly imports {leaked}")
+
+    print(json.dumps({"results": results, "failures": failures}, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# benchmarks/bench_jobstore.py
+"""
+Self-check and benchmark for the shared job store (jobstore.py): API
+replicas and worker nodes as separate processes, against SQLite and a local
+Redis stand-in (benchmarks/fake_redis.py).
+
+    python -m benchmarks.bench_jobstore --jobs 24 --job-seconds 0.2 --nodes 1,2,4
+
+Worker nodes are child processes running jobstore.WorkerNode with a fake
+job (sleeps --job-seconds, honours cancel). Jobs are submitted through one
+SharedJobQueue ("replica A") and waited on and read back through another
+("replica B"), each with its own store connection. Per backend:
+
+  scaling   --jobs jobs drained by 1, 2, 4 ... nodes: wall time, jobs/s,
+            jobs per node.
+  crash     two nodes; one is SIGKILLed while running jobs. Its jobs must be
+            retried by the survivor once their visibility timeout lapses and
+            every job must finish ok.
+  cancel    a long job is cancelled from replica B while running on a node;
+            it must stop within about a second.
+  admission with no nodes, submits beyond the queue bound get QueueFull.
+
+Exits non-zero if a check fails.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_redis import FakeRedis  # noqa: E402
+
+LEASE = 1.5         # visibility timeout for the run (seconds)
+HEARTBEAT = 0.3
+NODE_GRACE = 4 * HEARTBEAT   # stopped nodes have aged out of the live list after this
+
+
+def _node_main(url: str, concurrency: int, job_seconds: float):
+    """Child process: one worker node with a fake job until killed."""
+    from jobstore import open_store, WorkerNode
+
+    def run(job):
+        seconds = job.payload.get("seconds", job_seconds)
+        if job.cancel_event.wait(seconds):
+            return {"status": "cancelled", "error": "Cancelled while running."}
+        return {"status": "ok", "response": f"answer to {job.payload['query']}"}
+
+    node = WorkerNode(open_store(url), run, concurrency, lease=LEASE, heartbeat=HEARTBEAT).start()
+    signal.signal(signal.SIGTERM, lambda *_: (node.stop(), os._exit(0)))
+    while True:
+        time.sleep(1)
+
+
+def _start_nodes(url: str, n: int, concurrency: int, job_seconds: float) -> list:
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_node_main, args=(url, concurrency, job_seconds), daemon=True) for _ in range(n)]
+    for p in procs:
+        p.start()
+    return procs
+
+
+def _stop_nodes(procs: list):
+    for p in procs:
+        if p.is_alive():
+            p.terminate()
+    for p in procs:
+        p.join(5)
+
+
+def _wait_nodes(queue, n: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while queue.stats()["nodes"] < n and time.time() < deadline:
+        time.sleep(0.05)
+
+
+def _drain(submit, read, jobs: int, timeout: float) -> list:
+    handles = [submit.submit({"query": f"q{i}"}, timeout=timeout) for i in range(jobs)]
+    finished = []
+    for h in handles:
+        job = read.get(h.id)
+        job.wait(timeout)
+        finished.append(job)
+    return finished
+
+
+def run_backend(url: str, args) -> dict:
+    from jobstore import open_store, SharedJobQueue
+    from job_queue import QueueFull
+
+    def queue(max_queue: int = 10_000):
+        return SharedJobQueue(open_store(url), run=None, max_queue=max_queue, worker=False)
+
+    replica_a, replica_b = queue(), queue()
+    report = {"scaling": []}
+
+    # scaling: the same jobs over more nodes
+    for n in args.nodes:
+        procs = _start_nodes(url, n, args.concurrency, args.job_seconds)
+        try:
+            _wait_nodes(replica_b, n)
+            t = time.time()
+            done = _drain(replica_a, replica_b, args.jobs, timeout=60)
+            wall = time.time() - t
+        finally:
+            _stop_nodes(procs)
+        per_node = {}
+        for job in done:
+            per_node[job.worker] = per_node.get(job.worker, 0) + 1
+        report["scaling"].append({"nodes": n, "wall_seconds": round(wall, 3),
+                                  "jobs_per_second": round(args.jobs / wall, 2),
+                                  "ok": sum(1 for j in done if (j.result or {}).get("status") == "ok"),
+                                  "jobs_per_node": sorted(per_node.values(), reverse=True)})
+        time.sleep(NODE_GRACE)   # let the stopped nodes' heartbeats age out
+
+    # crash: SIGKILL one of two nodes mid-run; its jobs are retried after the lease
+    procs = _start_nodes(url, 2, args.concurrency, args.job_seconds)
+    try:
+        _wait_nodes(replica_b, 2)
+        jobs = 4 * args.concurrency
+        handles = [replica_a.submit({"query": f"crash {i}", "seconds": 1.0}, timeout=60) for i in range(jobs)]
+        time.sleep(0.5)
+        procs[0].kill()
+        t = time.time()
+        done = []
+        for h in handles:
+            job = replica_b.get(h.id)
+            job.wait(60)
+            done.append(job)
+        report["crash"] = {"jobs": jobs, "ok": sum(1 for j in done if (j.result or {}).get("status") == "ok"),
+                           "retried": sum(1 for j in done if j.attempts > 1),
+                           "seconds_after_kill": round(time.time() - t, 3)}
+    finally:
+        _stop_nodes(procs)
+    time.sleep(NODE_GRACE)
+
+    # cancel: stop a running job from the other replica
+    procs = _start_nodes(url, 1, 1, args.job_seconds)
+    try:
+        _wait_nodes(replica_b, 1)
+        job = replica_a.submit({"query": "long", "seconds": 30}, timeout=60)
+        while replica_b.get(job.id).status != "running":
+            time.sleep(0.02)
+        t = time.time()
+        replica_b.cancel(job.id)
+        job.wait(10)
+        report["cancel"] = {"outcome": (job.result or {}).get("status"), "seconds": round(time.time() - t, 3)}
+    finally:
+        _stop_nodes(procs)
+    time.sleep(NODE_GRACE)
+
+    # admission: the queue bound holds with no one draining it
+    bounded = queue(max_queue=4)
+    accepted, rejected = 0, 0
+    for i in range(8):
+        try:
+            bounded.submit({"query": f"bound {i}"}, priority="high", timeout=5)
+            accepted += 1
+        except QueueFull:
+            rejected += 1
+    report["admission"] = {"accepted": accepted, "rejected": rejected}
+
+    scaling = report["scaling"]
+    report["checks"] = {
+        "all_scaling_jobs_ok": all(s["ok"] == args.jobs for s in scaling),
+        "work_spread_over_nodes": all(len(s["jobs_per_node"]) == s["nodes"] for s in scaling),
+        "more_nodes_faster": scaling[-1]["jobs_per_second"] > 1.5 * scaling[0]["jobs_per_second"],
+        "crashed_jobs_retried": report["crash"]["ok"] == report["crash"]["jobs"] and report["crash"]["retried"] > 0,
+        "crash_recovered_within_lease": report["crash"]["seconds_after_kill"] < LEASE + HEARTBEAT + 4.0,
+        "cancel_stops_running_job": report["cancel"]["outcome"] == "cancelled" and report["cancel"]["seconds"] < 2.0,
+        "admission_bounded": report["admission"] == {"accepted": 4, "rejected": 4},
+    }
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--jobs", type=int, default=24, help="jobs per scaling run")
+    ap.add_argument("--job-seconds", type=float, default=0.2, help="fake job run time")
+    ap.add_argument("--nodes", default="1,2,4", help="worker node counts for the scaling runs")
+    ap.add_argument("--concurrency", type=int, default=2, help="jobs at once per node")
+    ap.add_argument("--backends", default="sqlite,redis")
+    args = ap.parse_args()
+    args.nodes = [int(n) for n in args.nodes.split(",")]
+
+    # nodes count as alive for 3 heartbeats; keep it short for the run
+    os.environ["JOB_HEARTBEAT"] = str(HEARTBEAT)
+    report, ok = {}, True
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends.split(","):
+            if backend == "sqlite":
+                report["sqlite"] = run_backend(f"sqlite:///{tmp}/jobs.sqlite3", args)
+            elif backend == "redis":
+                with FakeRedis() as server:
+                    report["redis"] = run_backend(server.url, args)
+                    report["redis"]["commands"] = server.commands
+            ok = ok and all(report[backend]["checks"].values())
+    print(json.dumps(report, indent=2))
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
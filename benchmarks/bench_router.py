@@ -0,0 +1,203 @@
+# benchmarks/bench_router.py
+"""
+Accuracy and latency of the embedding tool router (router.py).
+
+    python -m benchmarks.bench_router                       # offline: bag-of-words embeddings
+    python -m benchmarks.bench_router --embeddings ollama   # the real embedding model (needs Ollama)
+    python -m benchmarks.bench_router --thresholds 0.6,0.7,0.8 --agent-requests 24 --llm-latency 0.3
+
+1. Routing quality on a held-out labeled question set (not the router's own
+   examples), for each threshold: coverage (share of routable questions sent
+   straight to a tool), precision of the routed ones, misroutes, and route()
+   latency.
+2. End-to-end run_agent against benchmarks.fake_ollama with fake tools,
+   router off vs on: LLM rounds and p50 latency per query, i.e. the time the
+   skipped first round saves.
+
+The offline "bow" embeddings are hashed bags of words: they only see word
+overlap, so they understate what a real embedding model does on paraphrases.
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Held-out questions, labeled with the tool a good first step would use
+EVAL_SET = [
+    ("How heavy a payload can Agnibaan lift?", "agnikul_rag_search"),
+    ("Who are the founders of Agnikul?", "agnikul_rag_search"),
+    ("Where does Agnikul launch its rockets from?", "agnikul_rag_search"),
+    ("Tell me about the Agnilet engine design", "agnikul_rag_search"),
+    ("Which city is Agnikul Cosmos based in?", "agnikul_rag_search"),
+    ("Who has invested in Agnikul Cosmos?", "agnikul_rag_search"),
+    ("How are Agnikul engines 3D printed?", "agnikul_rag_search"),
+    ("What is Agnikul's competitive edge over other launch providers?", "agnikul_rag_search"),
+    ("What is the flight testing status of Agnibaan?", "agnikul_rag_search"),
+    ("How does Agnikul hire engineers?", "agnikul_rag_search"),
+    ("What is the legal name of Agnikul?", "agnikul_rag_search"),
+    ("Does Agnikul work with IN-SPACe?", "agnikul_rag_search"),
+    ("Latest Agnikul news", "duckduckgo_search"),
+    ("Any recent news on Agnikul's next launch?", "duckduckgo_search"),
+    ("What is the latest update from Agnikul this month?", "duckduckgo_search"),
+    ("Today's headlines about Indian private rocket companies", "duckduckgo_search"),
+    ("Has Agnikul announced anything new recently?", "duckduckgo_search"),
+    ("Current news on Skyroot and Agnikul", "duckduckgo_search"),
+    ("Who was Satish Dhawan?", "wikipedia_search"),
+    ("What is a geostationary orbit?", "wikipedia_search"),
+    ("Find research papers on rotating detonation engines", "arxiv_search"),
+    ("Academic papers about 3D printed combustion chambers", "arxiv_search"),
+    ("Look up the entry vaswani2017 in refs.bib", "bibtex"),
+    ("Good morning!", "none"),
+    ("Write a short poem about the moon", "none"),
+]
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOP = {"a", "an", "the", "of", "to", "in", "on", "for", "is", "are", "was", "what", "who", "how", "does",
+         "do", "and", "about", "its", "it", "any", "me", "can", "this", "which", "has", "with", "from"}
+
+
+class BowEmbeddings:
+    """Hashed bag-of-words vectors (signed feature hashing), deterministic and offline."""
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def _vec(self, text: str):
+        v = np.zeros(self.dim, dtype=np.float32)
+        for w in _WORD_RE.findall(text.lower()):
+            if w in _STOP:
+                continue
+            w = w[:-1] if len(w) > 4 and w.endswith("s") else w
+            h = int(hashlib.md5(w.encode("utf-8")).hexdigest()[:8], 16)
+            v[h % self.dim] += 1.0 if (h >> 20) & 1 else -1.0
+        return v.tolist()
+
+    def embed_documents(self, texts):
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vec(text)
+
+
+def _embeddings(kind: str):
+    if kind == "bow":
+        return BowEmbeddings()
+    from vector import embeddings
+    return embeddings
+
+
+def evaluate(embeddings, thresholds, margin: float) -> list:
+    from router import ToolRouter, ROUTABLE_TOOLS
+
+    rows = []
+    for threshold in thresholds:
+        router = ToolRouter(embeddings=embeddings, threshold=threshold, margin=margin)
+        router.route("warm up")   # example embeddings
+        routable = [q for q, label in EVAL_SET if label in ROUTABLE_TOOLS]
+        routed = correct = misroutes = 0
+        latencies = []
+        for question, label in EVAL_SET:
+            t = time.perf_counter()
+            decision = router.route(question)
+            latencies.append(time.perf_counter() - t)
+            if decision["routed"]:
+                routed += 1
+                if decision["tool"] == label:
+                    correct += 1
+                else:
+                    misroutes += 1
+        latencies.sort()
+        rows.append({
+            "threshold": threshold,
+            "margin": margin,
+            "coverage": round(correct / len(routable), 3),
+            "precision": round(correct / routed, 3) if routed else None,
+            "routed": routed,
+            "misroutes": misroutes,
+            "route_p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        })
+    return rows
+
+
+def agent_latency(embeddings, threshold: float, margin: float, requests: int, llm_latency: float,
+                  tool_latency: float) -> dict:
+    """run_agent over the routable eval questions with the router off, then on."""
+    from benchmarks.fake_ollama import FakeOllama
+
+    workdir = tempfile.mkdtemp(prefix="router_bench_")
+    server = FakeOllama(latency=llm_latency).start()
+    os.environ["OLLAMA_HOST"] = server.url
+    os.environ["OLLAMA_BASE_URL"] = server.url
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import router
+        import agent
+        from tools.cache import bypass_cache
+        from benchmarks.fakes import install_fake_tools
+
+        install_fake_tools(latency=tool_latency)
+        router.tool_router = router.ToolRouter(embeddings=embeddings, threshold=threshold, margin=margin)
+        router.tool_router.route("warm up")
+        questions = [q for q, label in EVAL_SET if label in router.ROUTABLE_TOOLS]
+
+        report = {}
+        for mode in ("off", "on"):
+            router.TOOL_ROUTER = mode
+            before = server.snapshot()
+            latencies = []
+            for i in range(requests):
+                t = time.perf_counter()
+                with bypass_cache():
+                    agent.run_agent(questions[i % len(questions)])
+                latencies.append(time.perf_counter() - t)
+            after = server.snapshot()
+            latencies.sort()
+            report[f"router_{mode}"] = {
+                "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+                "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+                "llm_rounds_per_query": round((after["agent_rounds"] - before["agent_rounds"]) / requests, 3),
+            }
+        report["saved_p50_ms"] = round(report["router_off"]["p50_ms"] - report["router_on"]["p50_ms"], 2)
+        return report
+    finally:
+        server.stop()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--embeddings", choices=("bow", "ollama"), default="bow")
+    ap.add_argument("--thresholds", default="0.3,0.4,0.5,0.6,0.7,0.8,0.9")
+    ap.add_argument("--margin", type=float, default=0.04)
+    ap.add_argument("--agent-threshold", type=float, default=0.5,
+                    help="threshold for the end-to-end run (bow similarities run lower than a real model's)")
+    ap.add_argument("--agent-requests", type=int, default=18, help="run_agent calls per mode (0 = skip)")
+    ap.add_argument("--llm-latency", type=float, default=0.2, help="fake Ollama seconds per completion")
+    ap.add_argument("--tool-latency", type=float, default=0.05)
+    args = ap.parse_args()
+
+    os.environ.setdefault("TOOLS_WARM_UP", "off")
+    embeddings = _embeddings(args.embeddings)
+    thresholds = [float(t) for t in args.thresholds.split(",")]
+    report = {"embeddings": args.embeddings, "questions": len(EVAL_SET),
+              "routing": evaluate(embeddings, thresholds, args.margin)}
+    if args.agent_requests:
+        report["agent"] = agent_latency(embeddings, args.agent_threshold, args.margin, args.agent_requests,
+                                        args.llm_latency, args.tool_latency)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
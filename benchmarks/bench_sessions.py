@@ -0,0 +1,165 @@
+# benchmarks/bench_sessions.py
+"""
+Self-check and benchmark for conversation sessions (sessions.py): prompt size
+and reuse over a long conversation, and session store limits.
+
+    python -m benchmarks.bench_sessions --turns 24 --history-tokens 1500
+
+1. A --turns conversation through run_agent against benchmarks.fake_ollama
+   with fake tools (router off). Questions cycle over a few topics, so later
+   turns ask about things earlier turns already looked up. Three runs:
+     stateless   no session: every question starts from nothing
+     unbounded   a session that is never compacted
+     session     a session compacted at --history-tokens
+   Per run: prompt characters of each turn's first LLM round (the largest
+   ones near the end), prompt tokens the fake actually had to evaluate (the
+   rest is a reused cached prefix), and tool executions vs tool results
+   reused from earlier turns.
+2. SessionStore limits: --sessions sessions with a few turns each under a
+   memory limit, and a TTL sweep.
+
+Exits non-zero if a check fails (prompt not flat, no reuse, limits exceeded).
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TOPICS = ["Agnibaan payload", "Agnilet engine", "Agnikul founders", "Sriharikota launch pad"]
+ANSWER = ("{topic}: Agnikul Cosmos is a Chennai-based launch company. Its {topic} details come from the "
+          "company's published material. The vehicle is built around 3D-printed semi-cryogenic engines. "
+          "Launches are planned from its own private pad. Further figures are in the cited sources. ")
+
+
+def script(prompt: str) -> str:
+    """Fake LLM: tool call for a new question, answer after a tool result (answer repeats the topic)."""
+    last = prompt.rsplit("<user>", 1)[-1]
+    topic = next((t for t in TOPICS if t.lower() in last.lower()), TOPICS[0])
+    if last.startswith("Tool result:"):
+        return ANSWER.format(topic=topic) * 2
+    return json.dumps({"tool": "agnikul_rag_search", "input": topic})
+
+
+def conversation(agent, tracing, turns: int, mode: str, server) -> dict:
+    from sessions import Session
+    from tools.cache import bypass_cache
+
+    session = Session(mode) if mode != "stateless" else None
+    rows = []
+    for i in range(turns):
+        question = f"Turn {i}: and what about the {TOPICS[i % len(TOPICS)]}?"
+        before = server.snapshot()
+        turn = {} if session else None
+        with tracing.start_trace(f"{mode}-{i}") as trace, bypass_cache():
+            agent.run_agent(question, session.context() if session else None, turn)
+        if session:
+            session.add_turn(question, turn)
+        spans = trace.to_dict()["spans"]
+        llm = [s for s in spans if s["name"] == "llm"]
+        tools = [s for s in spans if s["name"] == "tool"]
+        rows.append({"prompt_chars": llm[0]["prompt_chars"],
+                     "prompt_eval_tokens": server.snapshot()["prompt_eval_tokens"] - before["prompt_eval_tokens"],
+                     "tool_runs": sum(1 for s in tools if s["status"] != "session"),
+                     "tool_reused": sum(1 for s in tools if s["status"] == "session")})
+    tail = rows[-max(1, turns // 4):]
+    return {
+        "turns": turns,
+        "first_prompt_chars": [r["prompt_chars"] for r in rows[:3]],
+        "last_prompt_chars": [r["prompt_chars"] for r in tail],
+        "max_prompt_chars": max(r["prompt_chars"] for r in rows),
+        "prompt_eval_tokens_per_turn": round(sum(r["prompt_eval_tokens"] for r in rows) / turns, 1),
+        "tool_runs": sum(r["tool_runs"] for r in rows),
+        "tool_reused": sum(r["tool_reused"] for r in rows),
+        "compactions": session.compactions if session else 0,
+        "session_bytes": session.size() if session else 0,
+    }
+
+
+def store_limits(n: int, max_bytes: int) -> dict:
+    from sessions import SessionStore
+
+    store = SessionStore(ttl=3600, max_sessions=n, max_bytes=max_bytes)
+    peak = 0
+    t = time.perf_counter()
+    for i in range(n):
+        session = store.get_or_create(f"s{i}")
+        for j in range(3):
+            session.add_turn(f"question {j} of {i}", {"answer": ANSWER.format(topic=TOPICS[j % len(TOPICS)])})
+        store.update(session)
+        peak = max(peak, store.stats()["bytes"])
+    per_session_us = (time.perf_counter() - t) / n * 1e6
+    held = store.stats()
+    newest_kept = store.get(f"s{n - 1}") is not None
+    oldest_dropped = store.get("s0") is None
+
+    store.ttl = 0.05
+    time.sleep(0.1)
+    store.get("anything")   # lookups sweep expired sessions
+    return {"created": n, "held": held["sessions"], "bytes": held["bytes"], "max_bytes": max_bytes,
+            "peak_bytes": peak, "newest_kept": newest_kept, "oldest_dropped": oldest_dropped,
+            "after_ttl": store.stats()["sessions"], "us_per_session": round(per_session_us, 1)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--turns", type=int, default=24)
+    ap.add_argument("--history-tokens", type=int, default=1500, help="SESSION_HISTORY_TOKENS for the run")
+    ap.add_argument("--tool-output-chars", type=int, default=1200, help="fake tool result size")
+    ap.add_argument("--sessions", type=int, default=5000, help="sessions for the store limits check")
+    ap.add_argument("--max-bytes", type=int, default=2 * 1024 * 1024, help="SessionStore memory limit")
+    args = ap.parse_args()
+
+    os.environ.setdefault("TOOLS_WARM_UP", "off")
+    os.environ["TOOL_ROUTER"] = "off"
+    from benchmarks.fake_ollama import FakeOllama
+
+    workdir = tempfile.mkdtemp(prefix="sessions_bench_")
+    server = FakeOllama(script=script).start()
+    os.environ["OLLAMA_HOST"] = server.url
+    os.environ["OLLAMA_BASE_URL"] = server.url
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import agent
+        import tracing
+        import sessions
+        from benchmarks.fakes import install_fake_tools
+
+        install_fake_tools(latency=0.01, output_chars=args.tool_output_chars)
+        report = {}
+        for mode, budget in (("stateless", args.history_tokens), ("unbounded", 10 ** 9),
+                             ("session", args.history_tokens)):
+            sessions.SESSION_HISTORY_TOKENS = budget
+            report[mode] = conversation(agent, tracing, args.turns, mode, server)
+    finally:
+        server.stop()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    report["store"] = store_limits(args.sessions, args.max_bytes)
+
+    s, u, store = report["session"], report["unbounded"], report["store"]
+    # bounded: system prompt + summary + verbatim budget + this turn's question (~4 chars per token)
+    bound = report["stateless"]["max_prompt_chars"] + 4 * (args.history_tokens + sessions.SESSION_SUMMARY_TOKENS)
+    report["checks"] = {
+        "prompt_bounded": s["max_prompt_chars"] <= bound,
+        "prompt_flat": max(s["last_prompt_chars"]) <= bound and u["max_prompt_chars"] > s["max_prompt_chars"],
+        "compacted": s["compactions"] > 0,
+        "tool_results_reused": s["tool_reused"] > 0 and s["tool_runs"] < report["stateless"]["tool_runs"],
+        "prefix_reused": s["prompt_eval_tokens_per_turn"] < s["max_prompt_chars"] / 4,
+        "store_within_memory": store["peak_bytes"] <= store["max_bytes"] and store["bytes"] <= store["max_bytes"],
+        "store_lru": store["newest_kept"] and store["oldest_dropped"],
+        "store_ttl": store["after_ttl"] == 0,
+    }
+    print(json.dumps(report, indent=2))
+    if not all(report["checks"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# benchmarks/bench_tool_faults.py
+"""
+Self-check for tool timeouts, circuit breakers and hedged calls in the agent
+(agent._run_tool_calls / _arun_tool_call) against a hung upstream.
+
+    python -m benchmarks.bench_tool_faults --timeout 2 --hedge-after 0.5 --calls 6
+
+wikipedia_search goes through the real tool and HTTP transport to a local
+socket that accepts connections and never answers; duckduckgo_search is a
+fake that answers after --ddg-latency seconds. Three phases:
+
+  1. hedging off: every call times out; the report checks each returns at its
+     deadline and that the tool's thread has stopped by then (no retries left
+     running in the background), and that the circuit opens after
+     CIRCUIT_FAILURES timeouts so later calls fail fast.
+  2. hedging on, circuit open: the call is answered by duckduckgo_search at once.
+  3. hedging on, circuit closed: duckduckgo_search is started after
+     --hedge-after seconds and answers; the Wikipedia attempt is cancelled.
+
+Exits non-zero if a check fails.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _black_hole() -> str:
+    """A server that accepts connections and never replies; returns its base URL."""
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(64)
+    held = []
+
+    def accept():
+        while True:
+            held.append(srv.accept())
+
+    threading.Thread(target=accept, name="black-hole", daemon=True).start()
+    return f"http://127.0.0.1:{srv.getsockname()[1]}"
+
+
+def run(args) -> dict:
+    os.environ.setdefault("TOOLS_WARM_UP", "off")
+    os.environ.setdefault("TOOL_ROUTER", "off")
+    import agent
+    import tools.wiki_tool as wiki_tool
+    from tools.registry import override_backend
+    from tools.cache import bypass_cache
+    from tools.circuit import breakers, CIRCUIT_FAILURES
+
+    wiki_tool.WIKI_API_URL = _black_hole() + "/w/api.php"
+    finished = {}
+
+    def wiki(query):
+        try:
+            return wiki_tool.wiki_search(query)
+        finally:
+            finished[query] = time.time()
+
+    def ddg(query):
+        time.sleep(args.ddg_latency)
+        return f"DDG result for {query}"
+
+    override_backend("wikipedia_search", wiki)
+    override_backend("duckduckgo_search", ddg)
+    agent.TOOL_TIMEOUTS["wikipedia_search"] = args.timeout
+    agent.TOOL_HEDGE_AFTER = args.hedge_after
+    call = lambda q: {"tool": "wikipedia_search", "input": q}
+
+    report = {"timeout": args.timeout, "hedge_after": args.hedge_after, "circuit_failures": CIRCUIT_FAILURES}
+    with bypass_cache():
+        # 1. no hedging: timeouts, then the circuit opens
+        agent.TOOL_HEDGING = False
+        phase = []
+        for i in range(args.calls):
+            query = f"hung {i}"
+            t = time.time()
+            outcome = agent._run_tool_calls([call(query)])[0]
+            returned = time.time()
+            time.sleep(0.2)   # a cancelled attempt may need a moment to unwind
+            phase.append({"status": outcome["status"], "seconds": round(returned - t, 3),
+                          "thread_stopped_after": round(finished[query] - t, 3) if query in finished else None,
+                          "circuit": breakers.get("wikipedia_search").state})
+        report["no_hedging"] = phase
+
+        # 2. hedging, circuit still open: straight to the equivalent tool
+        agent.TOOL_HEDGING = True
+        t = time.time()
+        outcome = agent._run_tool_calls([call("open circuit")])[0]
+        report["hedge_circuit_open"] = {"status": outcome["status"], "seconds": round(time.time() - t, 3),
+                                        "output": outcome["output"][:100]}
+
+        # 3. hedging, circuit closed: hedge after the threshold (async path)
+        breakers.get("wikipedia_search").record_success()
+        t = time.time()
+        outcome = asyncio.run(agent._arun_tool_call(call("slow")))
+        report["hedge_slow"] = {"status": outcome["status"], "seconds": round(time.time() - t, 3),
+                                "output": outcome["output"][:100]}
+        time.sleep(args.timeout + 0.5)
+        report["hedge_slow"]["loser_stopped"] = "slow" in finished
+
+    timed_out = [p for p in phase if p["status"] == "timeout"]
+    fast = phase[CIRCUIT_FAILURES:]
+    report["checks"] = {
+        "timeouts_return_at_deadline": all(p["seconds"] < args.timeout + 0.5 for p in timed_out),
+        "threads_stop_at_deadline": all(p["thread_stopped_after"] is not None
+                                        and p["thread_stopped_after"] < args.timeout + 0.5 for p in timed_out),
+        "circuit_opens": len(timed_out) == min(CIRCUIT_FAILURES, args.calls) and phase[-1]["circuit"] == "open",
+        "open_circuit_fails_fast": all(p["status"] == "error" and p["seconds"] < 0.5 for p in fast),
+        "hedge_on_open_circuit": report["hedge_circuit_open"]["status"] == "ok"
+                                 and report["hedge_circuit_open"]["seconds"] < args.ddg_latency + 0.5,
+        "hedge_on_slow_tool": report["hedge_slow"]["status"] == "ok"
+                              and report["hedge_slow"]["seconds"] < args.hedge_after + args.ddg_latency + 0.5,
+        "hedge_loser_stopped": report["hedge_slow"]["loser_stopped"],
+    }
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--timeout", type=float, default=2.0, help="wikipedia_search timeout (seconds)")
+    ap.add_argument("--hedge-after", type=float, default=0.5, help="TOOL_HEDGE_AFTER for the run")
+    ap.add_argument("--ddg-latency", type=float, default=0.2, help="fake duckduckgo_search seconds per call")
+    ap.add_argument("--calls", type=int, default=5, help="calls to the hung tool with hedging off")
+    args = ap.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if not all(report["checks"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
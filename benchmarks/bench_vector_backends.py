@@ -0,0 +1,135 @@
+# benchmarks/bench_vector_backends.py
+"""
+Compare the Chroma and NumPy vector backends on synthetic data.
+
+    python -m benchmarks.bench_vector_backends --docs 50000 --dim 1024 --queries 200
+
+Each backend is built once, then opened in a fresh process that measures
+cold start (open the store), top-k query latency and peak RSS. Embeddings
+are deterministic pseudo-random unit vectors, so no Ollama server is needed.
+Prints one JSON object per backend/dtype.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import resource
+import tempfile
+import subprocess
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic stand-in: text -> seeded random vector."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def _vec(self, text: str):
+        seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).standard_normal(self.dim, dtype=np.float32).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vec(text)
+
+
+def _open_store(backend: str, path: str, dim: int, dtype: str):
+    emb = HashEmbeddings(dim)
+    if backend == "numpy":
+        from numpy_index import NumpyVectorStore
+        return NumpyVectorStore(path=path, embedding_function=emb, dtype=dtype)
+    from langchain_chroma import Chroma
+    return Chroma(persist_directory=path, embedding_function=emb, collection_name="bench")
+
+
+def build(backend: str, path: str, docs: int, dim: int, dtype: str, batch: int = 1000):
+    store = _open_store(backend, path, dim, dtype)
+    for start in range(0, docs, batch):
+        texts = [f"document {i}" for i in range(start, min(docs, start + batch))]
+        store.add_texts(texts, ids=[str(i) for i in range(start, start + len(texts))])
+    if hasattr(store, "persist"):
+        store.persist()
+
+
+def measure(backend: str, path: str, dim: int, dtype: str, queries: int, k: int) -> dict:
+    t0 = time.perf_counter()
+    store = _open_store(backend, path, dim, dtype)
+    store.similarity_search("warm up", k=k)
+    cold_start = time.perf_counter() - t0
+
+    latencies = []
+    for i in range(queries):
+        t = time.perf_counter()
+        store.similarity_search(f"query {i}", k=k)
+        latencies.append(time.perf_counter() - t)
+    lat = np.array(latencies) * 1000
+    return {
+        "backend": backend,
+        "dtype": dtype if backend == "numpy" else "float32",
+        "cold_start_s": round(cold_start, 4),
+        "query_p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "query_p95_ms": round(float(np.percentile(lat, 95)), 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--docs", type=int, default=20000)
+    ap.add_argument("--dim", type=int, default=1024)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("-k", type=int, default=5)
+    ap.add_argument("--backends", default="chroma,numpy")
+    ap.add_argument("--dtypes", default="float32,float16,int8", help="dtypes tried for the numpy backend")
+    # internal: run one phase in this process
+    ap.add_argument("--phase", choices=["build", "measure"])
+    ap.add_argument("--backend")
+    ap.add_argument("--path")
+    ap.add_argument("--dtype", default="float32")
+    args = ap.parse_args()
+
+    if args.phase == "build":
+        build(args.backend, args.path, args.docs, args.dim, args.dtype)
+        return
+    if args.phase == "measure":
+        print(json.dumps(measure(args.backend, args.path, args.dim, args.dtype, args.queries, args.k)))
+        return
+
+    workdir = tempfile.mkdtemp(prefix="bench_vectors_")
+    try:
+        runs = []
+        for backend in args.backends.split(","):
+            for dtype in (args.dtypes.split(",") if backend == "numpy" else ["float32"]):
+                runs.append((backend, dtype))
+        for backend, dtype in runs:
+            path = os.path.join(workdir, f"{backend}_{dtype}")
+            common = [sys.executable, "-m", "benchmarks.bench_vector_backends", "--backend", backend,
+                      "--path", path, "--dtype", dtype, "--docs", str(args.docs), "--dim", str(args.dim),
+                      "--queries", str(args.queries), "-k", str(args.k)]
+            try:
+                t = time.perf_counter()
+                subprocess.run(common + ["--phase", "build"], check=True)
+                build_s = time.perf_counter() - t
+                out = subprocess.run(common + ["--phase", "measure"], check=True,
+                                     capture_output=True, text=True).stdout
+                result = json.loads(out.strip().splitlines()[-1])
+                result.update({"docs": args.docs, "dim": args.dim, "build_s": round(build_s, 2)})
+            except (subprocess.CalledProcessError, ValueError) as e:
+                result = {"backend": backend, "dtype": dtype, "error": str(e)}
+            print(json.dumps(result))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
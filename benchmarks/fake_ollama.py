@@ -0,0 +1,284 @@
+# benchmarks/fake_ollama.py
+"""
+Local stand-in for the Ollama HTTP API, for offline benchmarks.
+
+Implements /api/generate, /api/chat (streaming and not), /api/embed,
+/api/embeddings, /api/tags and /api/version. Completions come from a
+script: an ordered list of (substring, response) rules matched against the
+prompt, so an agent run is deterministic. Latency is configurable as a fixed
+per-request delay plus a per-output-token delay.
+
+Like Ollama, the server keeps the recent contexts (prompt + completion) per
+model and reports prompt_eval_count only for the part of a prompt that is not
+a prefix of one of them (~4 characters per token), so prompt reuse shows up
+in the token counts.
+
+Requests with "format": "json" get JSON back (a prose response is wrapped as
+{"answer": ...}). `tail_tokens` makes JSON responses run on after the closing
+brace the way small models do (whitespace in JSON mode, prose otherwise);
+eval_count only counts tokens actually sent, so a client that stops reading
+early shows up as fewer generated tokens.
+
+    python -m benchmarks.fake_ollama --port 11434 --latency 0.2 --token-latency 0.005
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional, Tuple, Union
+
+import numpy as np
+
+EMBED_DIM = 64
+CONTEXT_SLOTS = 8      # cached contexts kept per model (Ollama keeps one per parallel slot)
+CHARS_PER_TOKEN = 4
+
+# Default script for the Agnikul agent (first matching rule wins):
+#  - summarizer prompt in rag_tool  -> short summary with sources
+#  - agent round with a tool result -> final answer
+#  - agent round, first step        -> RAG tool call
+DEFAULT_SCRIPT: List[Tuple[str, str]] = [
+    ("### CONTEXT:", "Agnikul builds the Agnibaan launch vehicle powered by Agnilet engines.\n\nSources: Agnikul official site"),
+    ("Tool result:", "Agnikul Cosmos builds Agnibaan, a customizable launch vehicle with 3D-printed Agnilet engines."),
+    ("", '{"tool": "agnikul_rag_search", "input": "Agnibaan payload"}'),
+]
+TAIL_TEXT = "I will use this tool to look up the answer and then summarize what it returns for you."
+
+
+def fake_embedding(text: str, dim: int = EMBED_DIM) -> List[float]:
+    """Deterministic unit vector per text."""
+    seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+    v = np.random.default_rng(seed).standard_normal(dim)
+    return (v / np.linalg.norm(v)).tolist()
+
+
+class FakeOllama:
+    """
+    Threaded fake Ollama server. Use as a context manager:
+
+        with FakeOllama(latency=0.1) as server:
+            os.environ["OLLAMA_HOST"] = server.url
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 script: Optional[Union[List[Tuple[str, str]], Callable[[str], str]]] = None,
+                 latency: float = 0.0, token_latency: float = 0.0, embed_latency: float = 0.0,
+                 tail_tokens: int = 0):
+        self.script = script or DEFAULT_SCRIPT
+        self.tail_tokens = tail_tokens
+        self.latency = latency
+        self.token_latency = token_latency
+        self.embed_latency = embed_latency
+        self.counts = {"generate": 0, "chat": 0, "embed": 0, "agent_rounds": 0,
+                       "prompt_eval_tokens": 0, "eval_tokens": 0}
+        self._contexts = {}    # model -> recent prompt+completion strings, newest last
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.counts[key] += n
+
+    def _prompt_eval(self, model: str, prompt: str, completion: str) -> int:
+        """Tokens of `prompt` not covered by a cached context; caches prompt + completion."""
+        with self._lock:
+            contexts = self._contexts.setdefault(model, [])
+            reused = max((len(os.path.commonprefix([prompt, c])) for c in contexts), default=0)
+            contexts.append(prompt + completion)
+            del contexts[:-CONTEXT_SLOTS]
+        return max(1, (len(prompt) - reused) // CHARS_PER_TOKEN)
+
+    def respond(self, prompt: str) -> str:
+        if callable(self.script):
+            return self.script(prompt)
+        for needle, response in self.script:
+            if needle in prompt:
+                return response
+        return ""
+
+    def completion_tokens(self, text: str, json_mode: bool) -> List[str]:
+        """Output tokens (words) for a response, with the run-on tail after a JSON object."""
+        tokens = [t for t in text.replace(" ", " \0").split("\0") if t] or [""]
+        if self.tail_tokens and text.lstrip().startswith("{"):
+            if json_mode:
+                tokens += ["\n"] * self.tail_tokens
+            else:
+                words = TAIL_TEXT.split(" ")
+                tokens += ["\n\n"] + [" " + words[i % len(words)] for i in range(self.tail_tokens - 1)]
+        return tokens
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, payload: dict, status: int = 200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self) -> dict:
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    return self._json({"models": [{"name": "gemma3:latest"}, {"name": "mxbai-embed-large"}]})
+                if self.path == "/api/version":
+                    return self._json({"version": "0.0.0-fake"})
+                self._json({"error": "not found"}, 404)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                req = self._body()
+                if self.path in ("/api/embed", "/api/embeddings"):
+                    return self._embed(req)
+                if self.path == "/api/generate":
+                    fake._count("generate")
+                    prompt = req.get("prompt", "")
+                    return self._complete(req, prompt, chat=False)
+                if self.path == "/api/chat":
+                    fake._count("chat")
+                    prompt = "\n".join(f"<{m.get('role', '')}>{m.get('content', '')}" for m in req.get("messages", []))
+                    return self._complete(req, prompt, chat=True)
+                self._json({"error": "not found"}, 404)
+
+            def _embed(self, req: dict):
+                texts = req.get("input", req.get("prompt", ""))
+                single = isinstance(texts, str)
+                texts = [texts] if single else list(texts)
+                fake._count("embed", len(texts))
+                if fake.embed_latency:
+                    time.sleep(fake.embed_latency)
+                vectors = [fake_embedding(t) for t in texts]
+                if self.path == "/api/embeddings":
+                    return self._json({"embedding": vectors[0]})
+                return self._json({"model": req.get("model", ""), "embeddings": vectors})
+
+            def _complete(self, req: dict, prompt: str, chat: bool):
+                if "You have access to the following tools" in prompt:
+                    fake._count("agent_rounds")
+                text = fake.respond(prompt)
+                json_mode = req.get("format") == "json"
+                if json_mode:
+                    try:
+                        json.loads(text)
+                    except ValueError:
+                        text = json.dumps({"answer": text})
+                if fake.latency:
+                    time.sleep(fake.latency)
+                tokens = fake.completion_tokens(text, json_mode)
+                model = req.get("model", "")
+                prompt_eval = fake._prompt_eval(model, prompt, f"\n<assistant>{text}" if chat else text)
+                fake._count("prompt_eval_tokens", prompt_eval)
+                stats = {"prompt_eval_count": prompt_eval, "eval_count": len(tokens),
+                         "total_duration": 0, "load_duration": 0, "eval_duration": 0, "prompt_eval_duration": 0}
+
+                def frame(piece: str, done: bool) -> dict:
+                    out = {"model": model, "created_at": "1970-01-01T00:00:00Z", "done": done}
+                    if chat:
+                        out["message"] = {"role": "assistant", "content": piece}
+                    else:
+                        out["response"] = piece
+                    if done:
+                        out.update(stats, done_reason="stop")
+                        if not chat:
+                            out["context"] = [1, 2, 3]
+                    return out
+
+                if not req.get("stream", True):
+                    time.sleep(fake.token_latency * len(tokens))
+                    fake._count("eval_tokens", len(tokens))
+                    return self._json(frame("".join(tokens), True))
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for tok in tokens:
+                        if fake.token_latency:
+                            time.sleep(fake.token_latency)
+                        self._chunk(json.dumps(frame(tok, False)) + "\n")
+                        fake._count("eval_tokens")
+                    self._chunk(json.dumps(frame("", True)) + "\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # client stopped reading (e.g. early stop on a complete tool call)
+                    self.close_connection = True
+
+            def _chunk(self, data: str):
+                raw = data.encode("utf-8")
+                self.wfile.write(f"{len(raw):x}\r\n".encode() + raw + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11434)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds per completion request")
+    ap.add_argument("--token-latency", type=float, default=0.0, help="seconds per streamed token")
+    ap.add_argument("--embed-latency", type=float, default=0.0, help="seconds per embed request")
+    ap.add_argument("--tail-tokens", type=int, default=0, help="tokens generated after a JSON response")
+    ap.add_argument("--script", help="JSON file with [[substring, response], ...] rules")
+    args = ap.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script = [tuple(rule) for rule in json.load(f)]
+    server = FakeOllama(args.host, args.port, script=script, latency=args.latency,
+                        token_latency=args.token_latency, embed_latency=args.embed_latency,
+                        tail_tokens=args.tail_tokens)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# benchmarks/fake_redis.py
+"""
+Local stand-in for a Redis server, for offline benchmarks of the shared job
+store (jobstore.RedisJobStore).
+
+Speaks RESP2 over TCP and implements the commands the job store uses:
+PING, AUTH, SELECT, FLUSHDB, EXISTS, DEL, EXPIRE, HSET, HSETNX, HGET, HMGET,
+HGETALL, HINCRBY, HDEL, ZADD (NX/XX/CH), ZREM, ZCARD, ZRANK, ZSCORE, ZRANGE
+and ZRANGEBYSCORE. Every command runs under one lock, so each is atomic as in
+Redis; keys expire lazily. Not persistent.
+
+    python -m benchmarks.fake_redis --port 6379
+"""
+import time
+import argparse
+import threading
+import socketserver
+from typing import Dict, Optional
+
+
+class _Error(Exception):
+    pass
+
+
+class FakeRedis:
+    """Threaded RESP server over an in-memory keyspace; counts commands served."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.data: Dict[str, object] = {}
+        self.expires: Dict[str, float] = {}
+        self.commands = 0
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-redis", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---- keyspace ----
+    def _get(self, key: str, kind: type):
+        if key in self.expires and self.expires[key] <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        value = self.data.get(key)
+        if value is not None and not isinstance(value, kind):
+            raise _Error("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _hash(self, key: str, create: bool = False) -> Optional[dict]:
+        h = self._get(key, dict)
+        if h is None and create:
+            h = self.data[key] = {}
+        return h
+
+    _zset = _hash   # member -> score
+
+    def _drop_if_empty(self, key: str):
+        if not self.data.get(key):
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+
+    @staticmethod
+    def _ranked(z: dict) -> list:
+        return sorted(z, key=lambda m: (z[m], m))
+
+    @staticmethod
+    def _bound(s: str) -> float:
+        return {"-inf": float("-inf"), "+inf": float("inf"), "inf": float("inf")}.get(s) or float(s)
+
+    def execute(self, name: str, *args: str):
+        with self._lock:
+            self.commands += 1
+            handler = getattr(self, f"cmd_{name.lower()}", None)
+            if handler is None:
+                raise _Error(f"ERR unknown command '{name}'")
+            return handler(*args)
+
+    # ---- commands ----
+    def cmd_ping(self, *args):
+        return args[0] if args else "PONG"
+
+    def cmd_auth(self, *args):
+        return "OK"
+
+    def cmd_select(self, db):
+        return "OK"
+
+    def cmd_flushdb(self):
+        self.data.clear()
+        self.expires.clear()
+        return "OK"
+
+    def cmd_exists(self, *keys):
+        return sum(1 for k in keys if self._get(k, object) is not None)
+
+    def cmd_del(self, *keys):
+        n = 0
+        for k in keys:
+            if self._get(k, object) is not None:
+                del self.data[k]
+                self.expires.pop(k, None)
+                n += 1
+        return n
+
+    def cmd_expire(self, key, seconds):
+        if self._get(key, object) is None:
+            return 0
+        self.expires[key] = time.time() + int(seconds)
+        return 1
+
+    def cmd_hset(self, key, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise _Error("ERR wrong number of arguments for 'hset' command")
+        h = self._hash(key, create=True)
+        added = sum(1 for f in pairs[::2] if f not in h)
+        h.update(zip(pairs[::2], pairs[1::2]))
+        return added
+
+    def cmd_hsetnx(self, key, field, value):
+        h = self._hash(key, create=True)
+        if field in h:
+            return 0
+        h[field] = value
+        return 1
+
+    def cmd_hget(self, key, field):
+        return (self._hash(key) or {}).get(field)
+
+    def cmd_hmget(self, key, *fields):
+        h = self._hash(key) or {}
+        return [h.get(f) for f in fields]
+
+    def cmd_hgetall(self, key):
+        return [x for kv in (self._hash(key) or {}).items() for x in kv]
+
+    def cmd_hincrby(self, key, field, n):
+        h = self._hash(key, create=True)
+        try:
+            h[field] = str(int(h.get(field) or 0) + int(n))
+        except ValueError:
+            raise _Error("ERR hash value is not an integer")
+        return int(h[field])
+
+    def cmd_hdel(self, key, *fields):
+        h = self._hash(key) or {}
+        n = sum(1 for f in fields if h.pop(f, None) is not None)
+        self._drop_if_empty(key)
+        return n
+
+    def cmd_zadd(self, key, *args):
+        flags = set()
+        args = list(args)
+        while args and args[0].upper() in ("NX", "XX", "CH"):
+            flags.add(args.pop(0).upper())
+        if not args or len(args) % 2:
+            raise _Error("ERR syntax error")
+        z = self._zset(key, create="XX" not in flags)
+        if z is None:
+            return 0
+        added = changed = 0
+        for score, member in zip(args[::2], args[1::2]):
+            exists = member in z
+            if ("NX" in flags and exists) or ("XX" in flags and not exists):
+                continue
+            score = float(score)
+            if not exists:
+                added += 1
+            elif z[member] != score:
+                changed += 1
+            z[member] = score
+        self._drop_if_empty(key)
+        return added + changed if "CH" in flags else added
+
+    def cmd_zrem(self, key, *members):
+        z = self._zset(key) or {}
+        n = sum(1 for m in members if z.pop(m, None) is not None)
+        self._drop_if_empty(key)
+        return n
+
+    def cmd_zcard(self, key):
+        return len(self._zset(key) or {})
+
+    def cmd_zscore(self, key, member):
+        score = (self._zset(key) or {}).get(member)
+        return None if score is None else repr(score)
+
+    def cmd_zrank(self, key, member):
+        z = self._zset(key) or {}
+        return self._ranked(z).index(member) if member in z else None
+
+    def cmd_zrange(self, key, start, stop):
+        ranked = self._ranked(self._zset(key) or {})
+        start, stop = int(start), int(stop)
+        stop = len(ranked) + stop if stop < 0 else stop
+        return ranked[start:stop + 1]
+
+    def cmd_zrangebyscore(self, key, lo, hi):
+        z = self._zset(key) or {}
+        lo, hi = self._bound(lo), self._bound(hi)
+        return [m for m in self._ranked(z) if lo <= z[m] <= hi]
+
+    # ---- protocol ----
+    @staticmethod
+    def _encode(value) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, bool) or isinstance(value, int):
+            return b":%d\r\n" % int(value)
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(FakeRedis._encode(v) for v in value)
+        if isinstance(value, _Error):
+            return b"-%s\r\n" % str(value).encode("utf-8")
+        if value in ("OK", "PONG"):
+            return b"+%s\r\n" % value.encode("utf-8")
+        b = str(value).encode("utf-8")
+        return b"$%d\r\n%s\r\n" % (len(b), b)
+
+    def _handler(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    if not line.startswith(b"*"):
+                        args = line.decode("utf-8").split()   # inline command (e.g. from telnet)
+                    else:
+                        args = []
+                        for _ in range(int(line[1:])):
+                            n = int(self.rfile.readline()[1:])
+                            args.append(self.rfile.read(n + 2)[:-2].decode("utf-8"))
+                    if not args:
+                        continue
+                    try:
+                        reply = server.execute(*args)
+                    except _Error as e:
+                        reply = e
+                    except (TypeError, ValueError) as e:
+                        reply = _Error(f"ERR {e}")
+                    self.wfile.write(server._encode(reply))
+
+        return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=6379)
+    args = ap.parse_args()
+
+    server = FakeRedis(args.host, args.port)
+    print(f"Fake Redis listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
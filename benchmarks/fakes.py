@@ -0,0 +1,47 @@
+# benchmarks/fakes.py
+"""Deterministic fakes for every tool in tools.registry.TOOLS."""
+import time
+import hashlib
+from typing import Callable, Iterable, Optional
+
+# Canned outputs shaped like the real tools' output
+FAKE_OUTPUTS = {
+    "wikipedia_search": "Page: Agnikul Cosmos\nSummary: Agnikul Cosmos is an Indian aerospace startup based in Chennai "
+                        "developing the Agnibaan launch vehicle.",
+    "agnikul_rag_search": "Agnibaan can carry up to 300 kg to low Earth orbit.\n\nSources: Agnikul official site",
+    "duckduckgo_search": "Agnikul news\nhttps://example.com/agnikul\nAgnikul completes another Agnilet engine test.\n",
+    "bibtex": '[{"ID": "agnikul2024", "title": "Additively manufactured rocket engines", "year": "2024"}]',
+    "arxiv_search": "Published: 2024-01-01\nTitle: Semi-cryogenic engines for small launchers\nAuthors: A. Author\n"
+                    "Summary: We study 3D-printed semi-cryogenic engines.",
+}
+
+
+def make_fake(name: str, latency: float = 0.0, output_chars: int = 0) -> Callable[[str], str]:
+    """
+    Fake backend for `name`: fixed latency, output depends only on the input.
+    output_chars pads the result (repeating the canned text) to roughly that size.
+    """
+    base = FAKE_OUTPUTS.get(name, f"[{name}] result")
+    if output_chars > len(base):
+        base = ("\n".join([base] * (output_chars // (len(base) + 1) + 1)))[:output_chars]
+
+    def _fake(tool_input: str) -> str:
+        if latency:
+            time.sleep(latency)
+        digest = hashlib.sha1((tool_input or "").encode("utf-8")).hexdigest()[:8]
+        return f"{base}\n[fake {name} #{digest}]"
+
+    _fake.__name__ = f"fake_{name}"
+    return _fake
+
+
+def install_fake_tools(latency: float = 0.0, names: Optional[Iterable[str]] = None,
+                       latencies: Optional[dict] = None, output_chars: int = 0):
+    """Replace registry backends with fakes (all tools unless `names` is given)."""
+    from tools.registry import TOOLS, override_backend
+
+    latencies = latencies or {}
+    for tool in TOOLS:
+        if names is not None and tool.name not in names:
+            continue
+        override_backend(tool.name, make_fake(tool.name, latencies.get(tool.name, latency), output_chars))
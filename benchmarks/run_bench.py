@@ -0,0 +1,269 @@
+# benchmarks/run_bench.py
+"""
+Offline throughput/latency benchmark for the agent.
+
+    python -m benchmarks.run_bench --scenarios agent,rag,api --clients 8 --requests 64 \\
+        --llm-latency 0.2 --token-latency 0.002 --tool-latency 0.1 --out bench.json
+
+Everything runs against benchmarks.fake_ollama and the fakes in
+benchmarks.fakes, inside a scratch working directory (dataset.csv is copied
+there; vector index and caches are built there). Scenarios:
+
+  agent  run_agent(question) from N client threads, fake tools
+  rag    rag_tool.rag_search(question) over the real retriever + summarizer
+         (none with --rag-mode extractive), with embeddings/completions
+         served by the fake server
+  api    POST /v1/query against a uvicorn server (worker pool, fake tools)
+
+Reports p50/p95/p99 latency, requests/sec, LLM rounds and prompt/completion
+tokens per query and peak RSS as JSON (tagged with the git commit) for
+comparison across commits.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+import http.client
+import concurrent.futures
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUESTIONS = [
+    "What is the payload capacity of Agnibaan?",
+    "Who founded Agnikul Cosmos?",
+    "Where is Agnikul's private launchpad?",
+    "What is special about the Agnilet engine?",
+    "When did Agnikul launch from SDSC?",
+    "Latest news about Agnikul",
+]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def _peak_rss_mb() -> dict:
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return {"peak_rss_mb": round(own, 1), "peak_child_rss_mb": round(children, 1)}
+
+
+def _summarize(latencies: list, errors: int, wall: float, rounds: int, tokens: dict) -> dict:
+    lat = np.array(latencies or [0.0]) * 1000
+    n = len(latencies)
+    return {
+        "requests": n + errors,
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(lat, 50)), 2),
+        "p95_ms": round(float(np.percentile(lat, 95)), 2),
+        "p99_ms": round(float(np.percentile(lat, 99)), 2),
+        "mean_ms": round(float(lat.mean()), 2),
+        "requests_per_s": round(n / wall, 3) if wall else 0.0,
+        "llm_rounds_per_query": round(rounds / n, 3) if n else 0.0,
+        # prompt tokens the (fake) server had to evaluate, i.e. not reused from its context cache
+        "prompt_eval_tokens_per_query": round(tokens["prompt_eval_tokens"] / n, 1) if n else 0.0,
+        "eval_tokens_per_query": round(tokens["eval_tokens"] / n, 1) if n else 0.0,
+        "wall_s": round(wall, 3),
+        **_peak_rss_mb(),
+    }
+
+
+def _load(call, clients: int, requests: int, server) -> dict:
+    """Run `call(question)` `requests` times from `clients` threads."""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    before = server.snapshot()
+
+    def one(i: int):
+        nonlocal errors
+        question = QUESTIONS[i % len(QUESTIONS)]
+        t = time.perf_counter()
+        try:
+            call(question)
+            ok = True
+        except Exception as e:
+            print(f" request {i} failed: {e}", file=sys.stderr)
+            ok = False
+        with lock:
+            if ok:
+                latencies.append(time.perf_counter() - t)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=clients) as ex:
+        list(ex.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    after = server.snapshot()
+    tokens = {k: after[k] - before[k] for k in ("prompt_eval_tokens", "eval_tokens")}
+    return _summarize(latencies, errors, wall, after["agent_rounds"] - before["agent_rounds"], tokens)
+
+
+# ---------------- scenarios ----------------
+def scenario_agent(args, server) -> dict:
+    from agent import run_agent
+    from tools.cache import bypass_cache
+
+    def call(q):
+        with bypass_cache(not args.tool_cache):
+            answer = run_agent(q)
+        if answer.startswith(("Agent aborted", "Agent exceeded", "ERROR")):
+            raise RuntimeError(answer)
+
+    return _load(call, args.clients, args.requests, server)
+
+
+def scenario_rag(args, server) -> dict:
+    t = time.perf_counter()
+    from tools.rag_tool import rag_search
+    cold = time.perf_counter() - t
+    result = _load(rag_search, args.clients, args.requests, server)
+    result["cold_start_s"] = round(cold, 3)
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _bench_worker_init(tool_latency: float, tool_output_chars: int = 0):
+    """Pool worker initializer: fake tools first, then the normal warm-up."""
+    from benchmarks.fakes import install_fake_tools
+    import api
+
+    install_fake_tools(latency=tool_latency, output_chars=tool_output_chars)
+    api._worker_warm_up()
+
+
+def scenario_api(args, server) -> dict:
+    import functools
+    import uvicorn
+    import api
+    from worker_pool import WorkerPool
+
+    # workers start from a clean interpreter: give them the fakes via the initializer
+    api.agent_pool = WorkerPool(target=api._worker_run,
+                                initializer=functools.partial(_bench_worker_init, args.tool_latency,
+                                                              args.tool_output_chars))
+
+    port = _free_port()
+    config = uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning")
+    uv = uvicorn.Server(config)
+    thread = threading.Thread(target=uv.run, name="bench-uvicorn", daemon=True)
+    thread.start()
+    deadline = time.time() + 60
+    while not uv.started and time.time() < deadline:
+        time.sleep(0.05)
+    # wait for the pool (and the answer cache's embedder) to warm up,
+    # so startup isn't measured as request latency
+    api.answer_cache.embed("warm up")
+    while api.agent_pool.stats()["idle"] < api.agent_pool.size and time.time() < deadline:
+        time.sleep(0.1)
+
+    def call(q):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=args.timeout + 10)
+        body = json.dumps({"query": q, "timeout": args.timeout, "no_cache": not args.answer_cache})
+        conn.request("POST", "/v1/query", body=body, headers={"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        payload = json.loads(resp.read() or b"{}")
+        conn.close()
+        if resp.status != 200:
+            raise RuntimeError(f"HTTP {resp.status}: {payload.get('error') or payload.get('detail')}")
+
+    try:
+        return _load(call, args.clients, args.requests, server)
+    finally:
+        uv.should_exit = True
+        thread.join(timeout=10)
+
+
+SCENARIOS = {"agent": scenario_agent, "rag": scenario_rag, "api": scenario_api}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenarios", default="agent,rag,api")
+    ap.add_argument("--clients", type=int, default=4, help="concurrent clients")
+    ap.add_argument("--requests", type=int, default=24, help="requests per scenario")
+    ap.add_argument("--llm-latency", type=float, default=0.05, help="fake Ollama seconds per completion")
+    ap.add_argument("--token-latency", type=float, default=0.0, help="fake Ollama seconds per token")
+    ap.add_argument("--embed-latency", type=float, default=0.0, help="fake Ollama seconds per embed request")
+    ap.add_argument("--tail-tokens", type=int, default=0,
+                    help="tokens the fake model generates after a JSON response (shows early stop)")
+    ap.add_argument("--json-mode", choices=("on", "off"), default="on", help="AGENT_JSON_MODE")
+    ap.add_argument("--tool-latency", type=float, default=0.05, help="fake tool seconds per call")
+    ap.add_argument("--tool-output-chars", type=int, default=0, help="pad fake tool results to this size")
+    ap.add_argument("--timeout", type=int, default=60, help="/v1/query timeout")
+    ap.add_argument("--vector-backend", default="numpy", help="VECTOR_BACKEND for the rag scenario")
+    ap.add_argument("--rag-mode", choices=("summarize", "extractive"), default="summarize", help="RAG_MODE")
+    ap.add_argument("--tool-cache", action="store_true", help="keep the tool result cache on")
+    ap.add_argument("--answer-cache", action="store_true", help="keep the semantic answer cache on (api)")
+    ap.add_argument("--router", choices=("on", "off"), default="on",
+                    help="embedding tool router (the fake embeddings only match its examples verbatim, "
+                         "which QUESTIONS partly are)")
+    ap.add_argument("--out", help="also write the JSON report here")
+    args = ap.parse_args()
+
+    from benchmarks.fake_ollama import FakeOllama
+
+    workdir = tempfile.mkdtemp(prefix="agent_bench_")
+    shutil.copy(os.path.join(ROOT, "dataset.csv"), workdir)
+    out_path = os.path.abspath(args.out) if args.out else None
+
+    server = FakeOllama(latency=args.llm_latency, token_latency=args.token_latency,
+                        embed_latency=args.embed_latency, tail_tokens=args.tail_tokens).start()
+    # must be set before langchain_ollama / ollama are imported
+    os.environ["OLLAMA_HOST"] = server.url
+    os.environ["OLLAMA_BASE_URL"] = server.url
+    os.environ["VECTOR_BACKEND"] = args.vector_backend
+    os.environ["RAG_MODE"] = args.rag_mode
+    os.environ["TOOL_ROUTER"] = args.router
+    os.environ["AGENT_JSON_MODE"] = args.json_mode
+    os.environ.setdefault("TOOLS_WARM_UP", "off")
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+
+    from benchmarks.fakes import install_fake_tools
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k != "out"},
+        "scenarios": {},
+    }
+    try:
+        for name in args.scenarios.split(","):
+            # rag exercises the real retriever; everything else uses fake tools
+            install_fake_tools(latency=args.tool_latency, output_chars=args.tool_output_chars,
+                               names=None if name != "rag" else [])
+            print(f" Running scenario '{name}' ...", file=sys.stderr)
+            report["scenarios"][name] = SCENARIOS[name](args, server)
+    finally:
+        server.stop()
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if out_path:
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
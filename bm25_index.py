@@ -0,0 +1,128 @@
+# bm25_index.py
+import os
+import re
+import math
+import heapq
+import pickle
+import threading
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric tokens; engine names, years and acronyms survive intact."""
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class BM25Index:
+    """
+    In-process inverted index with Okapi BM25 scoring.
+
+    Kept in sync with the vector store by ingest.sync_dataset (same document
+    ids), pickled to `path` so restarts don't re-tokenize. `version` records
+    the dataset version the index was last synced to.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.version = None
+        self._lock = threading.RLock()
+        self._docs = {}        # id -> (text, metadata, length)
+        self._postings = {}    # term -> {id: term frequency}
+        self._total_len = 0
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._docs
+
+    def ids(self) -> set:
+        with self._lock:
+            return set(self._docs)
+
+    # ---- persistence ----
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+            self.version, self._docs, self._postings, self._total_len = (
+                state["version"], state["docs"], state["postings"], state["total_len"])
+        except Exception as e:
+            print(f" BM25 index at {self.path} unreadable, rebuilding: {e}")
+
+    def reload(self):
+        """Re-read the pickled index (another process saved new documents)."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        with self._lock:
+            self._load()
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with self._lock, open(tmp, "wb") as f:
+            pickle.dump({"version": self.version, "docs": self._docs, "postings": self._postings,
+                         "total_len": self._total_len}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    # ---- writes ----
+    def add(self, ids: List[str], texts: List[str], metadatas: Optional[List[dict]] = None):
+        metadatas = metadatas or [{} for _ in texts]
+        with self._lock:
+            for doc_id, text, meta in zip(ids, texts, metadatas):
+                self._delete_one(doc_id)
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                self._docs[doc_id] = (text, meta, length)
+                self._total_len += length
+                for term, tf in counts.items():
+                    self._postings.setdefault(term, {})[doc_id] = tf
+
+    def _delete_one(self, doc_id: str):
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return
+        self._total_len -= entry[2]
+        for term in set(tokenize(entry[0])):
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[term]
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            for doc_id in ids:
+                self._delete_one(doc_id)
+
+    # ---- search ----
+    def search(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        with self._lock:
+            n = len(self._docs)
+            if not n:
+                return []
+            avgdl = self._total_len / n
+            scores = {}
+            for term in set(tokenize(query)):
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    dl = self._docs[doc_id][2]
+                    denom = tf + self.k1 * (1 - self.b + self.b * dl / avgdl)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / denom
+            top = heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+            return [(Document(page_content=self._docs[d][0], metadata=dict(self._docs[d][1]), id=d), s)
+                    for d, s in top]
@@ -0,0 +1,133 @@
+# embedding_service.py
+import os
+import sqlite3
+import hashlib
+import threading
+import concurrent.futures
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# -------------------------------
+# CONFIG
+# -------------------------------
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "./embedding_cache.sqlite3")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))            # texts per request to Ollama
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "2"))   # in-flight embed requests per process
+
+# Bounds in-flight embed requests across every CachedEmbeddings in this process
+_embed_slots = threading.BoundedSemaphore(EMBED_MAX_CONCURRENCY)
+_embed_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=EMBED_MAX_CONCURRENCY, thread_name_prefix="embed"
+)
+
+
+def text_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Disk cache: sha256(model, text) -> vector, stored as float16 bytes in SQLite.
+    Half the size of float32, shared by every process on the box, survives restarts.
+    """
+
+    def __init__(self, path: str = EMBED_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vec BLOB)")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            db = self._db()
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                for key, blob in db.execute(f"SELECT key, vec FROM vectors WHERE key IN ({marks})", chunk):
+                    found[key] = np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        rows = [(k, np.asarray(v, dtype=np.float16).tobytes()) for k, v in items.items()]
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN")
+            db.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?)", rows)
+            db.execute("COMMIT")
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper used for ingestion, retrieval and the answer cache:
+    - cached texts are never sent to the model again (across restarts and processes)
+    - misses are de-duplicated, split into batches of `batch_size`, and sent with
+      at most EMBED_MAX_CONCURRENCY requests in flight
+    """
+
+    def __init__(self, base: Embeddings, model_name: str, cache: EmbeddingCache = None,
+                 batch_size: int = EMBED_BATCH_SIZE):
+        self.base = base
+        self.model_name = model_name
+        self.cache = cache or EmbeddingCache()
+        self.batch_size = max(1, batch_size)
+        self.hits = 0
+        self.misses = 0
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        with _embed_slots:
+            return self.base.embed_documents(texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(self.model_name, t) for t in texts]
+        try:
+            found = self.cache.get_many(list(set(keys)))
+        except sqlite3.Error as e:
+            print(f" Embedding cache read failed: {e}")
+            found = {}
+
+        # unique texts still to embed, in first-seen order
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            miss_keys = list(missing)
+            batches = [miss_keys[i:i + self.batch_size] for i in range(0, len(miss_keys), self.batch_size)]
+            results = _embed_executor.map(lambda b: self._embed_batch([missing[k] for k in b]), batches)
+            fresh = {}
+            for batch, vectors in zip(batches, results):
+                fresh.update(zip(batch, vectors))
+            try:
+                self.cache.put_many(fresh)
+            except sqlite3.Error as e:
+                print(f" Embedding cache write failed: {e}")
+            found.update(fresh)
+
+        return [list(found[k]) for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "cached_vectors": self.cache.count(),
+                "batch_size": self.batch_size, "max_concurrency": EMBED_MAX_CONCURRENCY}
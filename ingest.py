@@ -0,0 +1,357 @@
+# ingest.py
+import os
+import json
+import time
+import hashlib
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+import pandas as pd
+from langchain_core.documents import Document
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process ingest lock
+    fcntl = None
+
+# -------------------------------
+# CONFIG
+# -------------------------------
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "5000"))   # CSV rows read per chunk
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))    # documents per upsert/delete call
+INGEST_TEXT_CHUNK_CHARS = int(os.getenv("INGEST_TEXT_CHUNK_CHARS", "1500"))    # uploaded text chunk size
+INGEST_TEXT_CHUNK_OVERLAP = int(os.getenv("INGEST_TEXT_CHUNK_OVERLAP", "200"))
+INGEST_TEXT_BLOCK_CHARS = 1 << 20   # uploaded text is read and split this much at a time
+MANIFEST_NAME = "ingest_manifest.json"
+UPLOADS_MANIFEST_NAME = "uploads_manifest.json"   # ids ingested from uploads (never pruned by dataset sync)
+GENERATION_NAME = "index_generation"              # touched after every write; other processes reload on change
+
+
+def row_to_document(row: dict) -> Tuple[str, Document]:
+    """Build the Document for one dataset row; its id is the hash of the combined text."""
+    # combine all columns as a single text block
+    combined_text = (
+        f"Topic: {row.get('Topic','')}\n"
+        f"Subtopic: {row.get('Subtopic','')}\n"
+        f"Detail: {row.get('Detail','')}\n"
+        f"Date: {row.get('Date','')}\n"
+        f"Source: {row.get('Source','')}"
+    )
+    doc_id = hashlib.sha256(combined_text.encode("utf-8")).hexdigest()[:32]
+    doc = Document(
+        page_content=combined_text,
+        metadata={
+            "topic": row.get("Topic", ""),
+            "subtopic": row.get("Subtopic", ""),
+            "date": row.get("Date", ""),
+            "source": row.get("Source", "")
+        }
+    )
+    return doc_id, doc
+
+
+def iter_dataset_documents(csv_path: str, chunk_rows: int = INGEST_CHUNK_ROWS) -> Iterator[Tuple[str, Document]]:
+    """Stream (id, Document) pairs from the CSV without loading it all at once."""
+    reader = pd.read_csv(csv_path, quotechar='"', escapechar='\\', chunksize=chunk_rows, dtype=str)
+    for chunk in reader:
+        for row in chunk.fillna("").to_dict("records"):
+            yield row_to_document(row)
+
+
+def _content_id(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def _iter_csv_upload(path: str, source: str, chunk_rows: int) -> Iterator[Tuple[str, Document]]:
+    """Dataset-shaped CSVs map like dataset.csv; any other CSV becomes one "column: value" document per row."""
+    reader = pd.read_csv(path, chunksize=chunk_rows, dtype=str)
+    for chunk in reader:
+        chunk = chunk.fillna("")
+        dataset_shaped = {"Topic", "Detail"} <= set(chunk.columns)
+        for row in chunk.to_dict("records"):
+            if dataset_shaped:
+                row.setdefault("Source", source)
+                row["Source"] = row["Source"] or source
+                yield row_to_document(row)
+                continue
+            text = "\n".join(f"{k}: {v}" for k, v in row.items() if v)
+            if text:
+                yield _content_id(text), Document(page_content=text, metadata={"source": source})
+
+
+def _iter_bibtex_upload(path: str, source: str) -> Iterator[Tuple[str, Document]]:
+    """One document per BibTeX entry (title, authors, year, venue, abstract)."""
+    from tools.bibtex_store import bibtex_store
+
+    fields = (("title", "Title"), ("author", "Authors"), ("year", "Year"),
+              ("journal", "Journal"), ("booktitle", "Booktitle"), ("abstract", "Abstract"))
+    for entry in bibtex_store.load_file(path).entries:
+        lines = [f"{label}: {entry[key]}" for key, label in fields if entry.get(key)]
+        if not lines:
+            continue
+        text = "\n".join(lines)
+        yield _content_id(text), Document(page_content=text, metadata={
+            "source": source, "bibtex_key": entry.get("ID", ""), "date": entry.get("year", "")})
+
+
+def _iter_text_upload(path: str, source: str) -> Iterator[Tuple[str, Document]]:
+    """Overlapping text chunks, read a block at a time so large files never sit in memory whole."""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=INGEST_TEXT_CHUNK_CHARS,
+                                              chunk_overlap=INGEST_TEXT_CHUNK_OVERLAP)
+    carry = ""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.read(INGEST_TEXT_BLOCK_CHARS)
+            chunks = splitter.split_text(carry + block) if (carry + block).strip() else []
+            if block and chunks:
+                # the last chunk may continue in the next block: re-split it with that block
+                carry = chunks.pop()
+            else:
+                carry = ""
+            for text in chunks:
+                yield _content_id(text), Document(page_content=text, metadata={"source": source})
+            if not block:
+                break
+
+
+def iter_file_documents(path: str, source: str = None,
+                        chunk_rows: int = INGEST_CHUNK_ROWS) -> Iterator[Tuple[str, Document]]:
+    """Stream (id, Document) pairs from an uploaded CSV, BibTeX or text file (ids are content hashes)."""
+    source = source or os.path.basename(path)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return _iter_csv_upload(path, source, chunk_rows)
+    if ext == ".bib":
+        return _iter_bibtex_upload(path, source)
+    return _iter_text_upload(path, source)
+
+
+def load_manifest(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(path: str, manifest: dict):
+    """Atomic write so a crash never leaves a half-written manifest."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _ingest_lock(manifest_path: str):
+    """Serialize ingestion across processes (worker processes may load vector.py together)."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    with open(f"{manifest_path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _existing_ids(vector_store) -> set:
+    """Ids already in the store (used once, when there is no manifest yet)."""
+    get = getattr(vector_store, "get", None)
+    if not callable(get):
+        return set()
+    try:
+        return set(get(include=[]).get("ids", []))
+    except Exception:
+        return set()
+
+
+def _batched(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _persist(vector_store):
+    # stores that buffer writes (NumpyVectorStore) must be on disk before a manifest says so
+    persist = getattr(vector_store, "persist", None)
+    if callable(persist):
+        persist()
+
+
+def bump_generation(manifest_dir: str):
+    """Tell other processes (pool workers) that the on-disk indexes changed."""
+    path = os.path.join(manifest_dir, GENERATION_NAME)
+    with open(path, "w") as f:
+        f.write(str(time.time_ns()))
+
+
+def read_generation(manifest_dir: str) -> str:
+    try:
+        with open(os.path.join(manifest_dir, GENERATION_NAME)) as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+
+def reload_indexes(vector_store, lexical_index=None) -> bool:
+    """
+    Re-read indexes another process wrote (Chroma reads its own files). Returns False
+    if the vector store kept its current state (see NumpyVectorStore.reload).
+    """
+    if lexical_index is not None:
+        lexical_index.reload()
+    reload = getattr(vector_store, "reload", None)
+    return not callable(reload) or reload()
+
+
+def sync_dataset(csv_path: str, vector_store, manifest_path: str, dataset_version: str,
+                 batch_size: int = INGEST_BATCH_SIZE, lexical_index=None,
+                 loaded_generation: Optional[str] = None) -> dict:
+    """
+    Bring the vector store (and optional BM25 lexical index) in line with the CSV:
+    - rows whose content hash is new are embedded and upserted (in batches, as the CSV streams)
+    - ids from the manifest that no longer appear in the CSV are deleted
+    - an unchanged dataset_version is a no-op (nothing is read or embedded)
+    The lexical index is synced by its own id set, so a missing or stale index is
+    rebuilt from the CSV without re-embedding anything.
+    loaded_generation: read_generation() from before the stores were loaded. If another
+    process wrote the indexes since (e.g. synced them while this one waited for the
+    lock), they are reloaded first, so a current manifest never leaves them stale.
+    Returns counts of added / deleted / unchanged documents.
+    """
+    with _ingest_lock(manifest_path):
+        manifest_dir = os.path.dirname(manifest_path) or "."
+        if loaded_generation is not None and read_generation(manifest_dir) != loaded_generation:
+            reload_indexes(vector_store, lexical_index)
+        return _sync_dataset(csv_path, vector_store, manifest_path, dataset_version, batch_size, lexical_index)
+
+
+def _sync_dataset(csv_path, vector_store, manifest_path, dataset_version, batch_size, lexical_index) -> dict:
+    manifest = load_manifest(manifest_path)
+    lexical_current = lexical_index is None or lexical_index.version == dataset_version
+    if manifest.get("dataset_version") == dataset_version and lexical_current:
+        return {"added": 0, "deleted": 0, "unchanged": len(manifest.get("ids", [])), "skipped": True}
+
+    # Uploaded documents share the store but are not part of the dataset
+    manifest_dir = os.path.dirname(manifest_path) or "."
+    uploaded = set(load_manifest(os.path.join(manifest_dir, UPLOADS_MANIFEST_NAME)).get("ids", []))
+
+    # First run with this pipeline: adopt whatever the store already holds
+    known = set(manifest["ids"]) if "ids" in manifest else _existing_ids(vector_store) - uploaded
+
+    seen = set()
+    pending_ids, pending_docs = [], []
+    lexical_pending = []
+    added = 0
+
+    def flush():
+        nonlocal added
+        if pending_docs:
+            vector_store.add_documents(documents=pending_docs, ids=pending_ids)
+            added += len(pending_docs)
+            print(f" Ingest: upserted {added} new/changed rows so far")
+            pending_ids.clear()
+            pending_docs.clear()
+
+    def flush_lexical():
+        if lexical_pending:
+            lexical_index.add([i for i, _ in lexical_pending],
+                              [d.page_content for _, d in lexical_pending],
+                              [d.metadata for _, d in lexical_pending])
+            lexical_pending.clear()
+
+    for doc_id, doc in iter_dataset_documents(csv_path):
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
+        if lexical_index is not None and doc_id not in lexical_index:
+            lexical_pending.append((doc_id, doc))
+            if len(lexical_pending) >= batch_size:
+                flush_lexical()
+        if doc_id in known:
+            continue
+        pending_ids.append(doc_id)
+        pending_docs.append(doc)
+        if len(pending_docs) >= batch_size:
+            flush()
+    flush()
+    flush_lexical()
+
+    stale = sorted(known - seen)
+    for batch in _batched(stale, batch_size):
+        vector_store.delete(ids=batch)
+
+    _persist(vector_store)
+    save_manifest(manifest_path, {"dataset_version": dataset_version, "ids": sorted(seen)})
+
+    if lexical_index is not None:
+        lexical_index.delete(list(lexical_index.ids() - seen - uploaded))
+        lexical_index.version = dataset_version
+        lexical_index.save()
+    bump_generation(manifest_dir)
+
+    return {"added": added, "deleted": len(stale), "unchanged": len(seen) - added, "skipped": False}
+
+
+def ingest_file(path: str, vector_store, manifest_dir: str, lexical_index=None, source: str = None,
+                batch_size: int = INGEST_BATCH_SIZE, progress=None) -> dict:
+    """
+    Chunk, embed and add an uploaded file (CSV / BibTeX / text) to the vector store
+    and lexical index. Chunks are keyed by content hash, so re-uploading a file (or
+    overlapping content) adds nothing twice. Their ids are kept in the uploads
+    manifest so dataset syncs leave them alone. progress(added) is called per batch.
+    Returns counts of added / duplicate chunks.
+    """
+    with _ingest_lock(os.path.join(manifest_dir, MANIFEST_NAME)):
+        uploads_path = os.path.join(manifest_dir, UPLOADS_MANIFEST_NAME)
+        uploads = load_manifest(uploads_path)
+        known = set(uploads.get("ids", []))
+        dataset_ids = set(load_manifest(os.path.join(manifest_dir, MANIFEST_NAME)).get("ids", []))
+
+        new_ids = []
+        added = duplicates = 0
+        for batch in _batched_iter(iter_file_documents(path, source), batch_size):
+            fresh = {}
+            for doc_id, doc in batch:
+                if doc_id in known or doc_id in dataset_ids or doc_id in fresh:
+                    duplicates += 1
+                else:
+                    fresh[doc_id] = doc
+            if not fresh:
+                continue
+            ids, docs = list(fresh), list(fresh.values())
+            vector_store.add_documents(documents=docs, ids=ids)
+            if lexical_index is not None:
+                lexical_index.add(ids, [d.page_content for d in docs], [d.metadata for d in docs])
+            known.update(ids)
+            new_ids.extend(ids)
+            added += len(ids)
+            if progress is not None:
+                progress(added)
+
+        if new_ids:
+            _persist(vector_store)
+            uploads["ids"] = sorted(known)
+            save_manifest(uploads_path, uploads)
+            if lexical_index is not None:
+                lexical_index.save()
+            bump_generation(manifest_dir)
+
+    return {"added": added, "duplicates": duplicates}
+
+
+def _batched_iter(items, size: int):
+    """_batched for iterators: lists of up to `size` items without materializing the input."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
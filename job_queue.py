@@ -0,0 +1,242 @@
+# job_queue.py
+import os
+import math
+import time
+import uuid
+import heapq
+import threading
+from typing import Callable, Dict, List, Optional
+
+from tracing import metrics
+from worker_pool import POOL_SIZE
+
+# -------------------------------
+# CONFIG (override with env vars)
+# -------------------------------
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", str(POOL_SIZE)))   # jobs running at once
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "64"))                  # jobs allowed to wait; beyond -> QueueFull
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "3600"))              # seconds a finished job stays queryable
+JOBS_KEEP = 1000                                                       # finished jobs kept at most
+RETRY_AFTER_MAX = 60
+
+# Priority classes: lower runs first. A class is admitted only while the queue
+# is below its share of JOB_MAX_QUEUE, so "low" traffic can't crowd out the rest.
+JOB_PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+JOB_ADMIT_FRACTION = {"high": 1.0, "normal": 0.9, "low": 0.5}
+
+JOBS_SUBMITTED = metrics.counter("agent_jobs_submitted_total", "Jobs accepted into the queue, by priority.",
+                                 ("priority",))
+JOBS_REJECTED = metrics.counter("agent_jobs_rejected_total", "Jobs refused because the queue was full (429).",
+                                ("priority",))
+JOBS_FINISHED = metrics.counter("agent_jobs_finished_total", "Finished jobs by outcome (ok/error/timeout/cancelled).",
+                                ("status",))
+JOB_WAIT_SECONDS = metrics.histogram("agent_job_wait_seconds", "Time jobs spent queued before running.",
+                                     ("priority",))
+
+
+class QueueFull(Exception):
+    """The job queue has no room for this priority class; retry after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Job:
+    """One queued unit of work; `result` is set (and wait() returns) once it is finished."""
+
+    def __init__(self, payload: dict, priority: str, timeout: float, deadline: Optional[float],
+                 job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.payload = payload
+        self.priority = priority
+        self.timeout = timeout        # run budget
+        self.deadline = deadline      # absolute; covers queue wait too (None = only the run budget)
+        self.status = "queued"        # queued | running | done | cancelled
+        self.result: Optional[dict] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self._done = threading.Event()
+
+    def remaining(self) -> float:
+        """Seconds the run may take: the run budget, cut short by the deadline."""
+        budget = self.timeout
+        if self.deadline is not None:
+            budget = min(budget, self.deadline - time.time())
+        return max(0.0, budget)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> dict:
+        started = self.started or (self.finished if self.status == "cancelled" else None)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "created_at": self.created,
+            "queue_wait_seconds": round((started or time.time()) - self.created, 4),
+            "run_seconds": round((self.finished or time.time()) - self.started, 4) if self.started else 0.0,
+            "result": self.result,
+        }
+
+
+class JobQueue:
+    """
+    Bounded priority queue drained by a fixed number of dispatcher threads.
+
+    `run(job)` does the work and returns a result dict with a "status" and
+    "spans"; it should watch job.cancel_event (WorkerPool.submit does).
+    Results the queue builds itself (cancelled, deadline passed while queued,
+    run raised) carry empty spans. submit() raises QueueFull with a
+    Retry-After estimate when the job's priority class has no room. Finished
+    jobs stay queryable for JOB_RESULT_TTL seconds.
+    """
+
+    def __init__(self, run: Callable[[Job], dict], concurrency: int = JOB_CONCURRENCY,
+                 max_queue: int = JOB_MAX_QUEUE, name: str = "jobs"):
+        self.run = run
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max_queue
+        self.name = name
+        self._cond = threading.Condition()
+        self._heap: List[tuple] = []       # (priority rank, seq, job); cancelled jobs are skipped
+        self._seq = 0
+        self._depth = 0                    # queued jobs (excluding cancelled heap entries)
+        self._running = 0
+        self._jobs: Dict[str, Job] = {}    # insertion ordered
+        self._avg_run = 10.0               # EWMA of run seconds, for Retry-After
+        self._threads: List[threading.Thread] = []
+        self._started = False
+
+    # ---- lifecycle ----
+    def start(self):
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+        for i in range(self.concurrency):
+            t = threading.Thread(target=self._dispatch, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def shutdown(self):
+        with self._cond:
+            self._started = False
+            queued = [job for _, _, job in self._heap if job.status == "queued"]
+            self._cond.notify_all()
+        for job in queued:
+            self.cancel(job.id)
+
+    # ---- stats ----
+    def stats(self) -> dict:
+        with self._cond:
+            return {"queued": self._depth, "running": self._running, "concurrency": self.concurrency,
+                    "max_queue": self.max_queue, "avg_run_seconds": round(self._avg_run, 3)}
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely free (queue drained at concurrency / avg run time)."""
+        with self._cond:
+            backlog = self._depth + self._running - self.concurrency + 1
+            estimate = max(1, backlog) * self._avg_run / self.concurrency
+        return int(min(RETRY_AFTER_MAX, max(1, math.ceil(estimate))))
+
+    # ---- jobs ----
+    def submit(self, payload: dict, priority: str = "normal", timeout: float = 60,
+               deadline: Optional[float] = None, job_id: Optional[str] = None) -> Job:
+        if priority not in JOB_PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}; expected one of {', '.join(JOB_PRIORITIES)}.")
+        if not self._started:
+            self.start()
+        job = Job(payload, priority, timeout, deadline, job_id)
+        with self._cond:
+            if self._depth >= max(1, int(self.max_queue * JOB_ADMIT_FRACTION[priority])):
+                full = True
+            else:
+                full = False
+                self._seq += 1
+                heapq.heappush(self._heap, (JOB_PRIORITIES[priority], self._seq, job))
+                self._depth += 1
+                self._jobs[job.id] = job
+                self._trim()
+                self._cond.notify()
+        if full:
+            JOBS_REJECTED.inc(priority=priority)
+            raise QueueFull(f"Job queue full ({self.max_queue} waiting).", self.retry_after())
+        JOBS_SUBMITTED.inc(priority=priority)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def position(self, job: Job) -> Optional[int]:
+        """1-based place in the run order for a queued job."""
+        with self._cond:
+            if job.status != "queued":
+                return None
+            key = (JOB_PRIORITIES[job.priority], next(s for _, s, j in self._heap if j is job))
+            return 1 + sum(1 for rank, seq, j in self._heap if j.status == "queued" and (rank, seq) < key)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued job at once; a running job is told to stop (its run() returns "cancelled")."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.cancel_event.set()
+            if job.status != "queued":
+                return job
+            job.status = "cancelled"
+            self._depth -= 1
+        self._finish(job, {"status": "cancelled", "error": "Cancelled before it started.", "spans": []})
+        return job
+
+    # ---- internals ----
+    def _trim(self):
+        """Forget finished jobs past JOB_RESULT_TTL / JOBS_KEEP (caller holds the lock)."""
+        now = time.time()
+        finished = [j for j in self._jobs.values() if j.finished is not None]
+        excess = len(finished) - JOBS_KEEP
+        for j in finished:
+            if excess > 0 or now - j.finished > JOB_RESULT_TTL:
+                del self._jobs[j.id]
+                excess -= 1
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while self._started and not self._heap:
+                    self._cond.wait()
+                if not self._started:
+                    return
+                _, _, job = heapq.heappop(self._heap)
+                if job.status != "queued":
+                    continue
+                self._depth -= 1
+                self._running += 1
+                job.status = "running"
+                job.started = time.time()
+            JOB_WAIT_SECONDS.observe(job.started - job.created, priority=job.priority)
+            try:
+                if job.deadline is not None and job.remaining() <= 0:
+                    result = {"status": "timeout", "error": "Deadline passed while queued.", "spans": []}
+                else:
+                    result = self.run(job)
+            except Exception as e:
+                result = {"status": "error", "error": repr(e), "spans": []}
+            with self._cond:
+                self._running -= 1
+                self._avg_run = 0.8 * self._avg_run + 0.2 * (time.time() - job.started)
+            self._finish(job, result)
+
+    def _finish(self, job: Job, result: dict):
+        with self._cond:
+            job.result = result
+            job.finished = time.time()
+            if job.status != "cancelled":
+                job.status = "cancelled" if result.get("status") == "cancelled" else "done"
+        JOBS_FINISHED.inc(status=result.get("status", "error"))
+        job._done.set()
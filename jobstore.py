@@ -0,0 +1,807 @@
+# jobstore.py
+import os
+import json
+import math
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse, unquote
+
+from tracing import metrics
+from job_queue import (Job, QueueFull, JOB_PRIORITIES, JOB_ADMIT_FRACTION, JOB_CONCURRENCY, JOB_MAX_QUEUE,
+                       JOB_RESULT_TTL, RETRY_AFTER_MAX, JOBS_SUBMITTED, JOBS_REJECTED, JOBS_FINISHED,
+                       JOB_WAIT_SECONDS)
+
+# -------------------------------
+# CONFIG (override with env vars)
+# -------------------------------
+JOB_STORE = os.getenv("JOB_STORE", "")                       # "" = in-process JobQueue | sqlite:///path | redis://host:port/db
+JOB_STORE_WORKER = os.getenv("JOB_STORE_WORKER", "on")        # "off": this replica only accepts jobs, worker nodes run them
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "30"))  # lease: a job is retried this long after its worker's last heartbeat
+JOB_HEARTBEAT = float(os.getenv("JOB_HEARTBEAT", "5"))       # seconds between lease renewals / node heartbeats
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))    # runs of one job before it fails (lost workers)
+JOB_POLL_MAX = float(os.getenv("JOB_POLL_MAX", "0.5"))       # longest sleep between polls (idle workers, waiting callers)
+JOB_POLL_MIN = 0.02
+CANCEL_CHECK_SECONDS = 0.5                                     # how often a node looks for cancel requests
+NODE_TTL_HEARTBEATS = 3                                        # a node missing this many heartbeats counts as gone
+
+JOBS_REQUEUED = metrics.counter("agent_jobs_requeued_total",
+                                "Jobs whose worker stopped heartbeating, by outcome (requeued/failed).",
+                                ("outcome",))
+
+# Job record fields, as stored by both backends
+JSON_FIELDS = ("payload", "result")
+FLOAT_FIELDS = ("timeout", "deadline", "created", "started", "finished")
+INT_FIELDS = ("attempts", "cancel")
+
+
+def _cancelled_result() -> dict:
+    return {"status": "cancelled", "error": "Cancelled before it started.", "spans": []}
+
+
+def _lost_result(attempts: int, lease: float) -> dict:
+    return {"status": "error", "error": f"Job failed: its worker stopped heartbeating {attempts} times "
+                                        f"(visibility timeout {lease:g}s).", "spans": []}
+
+
+class JobStore:
+    """
+    Shared job queue + result store, for several API replicas and worker nodes.
+
+    A job record is a dict: id, payload, priority, timeout, deadline, status
+    (queued | running | done | cancelled), attempts, created, started,
+    finished, worker, cancel and result. claim() leases the next job to a
+    worker until `lease` seconds from now; extend() renews the lease (the
+    heartbeat); requeue_expired() puts jobs whose lease ran out back in the
+    queue, or fails them after `max_attempts` runs. finish() stores a result;
+    the first one wins, so a slow worker that lost its lease can't overwrite it.
+    """
+
+    kind = "base"
+
+    def add(self, record: dict, limit: int) -> bool:
+        """Queue a job unless `limit` jobs are already waiting."""
+        raise NotImplementedError
+
+    def claim(self, worker: str, lease: float) -> Optional[dict]:
+        raise NotImplementedError
+
+    def extend(self, job_id: str, worker: str, lease: float) -> Optional[bool]:
+        """Renew the lease; returns the job's cancel flag, or None if this worker no longer holds it."""
+        raise NotImplementedError
+
+    def finish(self, job_id: str, result: dict, status: str = "done") -> bool:
+        raise NotImplementedError
+
+    def release(self, job_id: str, worker: str):
+        """Put a leased job straight back in the queue (worker shutting down)."""
+        raise NotImplementedError
+
+    def requeue_expired(self, max_attempts: int, lease: float) -> Dict[str, str]:
+        """Jobs past their lease -> {job_id: "requeued" | "failed"}."""
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """Flag a job as cancelled; a queued one is finished at once, a running one by its worker."""
+        raise NotImplementedError
+
+    def position(self, job_id: str) -> Optional[int]:
+        raise NotImplementedError
+
+    def counts(self) -> dict:
+        """{"queued": n, "running": n}"""
+        raise NotImplementedError
+
+    def beat(self, node: str, info: dict):
+        """Record a worker node heartbeat."""
+        raise NotImplementedError
+
+    def nodes(self, max_age: float) -> List[dict]:
+        """Worker nodes seen within `max_age` seconds."""
+        raise NotImplementedError
+
+    def trim(self, ttl: float):
+        """Forget finished jobs older than `ttl` seconds."""
+
+
+# -------------------------------
+# SQLITE (one host, many processes)
+# -------------------------------
+class SQLiteJobStore(JobStore):
+    """Jobs in one SQLite file (WAL): replicas and worker nodes on the same host share it."""
+
+    kind = "sqlite"
+    COLUMNS = ("id", "payload", "priority", "timeout", "deadline", "status", "attempts", "created", "started",
+               "finished", "worker", "cancel", "result")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _db(self) -> sqlite3.Connection:
+        # one connection per thread (and per process: never reused after fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE, payload TEXT, priority TEXT, rank INTEGER,"
+                " timeout REAL, deadline REAL, status TEXT, attempts INTEGER DEFAULT 0, created REAL, started REAL,"
+                " finished REAL, worker TEXT, lease_expires REAL, cancel INTEGER DEFAULT 0, result TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, rank, seq)")
+            conn.execute("CREATE TABLE IF NOT EXISTS nodes (id TEXT PRIMARY KEY, info TEXT, seen REAL)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _tx(self):
+        """Write transaction, taking the lock up front so concurrent claims serialize."""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _record(self, row) -> dict:
+        record = dict(zip(self.COLUMNS, row))
+        for f in JSON_FIELDS:
+            record[f] = json.loads(record[f]) if record[f] else None
+        return record
+
+    def _select(self, db, where: str, args=()) -> Optional[dict]:
+        row = db.execute(f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE {where}", args).fetchone()
+        return self._record(row) if row else None
+
+    def add(self, record: dict, limit: int) -> bool:
+        with self._tx() as db:
+            if db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0] >= limit:
+                return False
+            db.execute(
+                "INSERT INTO jobs (id, payload, priority, rank, timeout, deadline, status, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)",
+                (record["id"], json.dumps(record["payload"]), record["priority"], JOB_PRIORITIES[record["priority"]],
+                 record["timeout"], record["deadline"], record["created"]))
+        return True
+
+    def claim(self, worker: str, lease: float) -> Optional[dict]:
+        now = time.time()
+        with self._tx() as db:
+            row = db.execute("SELECT seq FROM jobs WHERE status = 'queued' ORDER BY rank, seq LIMIT 1").fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET status = 'running', worker = ?, started = ?, lease_expires = ?,"
+                       " attempts = attempts + 1 WHERE seq = ?", (worker, now, now + lease, row[0]))
+            return self._select(db, "seq = ?", (row[0],))
+
+    def extend(self, job_id: str, worker: str, lease: float) -> Optional[bool]:
+        db = self._db()
+        updated = db.execute("UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                             (time.time() + lease, job_id, worker)).rowcount
+        if not updated:
+            return None
+        row = db.execute("SELECT cancel FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def finish(self, job_id: str, result: dict, status: str = "done") -> bool:
+        return bool(self._db().execute(
+            "UPDATE jobs SET status = ?, result = ?, finished = ?, lease_expires = NULL"
+            " WHERE id = ? AND result IS NULL", (status, json.dumps(result), time.time(), job_id)).rowcount)
+
+    def release(self, job_id: str, worker: str):
+        self._db().execute("UPDATE jobs SET status = 'queued', worker = NULL, lease_expires = NULL"
+                           " WHERE id = ? AND worker = ? AND status = 'running'", (job_id, worker))
+
+    def requeue_expired(self, max_attempts: int, lease: float) -> Dict[str, str]:
+        now = time.time()
+        outcomes = {}
+        with self._tx() as db:
+            rows = db.execute("SELECT id, attempts FROM jobs WHERE status = 'running' AND lease_expires < ?",
+                              (now,)).fetchall()
+            for job_id, attempts in rows:
+                if attempts >= max_attempts:
+                    db.execute("UPDATE jobs SET status = 'done', result = ?, finished = ?, lease_expires = NULL"
+                               " WHERE id = ?", (json.dumps(_lost_result(attempts, lease)), now, job_id))
+                    outcomes[job_id] = "failed"
+                else:
+                    db.execute("UPDATE jobs SET status = 'queued', worker = NULL, lease_expires = NULL"
+                               " WHERE id = ?", (job_id,))
+                    outcomes[job_id] = "requeued"
+        return outcomes
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self._select(self._db(), "id = ?", (job_id,))
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        with self._tx() as db:
+            db.execute("UPDATE jobs SET cancel = 1 WHERE id = ?", (job_id,))
+            db.execute("UPDATE jobs SET status = 'cancelled', result = ?, finished = ? WHERE id = ? AND status = 'queued'",
+                       (json.dumps(_cancelled_result()), time.time(), job_id))
+            return self._select(db, "id = ?", (job_id,))
+
+    def position(self, job_id: str) -> Optional[int]:
+        row = self._db().execute(
+            "SELECT 1 + (SELECT COUNT(*) FROM jobs o WHERE o.status = 'queued'"
+            "  AND (o.rank < j.rank OR (o.rank = j.rank AND o.seq < j.seq)))"
+            " FROM jobs j WHERE j.id = ? AND j.status = 'queued'", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def counts(self) -> dict:
+        rows = self._db().execute("SELECT status, COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+                                  " GROUP BY status").fetchall()
+        return {"queued": 0, "running": 0, **dict(rows)}
+
+    def beat(self, node: str, info: dict):
+        self._db().execute("INSERT OR REPLACE INTO nodes (id, info, seen) VALUES (?, ?, ?)",
+                           (node, json.dumps(info), time.time()))
+
+    def nodes(self, max_age: float) -> List[dict]:
+        db = self._db()
+        db.execute("DELETE FROM nodes WHERE seen < ?", (time.time() - 10 * max_age,))
+        rows = db.execute("SELECT id, info, seen FROM nodes WHERE seen >= ?", (time.time() - max_age,)).fetchall()
+        return [{"id": r[0], **json.loads(r[1]), "seen": r[2]} for r in rows]
+
+    def trim(self, ttl: float):
+        self._db().execute("DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?", (time.time() - ttl,))
+
+
+# -------------------------------
+# REDIS (many hosts)
+# -------------------------------
+class RedisError(Exception):
+    """Error reply from the server."""
+
+
+class RespClient:
+    """
+    Minimal RESP2 client (commands in, replies decoded to str/int/list/None);
+    one connection per thread, reconnected once after a socket error.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, db: int = 0, password: Optional[str] = None,
+                 timeout: float = 5.0):
+        self.host, self.port, self.db, self.password, self.timeout = host, port, db, password, timeout
+        self._local = threading.local()
+
+    @classmethod
+    def from_url(cls, url: str) -> "RespClient":
+        u = urlparse(url)
+        db = int(u.path.lstrip("/") or 0)
+        return cls(u.hostname or "127.0.0.1", u.port or 6379, db, unquote(u.password) if u.password else None)
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock, self._local.reader, self._local.pid = sock, sock.makefile("rb"), os.getpid()
+        if self.password:
+            self._roundtrip("AUTH", self.password)
+        if self.db:
+            self._roundtrip("SELECT", self.db)
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for a in args:
+            b = a if isinstance(a, bytes) else str(a).encode("utf-8")
+            out.append(b"$%d\r\n%s\r\n" % (len(b), b))
+        return b"".join(out)
+
+    def _read(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            if n < 0:
+                return None
+            data = self._local.reader.read(n + 2)
+            return data[:-2].decode("utf-8")
+        if kind == b"*":
+            n = int(rest)
+            return None if n < 0 else [self._read() for _ in range(n)]
+        raise ConnectionError(f"bad reply {line[:40]!r}")
+
+    def _roundtrip(self, *args):
+        self._local.sock.sendall(self._encode(args))
+        return self._read()
+
+    def call(self, *args):
+        for attempt in (1, 2):
+            if getattr(self._local, "sock", None) is None or self._local.pid != os.getpid():
+                self._connect()
+            try:
+                return self._roundtrip(*args)
+            except (OSError, ConnectionError):
+                self._close()
+                if attempt == 2:
+                    raise
+
+
+class RedisJobStore(JobStore):
+    """
+    Jobs in Redis (or anything that speaks the same protocol):
+      {prefix}:queue   sorted set, job id -> priority rank * 1e13 + created ms
+      {prefix}:leases  sorted set, job id -> lease expiry
+      {prefix}:job:{id} hash with the record's fields (expires JOB_RESULT_TTL after it finishes)
+      {prefix}:nodes   hash, node id -> JSON heartbeat
+    A job is leased (ZADD NX) before it leaves the queue, so a worker dying
+    mid-claim leaves it leased, never lost.
+    """
+
+    kind = "redis"
+
+    def __init__(self, url: str, prefix: str = "agent:jobs", result_ttl: float = JOB_RESULT_TTL):
+        self.redis = RespClient.from_url(url)
+        self.prefix = prefix
+        self.result_ttl = int(result_ttl)
+        self.queue_key, self.lease_key, self.nodes_key = f"{prefix}:queue", f"{prefix}:leases", f"{prefix}:nodes"
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    @staticmethod
+    def _decode(job_id: str, flat: list) -> Optional[dict]:
+        if not flat:
+            return None
+        fields = dict(zip(flat[::2], flat[1::2]))
+        record = {"id": job_id, "priority": fields.get("priority"), "status": fields.get("status"),
+                  "worker": fields.get("worker") or None}
+        for f in JSON_FIELDS:
+            record[f] = json.loads(fields[f]) if fields.get(f) else None
+        for f in FLOAT_FIELDS:
+            record[f] = float(fields[f]) if fields.get(f) else None
+        for f in INT_FIELDS:
+            record[f] = int(fields.get(f) or 0)
+        return record
+
+    def _hset(self, job_id: str, **fields):
+        args = []
+        for k, v in fields.items():
+            args += [k, json.dumps(v) if k in JSON_FIELDS else ("" if v is None else v)]
+        self.redis.call("HSET", self._key(job_id), *args)
+
+    def add(self, record: dict, limit: int) -> bool:
+        # check-then-add: concurrent submits may overshoot `limit` by a few
+        if self.redis.call("ZCARD", self.queue_key) >= limit:
+            return False
+        self._hset(record["id"], payload=record["payload"], priority=record["priority"], timeout=record["timeout"],
+                   deadline=record["deadline"], created=record["created"], status="queued", attempts=0)
+        score = JOB_PRIORITIES[record["priority"]] * 1e13 + int(record["created"] * 1000)
+        self.redis.call("ZADD", self.queue_key, score, record["id"])
+        return True
+
+    def claim(self, worker: str, lease: float) -> Optional[dict]:
+        for job_id in self.redis.call("ZRANGE", self.queue_key, 0, 7):
+            now = time.time()
+            if not self.redis.call("ZADD", self.lease_key, "NX", now + lease, job_id):
+                continue    # another worker is claiming it
+            if not self.redis.call("ZREM", self.queue_key, job_id):
+                self.redis.call("ZREM", self.lease_key, job_id)
+                continue
+            record = self.get(job_id)
+            if record is None or record["status"] in ("done", "cancelled"):
+                self.redis.call("ZREM", self.lease_key, job_id)
+                continue
+            attempts = self.redis.call("HINCRBY", self._key(job_id), "attempts", 1)
+            self._hset(job_id, status="running", worker=worker, started=now)
+            return {**record, "status": "running", "worker": worker, "started": now, "attempts": attempts}
+        return None
+
+    def extend(self, job_id: str, worker: str, lease: float) -> Optional[bool]:
+        status, owner, cancel = self.redis.call("HMGET", self._key(job_id), "status", "worker", "cancel")
+        if status != "running" or owner != worker:
+            return None
+        if not self.redis.call("ZADD", self.lease_key, "XX", "CH", time.time() + lease, job_id):
+            return None
+        return cancel == "1"
+
+    def finish(self, job_id: str, result: dict, status: str = "done") -> bool:
+        key = self._key(job_id)
+        if not self.redis.call("HSETNX", key, "result", json.dumps(result)):
+            return False
+        self._hset(job_id, status=status, finished=time.time())
+        self.redis.call("ZREM", self.lease_key, job_id)
+        self.redis.call("ZREM", self.queue_key, job_id)
+        self.redis.call("EXPIRE", key, self.result_ttl)
+        return True
+
+    def _requeue(self, job_id: str, record: dict):
+        score = JOB_PRIORITIES.get(record["priority"], 1) * 1e13 + int((record["created"] or 0) * 1000)
+        self._hset(job_id, status="queued", worker="")
+        self.redis.call("ZADD", self.queue_key, "NX", score, job_id)
+        self.redis.call("ZREM", self.lease_key, job_id)
+
+    def release(self, job_id: str, worker: str):
+        record = self.get(job_id)
+        if record and record["status"] == "running" and record["worker"] == worker:
+            self._requeue(job_id, record)
+
+    def requeue_expired(self, max_attempts: int, lease: float) -> Dict[str, str]:
+        outcomes = {}
+        for job_id in self.redis.call("ZRANGEBYSCORE", self.lease_key, "-inf", time.time()):
+            record = self.get(job_id)
+            if record is None or record["result"] is not None:
+                self.redis.call("ZREM", self.lease_key, job_id)
+            elif record["attempts"] >= max_attempts:
+                if self.finish(job_id, _lost_result(record["attempts"], lease)):
+                    outcomes[job_id] = "failed"
+            elif self.redis.call("ZSCORE", self.lease_key, job_id) is not None:
+                # requeue before dropping the lease: a node dying here leaves it leased, not lost
+                self._requeue(job_id, record)
+                outcomes[job_id] = "requeued"
+        return outcomes
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self._decode(job_id, self.redis.call("HGETALL", self._key(job_id)))
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        if not self.redis.call("EXISTS", self._key(job_id)):
+            return None
+        self.redis.call("HSET", self._key(job_id), "cancel", 1)
+        if self.redis.call("ZREM", self.queue_key, job_id):
+            self.finish(job_id, _cancelled_result(), status="cancelled")
+        return self.get(job_id)
+
+    def position(self, job_id: str) -> Optional[int]:
+        rank = self.redis.call("ZRANK", self.queue_key, job_id)
+        return None if rank is None else rank + 1
+
+    def counts(self) -> dict:
+        return {"queued": self.redis.call("ZCARD", self.queue_key),
+                "running": self.redis.call("ZCARD", self.lease_key)}
+
+    def beat(self, node: str, info: dict):
+        self.redis.call("HSET", self.nodes_key, node, json.dumps({**info, "seen": time.time()}))
+
+    def nodes(self, max_age: float) -> List[dict]:
+        flat = self.redis.call("HGETALL", self.nodes_key) or []
+        now, alive = time.time(), []
+        for node, info in zip(flat[::2], flat[1::2]):
+            info = json.loads(info)
+            if now - info["seen"] <= max_age:
+                alive.append({"id": node, **info})
+            elif now - info["seen"] > 10 * max_age:
+                self.redis.call("HDEL", self.nodes_key, node)
+        return alive
+
+
+def open_store(url: str) -> JobStore:
+    """
+    JobStore for a JOB_STORE url: sqlite:///jobs.sqlite3 (relative path), sqlite:////var/lib/jobs.sqlite3
+    (absolute) or redis://[:password@]host:port/db.
+    """
+    scheme = urlparse(url).scheme
+    if scheme == "sqlite":
+        return SQLiteJobStore(url[len("sqlite:///"):])
+    if scheme in ("redis", "resp"):
+        return RedisJobStore(url)
+    raise ValueError(f"Unknown JOB_STORE {url!r}; expected sqlite:///path or redis://host:port/db.")
+
+
+# -------------------------------
+# JOBS, QUEUE FACADE, WORKER NODES
+# -------------------------------
+class StoredJob(Job):
+    """A Job read from a JobStore; wait() polls the store (or is woken by a local worker node)."""
+
+    def __init__(self, record: dict, queue: "SharedJobQueue"):
+        super().__init__(record["payload"], record["priority"], record["timeout"], record["deadline"], record["id"])
+        self._queue = queue
+        self.update(record)
+
+    def update(self, record: dict):
+        self.status = record["status"]
+        self.result = record["result"]
+        self.created = record["created"]
+        self.started = record["started"]
+        self.finished = record["finished"]
+        self.attempts = record["attempts"]
+        self.worker = record["worker"]
+        if record["cancel"]:
+            self.cancel_event.set()
+        if self.finished is not None:
+            self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._queue.wait(self, timeout)
+
+    def to_dict(self) -> dict:
+        return {**super().to_dict(), "attempts": self.attempts, "worker": self.worker}
+
+
+class WorkerNode:
+    """
+    Runs jobs from a JobStore: `concurrency` threads claim jobs and call
+    run(job) (as JobQueue's dispatchers do); a keeper thread renews leases
+    and the node heartbeat every JOB_HEARTBEAT seconds, passes cancel
+    requests on to job.cancel_event and requeues jobs of nodes that stopped
+    heartbeating.
+    """
+
+    def __init__(self, store: JobStore, run: Callable[[Job], dict], concurrency: int = JOB_CONCURRENCY,
+                 lease: float = JOB_VISIBILITY_TIMEOUT, heartbeat: float = JOB_HEARTBEAT,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, on_finish: Optional[Callable[[str], None]] = None,
+                 node_id: Optional[str] = None):
+        self.store = store
+        self.run = run
+        self.concurrency = max(1, concurrency)
+        self.lease = lease
+        self.heartbeat = min(heartbeat, lease / 3)
+        self.max_attempts = max_attempts
+        self.on_finish = on_finish
+        self.id = node_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._lock = threading.Lock()
+        self._running: Dict[str, StoredJob] = {}
+        self._released = set()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._avg_run = 10.0
+        self.done = 0
+
+    def start(self) -> "WorkerNode":
+        self._stop.clear()
+        self._beat()
+        targets = [self._work] * self.concurrency + [self._keep]
+        for i, target in enumerate(targets):
+            t = threading.Thread(target=target, name=f"job-node-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f" Worker node {self.id} started ({self.concurrency} slots, {self.store.kind} job store).")
+        return self
+
+    def stop(self, drain: float = 0.0):
+        """Stop claiming; jobs still running after `drain` seconds go back to the queue for another node."""
+        self._stop.set()
+        deadline = time.time() + drain
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.time()))
+        with self._lock:
+            unfinished = list(self._running.values())
+            self._released.update(j.id for j in unfinished)
+        for job in unfinished:
+            self.store.release(job.id, self.id)
+            job.cancel_event.set()
+        self._threads = []
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"node": self.id, "running": len(self._running), "capacity": self.concurrency,
+                    "avg_run_seconds": round(self._avg_run, 3), "done": self.done}
+
+    def cancel_local(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._running.get(job_id)
+        if job is not None:
+            job.cancel_event.set()
+        return job is not None
+
+    # ---- internals ----
+    def _work(self):
+        idle = JOB_POLL_MIN
+        while not self._stop.is_set():
+            try:
+                record = self.store.claim(self.id, self.lease)
+            except Exception as e:
+                print(f" Job store claim failed: {e}")
+                record = None
+            if record is None:
+                self._stop.wait(idle)
+                idle = min(JOB_POLL_MAX, idle * 2)
+                continue
+            idle = JOB_POLL_MIN
+            self._execute(StoredJob(record, None))
+
+    def _execute(self, job: StoredJob):
+        with self._lock:
+            self._running[job.id] = job
+        JOB_WAIT_SECONDS.observe(job.started - job.created, priority=job.priority)
+        try:
+            if job.deadline is not None and job.remaining() <= 0:
+                result = {"status": "timeout", "error": "Deadline passed while queued.", "spans": []}
+            else:
+                result = self.run(job)
+        except Exception as e:
+            result = {"status": "error", "error": repr(e), "spans": []}
+        with self._lock:
+            self._running.pop(job.id, None)
+            released = job.id in self._released
+            self._released.discard(job.id)
+            self._avg_run = 0.8 * self._avg_run + 0.2 * (time.time() - job.started)
+        if released:
+            return   # handed back to the queue by stop()
+        status = "cancelled" if result.get("status") == "cancelled" else "done"
+        try:
+            stored = self.store.finish(job.id, result, status)
+        except Exception as e:
+            print(f" Job store finish of {job.id} failed: {e}")
+            stored = False
+        if stored:
+            JOBS_FINISHED.inc(status=result.get("status", "error"))
+            self.done += 1
+        if self.on_finish is not None:
+            self.on_finish(job.id)
+
+    def _beat(self):
+        self.store.beat(self.id, {"host": socket.gethostname(), "pid": os.getpid(), **self.stats()})
+
+    def _keep(self):
+        next_beat = 0.0
+        while not self._stop.wait(min(CANCEL_CHECK_SECONDS, self.heartbeat)):
+            try:
+                with self._lock:
+                    running = list(self._running.values())
+                if time.time() >= next_beat:
+                    next_beat = time.time() + self.heartbeat
+                    for job in running:
+                        cancel = self.store.extend(job.id, self.id, self.lease)
+                        if cancel is None:
+                            # lease lost (we stalled past it): the job is queued for someone else
+                            print(f" Lost the lease on job {job.id}; stopping it here.")
+                            with self._lock:
+                                self._released.add(job.id)
+                        if cancel is None or cancel:
+                            job.cancel_event.set()
+                    self._beat()
+                    for job_id, outcome in self.store.requeue_expired(self.max_attempts, self.lease).items():
+                        JOBS_REQUEUED.inc(outcome=outcome)
+                        print(f" Job {job_id} {outcome}: its worker stopped heartbeating.")
+                    self.store.trim(JOB_RESULT_TTL)
+                else:
+                    for job in running:
+                        record = self.store.get(job.id)
+                        if record is not None and record["cancel"]:
+                            job.cancel_event.set()
+            except Exception as e:
+                print(f" Job store heartbeat failed: {e}")
+
+
+class SharedJobQueue:
+    """
+    JobQueue over a shared JobStore, so any API replica can accept a job, any
+    worker node can run it and any replica can report it. Same interface as
+    job_queue.JobQueue; the queue bound and priority admission shares apply
+    across all replicas. With `worker`, this process also runs jobs.
+    """
+
+    def __init__(self, store: JobStore, run: Callable[[Job], dict], concurrency: int = JOB_CONCURRENCY,
+                 max_queue: int = JOB_MAX_QUEUE, worker: bool = JOB_STORE_WORKER == "on", name: str = "jobs"):
+        self.store = store
+        self.run = run
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max_queue
+        self.worker = worker
+        self.name = name
+        self.node: Optional[WorkerNode] = None
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, List[threading.Event]] = {}
+
+    # ---- lifecycle ----
+    def start(self):
+        with self._lock:
+            if self.node is not None or not self.worker:
+                return
+            self.node = WorkerNode(self.store, self.run, self.concurrency, on_finish=self._wake)
+        self.node.start()
+
+    def shutdown(self, drain: float = 0.0):
+        with self._lock:
+            node, self.node = self.node, None
+        if node is not None:
+            node.stop(drain)
+
+    # ---- stats ----
+    def _nodes(self) -> List[dict]:
+        return self.store.nodes(NODE_TTL_HEARTBEATS * JOB_HEARTBEAT)
+
+    def stats(self) -> dict:
+        nodes = self._nodes()
+        runs = [n["avg_run_seconds"] for n in nodes]
+        return {**self.store.counts(), "concurrency": self.concurrency, "max_queue": self.max_queue,
+                "avg_run_seconds": round(sum(runs) / len(runs), 3) if runs else 0.0,
+                "store": self.store.kind, "nodes": len(nodes), "capacity": sum(n["capacity"] for n in nodes)}
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely free, across every live worker node."""
+        s = self.stats()
+        capacity = s["capacity"] or self.concurrency
+        estimate = max(1, s["queued"] + s["running"] - capacity + 1) * (s["avg_run_seconds"] or 10.0) / capacity
+        return int(min(RETRY_AFTER_MAX, max(1, math.ceil(estimate))))
+
+    # ---- jobs ----
+    def submit(self, payload: dict, priority: str = "normal", timeout: float = 60,
+               deadline: Optional[float] = None, job_id: Optional[str] = None) -> StoredJob:
+        if priority not in JOB_PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}; expected one of {', '.join(JOB_PRIORITIES)}.")
+        self.start()
+        record = {"id": job_id or uuid.uuid4().hex, "payload": payload, "priority": priority, "timeout": timeout,
+                  "deadline": deadline, "status": "queued", "attempts": 0, "created": time.time(), "started": None,
+                  "finished": None, "worker": None, "cancel": 0, "result": None}
+        if not self.store.add(record, max(1, int(self.max_queue * JOB_ADMIT_FRACTION[priority]))):
+            JOBS_REJECTED.inc(priority=priority)
+            raise QueueFull(f"Job queue full ({self.max_queue} waiting).", self.retry_after())
+        JOBS_SUBMITTED.inc(priority=priority)
+        return StoredJob(record, self)
+
+    def get(self, job_id: str) -> Optional[StoredJob]:
+        record = self.store.get(job_id)
+        return None if record is None else StoredJob(record, self)
+
+    def position(self, job: StoredJob) -> Optional[int]:
+        return self.store.position(job.id)
+
+    def cancel(self, job_id: str) -> Optional[StoredJob]:
+        """Cancel a queued job at once; a running one stops on its node within a cancel check."""
+        before = self.store.get(job_id)
+        record = self.store.cancel(job_id)
+        if record is None:
+            return None
+        if before is not None and before["status"] == "queued" and record["status"] == "cancelled":
+            JOBS_FINISHED.inc(status="cancelled")
+        node = self.node
+        if node is not None:
+            node.cancel_local(job_id)
+        return StoredJob(record, self)
+
+    def wait(self, job: StoredJob, timeout: Optional[float] = None) -> bool:
+        """Block until the job has a result; polls the store, woken early when this node finishes it."""
+        if job.finished is not None:
+            return True
+        deadline = None if timeout is None else time.time() + timeout
+        event = threading.Event()
+        with self._lock:
+            self._waiters.setdefault(job.id, []).append(event)
+        try:
+            poll = JOB_POLL_MIN
+            while True:
+                record = self.store.get(job.id)
+                if record is not None:
+                    job.update(record)
+                    if job.finished is not None:
+                        return True
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                event.wait(poll if remaining is None else min(poll, remaining))
+                poll = min(JOB_POLL_MAX, poll * 2)
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(job.id, [])
+                if event in waiters:
+                    waiters.remove(event)
+                if not waiters:
+                    self._waiters.pop(job.id, None)
+
+    def _wake(self, job_id: str):
+        with self._lock:
+            events = list(self._waiters.get(job_id, []))
+        for event in events:
+            event.set()
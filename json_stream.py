@@ -0,0 +1,95 @@
+# json_stream.py
+import re
+import json
+from typing import Optional
+
+_ANSWER_HEAD_RE = re.compile(r'\s*(?:```(?:json)?\s*)?\{\s*"answer"\s*:\s*"')
+_UNICODE_TAIL_RE = re.compile(r"\\u[0-9a-fA-F]{0,3}$")
+
+
+class JsonStream:
+    """
+    Incremental scanner for a streamed completion that starts with (or contains)
+    one JSON object/list. feed() returns the parsed value as soon as the first
+    complete top-level value has arrived, so the caller can stop generation
+    there instead of waiting for trailing prose or whitespace.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.value = None          # parsed value once complete
+        self.end: Optional[int] = None   # index just past it in self.text
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None
+
+    def feed(self, chunk: str):
+        """Add streamed text; returns the parsed value once complete (else None)."""
+        self.text += chunk
+        if self.complete or not chunk:
+            return self.value
+        text = self.text
+        while self._pos < len(text):
+            c = text[self._pos]
+            self._pos += 1
+            if self._start is None:
+                if c in "{[":
+                    self._start, self._depth = self._pos - 1, 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                continue
+            if c == '"':
+                self._in_string = True
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        self.value = json.loads(text[self._start:self._pos])
+                        self.end = self._pos
+                        return self.value
+                    except ValueError:
+                        # braces in prose, not JSON: look for the next opening bracket
+                        self._pos, self._start = self._start + 1, None
+        return None
+
+    def partial_answer(self) -> Optional[str]:
+        """
+        Decoded text of an {"answer": "..."} object's string so far (JSON mode
+        final answers), or None if the completion is not shaped like one.
+        """
+        m = _ANSWER_HEAD_RE.match(self.text)
+        if not m:
+            return None
+        body, i, escape = self.text[m.end():], 0, False
+        while i < len(body):
+            c = body[i]
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                break
+            i += 1
+        raw = body[:i]
+        # don't decode a half-received escape sequence
+        if escape:
+            raw = raw[:-1]
+        raw = _UNICODE_TAIL_RE.sub("", raw)
+        try:
+            return json.loads(f'"{raw}"')
+        except ValueError:
+            return None
@@ -1,77 +1,108 @@
-
-# main.py -- clean version (no wiki trigger, with timeout)
-import sys
-import traceback
-import concurrent.futures
-from agent import run_agent
-
-def main_loop():
-    print("Agnikul assistant (agent). Type 'q' to quit.")
-
-    while True:
-        try:
-            question = input("Ask your question (q to quit): ").strip()
-        except EOFError:
-            print("\nEOF received, exiting.")
-            break
-
-        if not question:
-            continue
-        if question.lower() == "q":
-            print("Goodbye.")
-            break
-
-        # ------------------------------
-        # Run the agent with a timeout
-        # ------------------------------
-        try:
-            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(run_agent, question)
-                # ⬇ Set timeout here (in seconds)
-                response = future.result(timeout=100)
-
-            print("\nRESPONSE:\n")
-            print(response)
-
-        except concurrent.futures.TimeoutError:
-            print("\n⚠ Agent timed out after 100 seconds.\nTry a shorter query.")
-        except Exception:
-            print("Agent error (traceback):", file=sys.stderr)
-            traceback.print_exc()
-
-def main_loop():
-    print("Agnikul assistant (agent). Type 'q' to quit.")
-
-    while True:
-        try:
-            question = input("Ask your question (q to quit): ").strip()
-        except EOFError:
-            print("\nEOF received, exiting.")
-            break
-
-        if not question:
-            continue
-        if question.lower() == "q":
-            print("Goodbye.")
-            break
-
-        # ------------------------------
-        # Run the agent with a timeout
-        # ------------------------------
-        try:
-            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(run_agent, question)
-                # ⬇ Set timeout here (in seconds)
-                response = future.result(timeout=1000)
-
-            print("\nRESPONSE:\n")
-            print(response)
-
-        except concurrent.futures.TimeoutError:
-            print("\n⚠ Agent timed out after 1000 seconds.\nTry a shorter query.")
-        except Exception:
-            print("Agent error (traceback):", file=sys.stderr)
-            traceback.print_exc()
-
-if __name__ == "__main__":
-    main_loop()
+
+# main.py -- clean version (no wiki trigger, with timeout)
+#
+#   python main.py                                   interactive (one conversation; "new" starts another)
+#   python main.py --batch questions.jsonl --out answers.ndjson [--resume] [--concurrency 4] [--timeout 1000]
+import sys
+import json
+import argparse
+import traceback
+import concurrent.futures
+from agent import run_agent
+from sessions import Session
+from batch import read_items, load_done, open_output, run_batch, BatchStats, format_summary, BATCH_CONCURRENCY, BATCH_TIMEOUT
+
+def main_loop():
+    print("Agnikul assistant (agent). Type 'q' to quit, 'new' to start a new conversation.")
+    session = Session("cli")
+
+    while True:
+        try:
+            question = input("Ask your question (q to quit): ").strip()
+        except EOFError:
+            print("\nEOF received, exiting.")
+            break
+
+        if not question:
+            continue
+        if question.lower() == "q":
+            print("Goodbye.")
+            break
+        if question.lower() == "new":
+            session = Session("cli")
+            print("New conversation.")
+            continue
+
+        # ------------------------------
+        # Run the agent with a timeout
+        # ------------------------------
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+                turn = {}
+                future = executor.submit(run_agent, question, session.context(), turn)
+                # ⬇ Set timeout here (in seconds)
+                response = future.result(timeout=1000)
+            if turn:
+                session.add_turn(question, turn)
+
+            print("\nRESPONSE:\n")
+            print(response)
+
+        except concurrent.futures.TimeoutError:
+            print("\n⚠ Agent timed out after 1000 seconds.\nTry a shorter query.")
+        except Exception:
+            print("Agent error (traceback):", file=sys.stderr)
+            traceback.print_exc()
+
+
+# ------------------------------
+# Batch mode: JSONL questions in, NDJSON answers out (as they finish)
+# ------------------------------
+_batch_executor = None
+
+
+def _run_local(question: str, timeout: float) -> dict:
+    """run_agent in this process with a timeout (a timed-out run is abandoned, not stopped)."""
+    future = _batch_executor.submit(run_agent, question)
+    try:
+        return {"status": "ok", "response": future.result(timeout=timeout)}
+    except concurrent.futures.TimeoutError:
+        return {"status": "timeout", "error": f"Agent timed out after {timeout} seconds."}
+
+
+def batch_main(args):
+    global _batch_executor
+    with open(args.batch, "r", encoding="utf-8") as f:
+        items = read_items(f)
+    done = load_done(args.out) if args.resume else {}
+    out = open_output(args.out, args.resume) if args.out else sys.stdout
+
+    _batch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency,
+                                                            thread_name_prefix="batch-agent")
+    stats = BatchStats(len(items))
+    try:
+        for record in run_batch(items, _run_local, args.concurrency, args.timeout, done=done, stats=stats):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            print(f" [{record['id']}] {record['status']} in {record['seconds']:.2f}s", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        _batch_executor.shutdown(wait=False, cancel_futures=True)
+    print(format_summary(stats.summary()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Agnikul assistant: interactive, or a batch of JSONL questions.")
+    ap.add_argument("--batch", help="JSONL file of questions ({\"id\", \"query\"} per line, or plain lines)")
+    ap.add_argument("--out", help="NDJSON results file (default: stdout)")
+    ap.add_argument("--resume", action="store_true", help="skip ids already answered in --out and append to it")
+    ap.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    ap.add_argument("--timeout", type=int, default=BATCH_TIMEOUT, help="seconds per question")
+    args = ap.parse_args()
+    if args.batch:
+        if args.resume and not args.out:
+            ap.error("--resume needs --out")
+        batch_main(args)
+    else:
+        main_loop()
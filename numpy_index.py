@@ -0,0 +1,238 @@
+# numpy_index.py
+import os
+import json
+import threading
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+# -------------------------------
+# CONFIG
+# -------------------------------
+NUMPY_INDEX_DTYPE = os.getenv("NUMPY_INDEX_DTYPE", "float32")   # float32 | float16 | int8
+SEARCH_BLOCK_ROWS = 8192                                         # rows scored per matmul block
+
+_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+def _normalize_rows(m: np.ndarray) -> np.ndarray:
+    m = np.asarray(m, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def _quantize(m: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Normalized float32 rows -> stored rows (+ per-row scales for int8)."""
+    if dtype == "int8":
+        scales = np.abs(m).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(m / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return m.astype(_DTYPES[dtype]), None
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process vector index: one contiguous matrix of normalized embeddings,
+    memory-mapped from `<path>/vectors.npy`, searched with blocked matmul +
+    argpartition. Texts, metadata and ids live in `<path>/docs.json`.
+
+    add/delete work on an in-memory copy; call persist() to write it back
+    (ingest.sync_dataset does this before updating its manifest).
+    """
+
+    def __init__(self, path: str, embedding_function: Embeddings, dtype: str = NUMPY_INDEX_DTYPE):
+        if dtype not in _DTYPES:
+            raise ValueError(f"Unsupported NumpyVectorStore dtype: {dtype}")
+        self.path = path
+        self.embedding_function = embedding_function
+        self.dtype = dtype
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._pending: List[Tuple[np.ndarray, Optional[np.ndarray]]] = []  # appended blocks not yet merged
+        self._dirty = False
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    # ---- persistence ----
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        docs_file = self._file("docs.json")
+        if not os.path.exists(docs_file):
+            return
+        with open(docs_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("dtype") != self.dtype:
+            raise ValueError(f"Index at {self.path} was built with dtype {meta.get('dtype')}, not {self.dtype}")
+        self._ids, self._texts, self._metadatas = meta["ids"], meta["texts"], meta["metadatas"]
+        if self._ids:
+            self._matrix = np.load(self._file("vectors.npy"), mmap_mode="r")
+            if self.dtype == "int8":
+                self._scales = np.load(self._file("scales.npy"), mmap_mode="r")
+
+    def reload(self) -> bool:
+        """
+        Re-read the index from disk (another process persisted new documents).
+        Skipped while this instance has unsaved writes; a half-replaced index
+        (files from different writes) keeps the current state. Returns True if reloaded.
+        """
+        with self._lock:
+            if self._dirty:
+                return False
+            state = (self._ids, self._texts, self._metadatas, self._matrix, self._scales)
+            try:
+                self._load()
+                rows = 0 if self._matrix is None else self._matrix.shape[0]
+                if rows != len(self._ids):
+                    raise ValueError(f"{rows} vectors for {len(self._ids)} ids")
+            except Exception as e:
+                print(f" Numpy index reload skipped: {e}")
+                self._ids, self._texts, self._metadatas, self._matrix, self._scales = state
+                return False
+            return True
+
+    def persist(self):
+        """Write matrix + docs atomically (no-op when nothing changed)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._consolidate()
+            os.makedirs(self.path, exist_ok=True)
+            if self._matrix is not None:
+                for name, arr in (("vectors.npy", self._matrix), ("scales.npy", self._scales)):
+                    if arr is None:
+                        continue
+                    tmp = self._file(f"{name}.tmp.npy")
+                    np.save(tmp, np.ascontiguousarray(arr))
+                    os.replace(tmp, self._file(name))
+            tmp = self._file("docs.json.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"dtype": self.dtype, "ids": self._ids, "texts": self._texts,
+                           "metadatas": self._metadatas}, f, ensure_ascii=False)
+            os.replace(tmp, self._file("docs.json"))
+            self._dirty = False
+            # re-open memory-mapped so the in-RAM copy can be released
+            self._load()
+
+    # ---- writes ----
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [str(len(self._ids) + i) for i in range(len(texts))]
+        rows, scales = _quantize(_normalize_rows(self.embedding_function.embed_documents(texts)), self.dtype)
+
+        with self._lock:
+            # upsert: replaced ids are dropped first, then everything is appended
+            self._remove(set(ids))
+            self._ids.extend(ids)
+            self._texts.extend(texts)
+            self._metadatas.extend(metadatas)
+            self._pending.append((rows, scales))
+            self._dirty = True
+        return ids
+
+    def _consolidate(self):
+        """Merge appended blocks into the main matrix (one copy per batch of adds, not per add)."""
+        if not self._pending:
+            return
+        blocks = ([] if self._matrix is None else [(np.asarray(self._matrix), self._scales)]) + self._pending
+        self._matrix = np.concatenate([b[0] for b in blocks])
+        if self.dtype == "int8":
+            self._scales = np.concatenate([np.asarray(b[1]) for b in blocks])
+        self._pending = []
+
+    def _remove(self, drop: set):
+        if not drop or not self._ids or drop.isdisjoint(self._ids):
+            return
+        self._consolidate()
+        keep = np.array([i not in drop for i in self._ids], dtype=bool)
+        self._ids = [i for i, k in zip(self._ids, keep) if k]
+        self._texts = [t for t, k in zip(self._texts, keep) if k]
+        self._metadatas = [m for m, k in zip(self._metadatas, keep) if k]
+        self._matrix = np.asarray(self._matrix)[keep]
+        if self._scales is not None:
+            self._scales = np.asarray(self._scales)[keep]
+        if not self._ids:
+            self._matrix, self._scales = None, None
+        self._dirty = True
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            self._remove(set(ids or []))
+        return True
+
+    def get(self, include: Optional[list] = None, **kwargs: Any) -> dict:
+        """Chroma-compatible subset used by ingest.py: {"ids": [...]}."""
+        with self._lock:
+            return {"ids": list(self._ids)}
+
+    # ---- search ----
+    def search_vectors(self, queries: np.ndarray, k: int = 5) -> List[List[Tuple[int, float]]]:
+        """Top-k (row, cosine) for a batch of query vectors, scored block by block."""
+        q = _normalize_rows(np.atleast_2d(queries))
+        with self._lock:
+            self._consolidate()
+            matrix, scales = self._matrix, self._scales
+        if matrix is None:
+            return [[] for _ in range(len(q))]
+
+        n = matrix.shape[0]
+        k = min(k, n)
+        best_rows = np.empty((len(q), 0), dtype=np.int64)
+        best_scores = np.empty((len(q), 0), dtype=np.float32)
+        for start in range(0, n, SEARCH_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            scores = q @ block.T
+            if scales is not None:
+                scores *= np.asarray(scales[start:start + SEARCH_BLOCK_ROWS])[None, :]
+            kb = min(k, scores.shape[1])
+            part = np.argpartition(-scores, kb - 1, axis=1)[:, :kb]
+            best_rows = np.concatenate([best_rows, part + start], axis=1)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, part, axis=1)], axis=1)
+            if best_rows.shape[1] > k:
+                top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        return [[(int(best_rows[i, j]), float(best_scores[i, j])) for j in order[i]] for i in range(len(q))]
+
+    def _to_document(self, row: int) -> Document:
+        return Document(page_content=self._texts[row], metadata=dict(self._metadatas[row]), id=self._ids[row])
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        hits = self.search_vectors(np.asarray(self.embedding_function.embed_query(query)), k=k)[0]
+        return [(self._to_document(row), score) for row, score in hits]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [self._to_document(row) for row, _ in self.search_vectors(np.asarray(embedding), k=k)[0]]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
+
+    def _select_relevance_score_fn(self):
+        # cosine similarity in [-1, 1] -> relevance in [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, path: str = "./numpy_index", **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(path=path, embedding_function=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.persist()
+        return store
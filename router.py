@@ -0,0 +1,189 @@
+# router.py
+import os
+import json
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from tracing import span
+
+# -------------------------------
+# CONFIG
+# -------------------------------
+TOOL_ROUTER = os.getenv("TOOL_ROUTER", "on")                            # "on" | "off"
+ROUTER_THRESHOLD = float(os.getenv("ROUTER_THRESHOLD", "0.80"))         # min cosine similarity to route
+ROUTER_MARGIN = float(os.getenv("ROUTER_MARGIN", "0.04"))               # lead over the runner-up tool
+ROUTER_EXAMPLES_PATH = os.getenv("ROUTER_EXAMPLES_PATH", "")            # optional JSON {tool: [queries]}
+
+# Tools the router may call directly with the question as input. The other
+# labels only compete for the question, so near-misses fall back to the LLM.
+ROUTABLE_TOOLS = {"agnikul_rag_search", "duckduckgo_search"}
+NO_TOOL = "none"
+
+# Labeled example queries per label (tool descriptions are added as examples too)
+ROUTER_EXAMPLES: Dict[str, List[str]] = {
+    "agnikul_rag_search": [
+        "What is the payload capacity of Agnibaan?",
+        "Who founded Agnikul Cosmos?",
+        "Where is Agnikul's private launchpad?",
+        "What is special about the Agnilet engine?",
+        "When did Agnikul launch from SDSC?",
+        "Where is Agnikul headquartered?",
+        "Which investors back Agnikul?",
+        "How does Agnikul manufacture its engines?",
+        "What is Agnikul's semi-cryogenic engine?",
+        "What services does Agnikul offer besides launches?",
+        "How much can Agnibaan carry to low earth orbit?",
+        "Was Agnikul incubated at IIT Madras?",
+        "What approvals does Agnikul have from IN-SPACe?",
+        "What launch attempts of Agnikul were cancelled?",
+        "What did Agnikul's leadership say about the launch?",
+        "Is Agnibaan customizable for different payloads?",
+    ],
+    "duckduckgo_search": [
+        "Latest news about Agnikul",
+        "What happened with Agnikul this week?",
+        "Recent Agnikul announcements",
+        "Agnikul news today",
+        "Any new updates on Agnibaan's next launch date?",
+        "What are the latest headlines on Indian space startups?",
+        "Current news about ISRO launches",
+        "Did Agnikul raise new funding recently?",
+        "Breaking news on Skyroot Aerospace",
+        "What is trending in space tech news right now?",
+    ],
+    "wikipedia_search": [
+        "Who was Vikram Sarabhai?",
+        "What is a semi-cryogenic rocket engine in general?",
+        "History of the Indian Space Research Organisation",
+        "What is low earth orbit?",
+        "Explain how a sounding rocket works",
+    ],
+    "arxiv_search": [
+        "Find papers on additive manufacturing of rocket engines",
+        "Research papers about small satellite launch vehicles",
+        "arXiv papers on regenerative cooling",
+        "Recent academic work on reusable rockets",
+    ],
+    "bibtex": [
+        "Parse this bibtex file refs.bib",
+        "Find the citation key for Smith 2020 in my .bib",
+        "@article{key, title={...}}",
+    ],
+    NO_TOOL: [
+        "Hello, how are you?",
+        "Thanks!",
+        "Translate 'rocket' to French",
+        "Write a haiku about space",
+        "What is 2 + 2?",
+    ],
+}
+
+
+def _normalize_rows(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+class ToolRouter:
+    """
+    Nearest-example tool router. Each label's score is its best cosine
+    similarity between the question and the label's examples (plus the tool
+    description). The top label is routed when it is a ROUTABLE_TOOLS tool,
+    its score reaches `threshold` and it leads the runner-up by `margin`;
+    otherwise the agent asks the LLM as before. Example embeddings are
+    computed once (and are in the shared embedding disk cache).
+    """
+
+    def __init__(self, examples: Optional[Dict[str, List[str]]] = None, embeddings=None,
+                 threshold: float = ROUTER_THRESHOLD, margin: float = ROUTER_MARGIN,
+                 routable=ROUTABLE_TOOLS, descriptions: bool = True):
+        self.examples = {k: list(v) for k, v in (examples or ROUTER_EXAMPLES).items()}
+        self._embeddings = embeddings
+        self.threshold = threshold
+        self.margin = margin
+        self.routable = set(routable)
+        self.descriptions = descriptions
+        self._lock = threading.Lock()
+        self._labels: Optional[List[str]] = None
+        self._matrix: Optional[np.ndarray] = None
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            from vector import embeddings
+            self._embeddings = embeddings
+        return self._embeddings
+
+    def _load(self):
+        if self._matrix is not None:
+            return
+        with self._lock:
+            if self._matrix is not None:
+                return
+            examples = {k: list(v) for k, v in self.examples.items()}
+            if ROUTER_EXAMPLES_PATH and os.path.exists(ROUTER_EXAMPLES_PATH):
+                with open(ROUTER_EXAMPLES_PATH, "r", encoding="utf-8") as f:
+                    for label, queries in json.load(f).items():
+                        examples.setdefault(label, []).extend(queries)
+            if self.descriptions:
+                from tools.registry import TOOLS
+                for t in TOOLS:
+                    examples.setdefault(t.name, []).append(t.description)
+            labels = [label for label, queries in examples.items() for _ in queries]
+            texts = [q for queries in examples.values() for q in queries]
+            matrix = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+            self._labels, self._matrix = labels, _normalize_rows(matrix)
+
+    def warm_up(self):
+        """Embed the examples now instead of on the first question."""
+        try:
+            self._load()
+        except Exception as e:
+            print(f" Router warm-up failed: {e}")
+
+    def scores(self, question: str) -> Dict[str, float]:
+        """Best similarity per label, highest first."""
+        self._load()
+        vec = _normalize_rows(np.asarray(self.embeddings.embed_query(question), dtype=np.float32))
+        sims = self._matrix @ vec
+        best: Dict[str, float] = {}
+        for label, sim in zip(self._labels, sims.tolist()):
+            if sim > best.get(label, -1.0):
+                best[label] = sim
+        return dict(sorted(best.items(), key=lambda kv: kv[1], reverse=True))
+
+    def route(self, question: str) -> dict:
+        """{"tool", "score", "margin", "routed"} for the best label."""
+        ranked = list(self.scores(question).items())
+        tool, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        routed = tool in self.routable and score >= self.threshold and score - runner_up >= self.margin
+        return {"tool": tool, "score": round(score, 4), "margin": round(score - runner_up, 4), "routed": routed}
+
+
+# Shared instance (benchmarks may replace it)
+tool_router = ToolRouter()
+
+
+def route_call(question: str) -> Optional[dict]:
+    """
+    Tool call for the agent's first step when the router is confident, else None.
+    Traced as a "route" span; routing errors just fall back to the LLM.
+    """
+    if TOOL_ROUTER != "on" or not question:
+        return None
+    with span("route") as info:
+        try:
+            decision = tool_router.route(question)
+        except Exception as e:
+            print(f" Router failed, asking the LLM: {e}")
+            info["status"] = "error"
+            return None
+        info.update(decision)
+    if not decision["routed"]:
+        return None
+    print(f" Router: {decision['tool']} (score {decision['score']:.3f}, margin {decision['margin']:.3f})")
+    return {"tool": decision["tool"], "input": question}
@@ -0,0 +1,208 @@
+# sessions.py
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from tracing import metrics
+from tools.cache import normalize_input
+from tools.rag_context import compact, estimate_tokens, query_terms
+
+# -------------------------------
+# CONFIG (override with env vars)
+# -------------------------------
+SESSION_TTL = int(os.getenv("SESSION_TTL", "1800"))                          # idle seconds before a session is dropped
+SESSION_MAX = int(os.getenv("SESSION_MAX", "5000"))                          # sessions kept (least recently used go first)
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))  # memory for all sessions together
+SESSION_HISTORY_TOKENS = int(os.getenv("SESSION_HISTORY_TOKENS", "1500"))    # recent turns kept verbatim
+SESSION_SUMMARY_TOKENS = int(os.getenv("SESSION_SUMMARY_TOKENS", "300"))     # summary of the compacted turns
+SESSION_TOOL_RESULTS = int(os.getenv("SESSION_TOOL_RESULTS", "16"))          # earlier tool results kept for reuse
+SESSION_TURN_SUMMARY_TOKENS = 60      # one compacted turn in the summary
+SESSION_TOOL_RESULT_CHARS = 8000      # longer tool outputs are not kept for reuse
+
+SESSIONS_EVICTED = metrics.counter("agent_sessions_evicted_total", "Sessions dropped, by reason (ttl/count/memory).",
+                                   ("reason",))
+SESSION_COMPACTIONS = metrics.counter("agent_session_compactions_total",
+                                      "Times older turns of a session were folded into its summary.")
+
+
+class Session:
+    """
+    One conversation: the recent turns verbatim (every message the model saw
+    and wrote, so the next turn's prompt extends the previous one and the
+    model's cached context is reused), a bounded summary of older turns, and
+    the tool results of recent turns for reuse.
+
+    When the verbatim turns pass SESSION_HISTORY_TOKENS, the oldest are folded
+    into the summary (question + the answer sentences about it) until half the
+    budget is left, so the prompt stays flat and only changes at a compaction.
+    """
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.created = self.last_used = time.time()
+        self.lock = threading.Lock()        # one turn at a time
+        self.turns: List[dict] = []         # {"question", "answer", "messages", "tokens"}
+        self.summary: List[str] = []        # one line per compacted turn, oldest first
+        self.tool_results: "OrderedDict[tuple, str]" = OrderedDict()   # (tool, normalized input) -> output
+        self.turn_count = 0
+        self.compactions = 0
+
+    # ---- state sent to the agent ----
+    def context(self) -> dict:
+        """What run_agent needs to continue the conversation (plain data: it may go to a worker process)."""
+        return {
+            "summary": "\n".join(self.summary),
+            "history": [m for t in self.turns for m in t["messages"]],
+            "tools": [[tool, tool_input, output] for (tool, tool_input), output in self.tool_results.items()],
+        }
+
+    def add_turn(self, question: str, turn: dict):
+        """Record a finished turn ({"messages", "answer", "tools"} filled in by run_agent), then compact."""
+        messages = turn.get("messages") or [{"role": "user", "content": question},
+                                            {"role": "assistant", "content": turn.get("answer", "")}]
+        self.turns.append({"question": question, "answer": turn.get("answer", ""), "messages": messages,
+                           "tokens": sum(estimate_tokens(m["content"]) for m in messages)})
+        for tool, tool_input, output in turn.get("tools", []):
+            if len(output) <= SESSION_TOOL_RESULT_CHARS:
+                key = (tool, normalize_input(tool_input))
+                self.tool_results.pop(key, None)
+                self.tool_results[key] = output
+        while len(self.tool_results) > SESSION_TOOL_RESULTS:
+            self.tool_results.popitem(last=False)
+        self.turn_count += 1
+        self.last_used = time.time()
+        self._compact()
+
+    def _compact(self):
+        if sum(t["tokens"] for t in self.turns) <= SESSION_HISTORY_TOKENS:
+            return
+        while len(self.turns) > 1 and sum(t["tokens"] for t in self.turns) > SESSION_HISTORY_TOKENS // 2:
+            old = self.turns.pop(0)
+            answer = compact(" ".join(old["answer"].split()), query_terms(old["question"]),
+                             SESSION_TURN_SUMMARY_TOKENS)
+            self.summary.append(f"- Q: {' '.join(old['question'].split())}\n  A: {answer}")
+        while len(self.summary) > 1 and estimate_tokens("\n".join(self.summary)) > SESSION_SUMMARY_TOKENS:
+            self.summary.pop(0)
+        self.compactions += 1
+        SESSION_COMPACTIONS.inc()
+
+    # ---- bookkeeping ----
+    def size(self) -> int:
+        """Approximate bytes held (text only)."""
+        chars = sum(len(m["content"]) for t in self.turns for m in t["messages"])
+        chars += sum(len(t["question"]) + len(t["answer"]) for t in self.turns)
+        chars += sum(len(line) for line in self.summary)
+        chars += sum(len(k[0]) + len(k[1]) + len(v) for k, v in self.tool_results.items())
+        return 512 + chars
+
+    def to_dict(self) -> dict:
+        return {
+            "session_id": self.id,
+            "turns": self.turn_count,
+            "verbatim_turns": len(self.turns),
+            "compactions": self.compactions,
+            "summary": "\n".join(self.summary),
+            "history_tokens": sum(t["tokens"] for t in self.turns),
+            "tool_results": len(self.tool_results),
+            "created_at": self.created,
+            "last_used_at": self.last_used,
+            "size_bytes": self.size(),
+        }
+
+
+class SessionStore:
+    """
+    Sessions by id, in memory: dropped after `ttl` idle seconds, and least
+    recently used first once there are more than `max_sessions` or they hold
+    more than `max_bytes` together.
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL, max_sessions: int = SESSION_MAX, max_bytes: int = SESSION_MAX_BYTES):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()   # least recently used first
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                session.last_used = time.time()
+            return session
+
+    def get_or_create(self, session_id: Optional[str] = None) -> Session:
+        """The session with this id; a new one if it is unknown or expired (or no id is given)."""
+        session_id = session_id or uuid.uuid4().hex
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session(session_id)
+                self._sizes[session_id] = session.size()
+                self._bytes += self._sizes[session_id]
+                self._evict()
+            else:
+                self._sessions.move_to_end(session_id)
+                session.last_used = time.time()
+            return session
+
+    def update(self, session: Session):
+        """Re-account a session's memory after a turn was added."""
+        with self._lock:
+            if session.id not in self._sessions:
+                return
+            size = session.size()
+            self._bytes += size - self._sizes[session.id]
+            self._sizes[session.id] = size
+            self._sessions.move_to_end(session.id)
+            self._evict(keep=session.id)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._drop(session_id) is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sessions": len(self._sessions), "bytes": self._bytes, "max_sessions": self.max_sessions,
+                    "max_bytes": self.max_bytes, "ttl_seconds": self.ttl}
+
+    # ---- internals (caller holds the lock) ----
+    def _drop(self, session_id: str) -> Optional[Session]:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= self._sizes.pop(session_id)
+        return session
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_used >= cutoff:
+                break
+            self._drop(session.id)
+            SESSIONS_EVICTED.inc(reason="ttl")
+
+    def _evict(self, keep: Optional[str] = None):
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions and self._bytes <= self.max_bytes:
+                return
+            if session_id == keep:
+                continue
+            reason = "count" if len(self._sessions) > self.max_sessions else "memory"
+            self._drop(session_id)
+            SESSIONS_EVICTED.inc(reason=reason)
+
+
+# Shared store for this process (API replica or interactive CLI)
+session_store = SessionStore()
+
+metrics.gauge("agent_sessions", "Conversation sessions held in memory.", lambda: session_store.stats()["sessions"])
+metrics.gauge("agent_sessions_bytes", "Approximate memory held by sessions.", lambda: session_store.stats()["bytes"])
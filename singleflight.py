@@ -0,0 +1,62 @@
+# singleflight.py
+import threading
+import concurrent.futures
+from typing import Callable, Dict, Hashable, Tuple
+
+from tracing import metrics
+
+COALESCED = metrics.counter("agent_singleflight_total",
+                            "Calls that started an execution (leader) or joined one in flight (joined).",
+                            ("scope", "role"))
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key onto one execution.
+
+    `submit(key, start)` returns the future of the execution already in flight
+    for `key`, or calls `start()` (which must return a Future) and registers it.
+    Every caller then waits on the shared future with its own timeout. A caller
+    that gives up calls `release()`, which says whether it was the last one
+    waiting (only then is it safe to cancel the future). Finished executions are
+    forgotten immediately: nothing is cached, only in-flight work is shared.
+    """
+
+    def __init__(self, scope: str):
+        self.scope = scope
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, concurrent.futures.Future] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    def submit(self, key: Hashable, start: Callable[[], concurrent.futures.Future]) -> Tuple[concurrent.futures.Future, bool]:
+        """Returns (future, joined): joined=True if another caller's execution is reused."""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None and not future.done():
+                self._waiters[key] += 1
+                COALESCED.inc(scope=self.scope, role="joined")
+                return future, True
+            future = start()
+            self._flights[key] = future
+            self._waiters[key] = 1
+        COALESCED.inc(scope=self.scope, role="leader")
+        future.add_done_callback(lambda f, key=key: self._forget(key, f))
+        return future, False
+
+    def release(self, key: Hashable, future: concurrent.futures.Future) -> bool:
+        """Stop waiting on `future`; True if no other caller is still waiting on it."""
+        with self._lock:
+            if self._flights.get(key) is not future:
+                return True
+            self._waiters[key] -= 1
+            return self._waiters[key] <= 0
+
+    def _forget(self, key: Hashable, future: concurrent.futures.Future):
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+                del self._waiters[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
@@ -0,0 +1,85 @@
+# tests/test_bibtex_store.py
+"""The BibTeX scanner in tools/bibtex_store.py against bibtexparser 1.x."""
+import pytest
+
+from tools.bibtex_store import BibIndex, _parse
+
+bibtexparser = pytest.importorskip("bibtexparser")
+from bibtexparser.bparser import BibTexParser  # noqa: E402
+
+# Same entries as bibtexparser (field order aside)
+CASES = {
+    "braces": '@article{a1, author={Doe, John and Roe, Ann}, title={A {GPU} study}, year=2020, journal="J"}',
+    "paren": "@misc(m1, title={Paren})\n@misc(m2, title={Two})\n",
+    "paren_at_eof": "@misc(m1, title={Paren})",
+    "paren_crlf": "@misc(m1, title={Paren})\r\n@misc(m2, title={Two})\r\n",
+    "paren_inside_values": '@misc(m1, title={A (nested) paren}, note="x)")\n',
+    "crlf": "@article{a,\r\n  title = {T\r\n  two},\r\n  year = 2020\r\n}\r\n",
+    "continuation_lines": "@article{a, author = {A and\n    B}, title = \"T\n\n   two  three\"}",
+    "string_macros": ('@string{jx = "Journal of X"}\n@string(pre = {Pre})\n'
+                      '@article{a, journal = jx, note = pre # " and " # jx, month = feb, day = JAN # "~1"}'),
+    "string_crlf": "@article{a, title={T}}\r\n@string{x={X}}\r\n@article{b, t=x}",
+    "malformed_brace": "@article{a, title={A title with } brace}, year=2020}\n@article{b, title={Good}}\n",
+    "malformed_brace_no_key": "@article{title={A title with } brace}, year=2020}\n@article{b, title={Good}}\n",
+    "junk_after_value": "@article{a, title={T} junk, year=2020}\n@article{b, title={U}}",
+    "missing_comma": "@article{a,\n  t = {T}\n  u = {U}\n}\n@article{b, title={U}}",
+    "double_comma": "@article{a, title={T}, year=2020,,}",
+    "empty_value": "@article{a, title={T}, year=}",
+    "no_fields": "@article{a}\n@article{b,}\n@article{, title={T}}",
+    "key_with_space": "@article{a b, title={T}}",
+    "unterminated": "@article{a, title={Good}}\n@article{b, title={Bad}\n",
+    "duplicate_field": "@article{a, title={One}, TITLE={Two}}",
+    "field_names": "@article{a, t_x={1}, t-x={2}, t.x={3}, t+x={4}, 9x={5}}",
+    "bad_field_name": "@article{a, t:x={1}}",
+    "whitespace": "@Article { a ,\n  title   =   {  spaced   out  } ,\n  year=\"2020\" ,\n}",
+    "tab_separators": "@article{a,\ttitle\t=\t{T}}",
+    "comments": "@comment{ @article{x, t={T}} }\n% line comment\n@preamble{\"x\"}\n@article{a, title={T}}",
+    "entry_mid_line": "x @article{a, title={T}}\n@article{b, title={U}}",
+    "entries_back_to_back": "@article{a, t={T}}@article{b, t={U}}  @article{c, t={V}} trailing words\n",
+    "quoted_braces": '@article{a, title="A {"}quoted{"} title", t="{\\"o}"}',
+    "empty_values": '@article{a, title={}, note=""}',
+}
+
+
+def _reference(text: str) -> list:
+    parser = BibTexParser(ignore_nonstandard_types=False)
+    return bibtexparser.loads(text, parser=parser).entries
+
+
+def _sorted(entries: list) -> list:
+    return [dict(sorted(e.items())) for e in entries]
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_same_entries_as_bibtexparser(name):
+    assert _sorted(_parse(CASES[name])) == _sorted(_reference(CASES[name]))
+
+
+def test_malformed_entry_dropped_not_truncated():
+    entries = _parse(CASES["malformed_brace"])
+    assert [e["ID"] for e in entries] == ["b"]
+
+
+def test_nonstandard_types_kept():
+    # bibtexparser's default parser drops these; the scanner keeps them
+    text = "@online{o1, title={Web}}\n@software{s1, title={Tool}}"
+    assert [(e["ENTRYTYPE"], e["ID"]) for e in _parse(text)] == [("online", "o1"), ("software", "s1")]
+
+
+def test_undefined_macro_kept_as_name():
+    # bibtexparser fails the whole file with UndefinedString
+    with pytest.raises(Exception):
+        _reference("@article{a, journal = nosuch}")
+    assert _parse("@article{a, journal = nosuch}\n@article{b, title={T}}") == [
+        {"ENTRYTYPE": "article", "ID": "a", "journal": "nosuch"},
+        {"ENTRYTYPE": "article", "ID": "b", "title": "T"},
+    ]
+
+
+def test_index_search():
+    index = BibIndex(_parse(CASES["braces"] + "\n@book{b2, author={Smith, Jane}, title={Rockets}, year=1999}"))
+    assert index.search([("author", "doe")]) == [0]
+    assert index.search([("year", "1990-2000")]) == [1]
+    assert index.search([("", "gpu"), ("year", "2020")]) == [0]
+    assert index.search([("key", "B2")]) == [1]
+    assert index.search([("title", "rockets"), ("author", "doe")]) == []
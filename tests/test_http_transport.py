@@ -0,0 +1,119 @@
+# tests/test_http_transport.py
+"""The shared HTTP transport (tools/http_transport.py) against a local stub server."""
+import time
+import threading
+
+import pytest
+import requests
+
+import tracing
+from tools import http_transport
+from tools.cancel import CancelScope, ToolCancelled, cancel_scope
+from tools.http_transport import HttpThrottled, HttpTransport
+from benchmarks.bench_http import StubServer
+
+HOST = "127.0.0.1"
+
+
+@pytest.fixture
+def stub():
+    server = StubServer().start()
+    yield server
+    server.stop()
+
+
+def _transport(monkeypatch, **limits) -> HttpTransport:
+    """A fresh transport (own pool and limits) for the stub host."""
+    monkeypatch.setitem(http_transport.HOST_LIMITS, HOST, {"rate": 1000, "burst": 100, "concurrency": 8, **limits})
+    return HttpTransport()
+
+
+def _get(transport: HttpTransport, url: str, **kwargs):
+    """One request; returns (response, its http span)."""
+    with tracing.start_trace() as trace:
+        resp = transport.get(url, **kwargs)
+    return resp, next(s for s in trace.spans if s["name"] == "http")
+
+
+def test_keep_alive_reuses_one_connection(stub, monkeypatch):
+    transport = _transport(monkeypatch)
+    spans = [_get(transport, f"{stub.url}/w/api.php")[1] for _ in range(10)]
+    assert all(s["status"] == 200 for s in spans)
+    assert stub.counts["requests"] == 10
+    assert stub.counts["connections"] == 1
+    assert [s["connections"] for s in spans] == [1] + [0] * 9
+
+
+def test_retries_503_after_retry_after(stub, monkeypatch):
+    transport = _transport(monkeypatch)
+    stub.fail_every = 2
+    _get(transport, f"{stub.url}/w/api.php")
+    resp, span = _get(transport, f"{stub.url}/w/api.php")
+    assert resp.status_code == 200
+    assert span["attempts"] == 2
+    assert span["retried"] == ["503"]
+    assert span["throttled"] == ["upstream"]
+
+
+def test_last_response_returned_when_retries_run_out(stub, monkeypatch):
+    transport = _transport(monkeypatch)
+    stub.fail_every = 1
+    resp, span = _get(transport, f"{stub.url}/w/api.php", retries=2)
+    assert resp.status_code == 503
+    assert span["attempts"] == 3
+    assert stub.counts["requests"] == 3
+
+
+def test_per_host_concurrency_limit(stub, monkeypatch):
+    transport = _transport(monkeypatch, concurrency=2)
+    stub.latency = 0.1
+    spans, lock = [], threading.Lock()
+
+    def one():
+        span = _get(transport, f"{stub.url}/w/api.php")[1]
+        with lock:
+            spans.append(span)
+
+    threads = [threading.Thread(target=one) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(spans) == 8 and all(s["status"] == 200 for s in spans)
+    assert stub.counts["max_concurrent"] <= 2
+    assert any("concurrency" in s.get("throttled", ()) for s in spans)
+    assert stub.counts["connections"] <= 2
+
+
+def test_token_bucket_spaces_requests(stub, monkeypatch):
+    transport = _transport(monkeypatch, rate=20, burst=1)
+    started = time.monotonic()
+    spans = [_get(transport, f"{stub.url}/w/api.php")[1] for _ in range(5)]
+    assert time.monotonic() - started >= 4 / 20 * 0.9
+    assert sum("rate_limit" in s.get("throttled", ()) for s in spans) >= 3
+
+
+def test_refuses_when_wait_exceeds_max(stub, monkeypatch):
+    transport = _transport(monkeypatch, rate=0.1, burst=1)
+    monkeypatch.setattr(http_transport, "HTTP_MAX_WAIT", 0.2)
+    _get(transport, f"{stub.url}/w/api.php")
+    with pytest.raises(HttpThrottled):
+        transport.get(f"{stub.url}/w/api.php")
+
+
+def test_cancel_scope_deadline_cuts_request_short(stub, monkeypatch):
+    transport = _transport(monkeypatch)
+    stub.latency = 2.0
+    started = time.monotonic()
+    with pytest.raises((requests.Timeout, ToolCancelled)):
+        with cancel_scope(CancelScope(time.time() + 0.3)):
+            transport.get(f"{stub.url}/w/api.php")
+    assert time.monotonic() - started < 1.0
+
+
+def test_connections_reach_metrics_through_spans(stub, monkeypatch):
+    transport = _transport(monkeypatch)
+    before = tracing.HTTP_CONNECTIONS._values.get((HOST,), 0.0)
+    spans = [_get(transport, f"{stub.url}/w/api.php")[1] for _ in range(3)]
+    tracing.observe_spans(spans)   # what the API does with a worker's spans
+    assert tracing.HTTP_CONNECTIONS._values[(HOST,)] - before == stub.counts["connections"] == 1
@@ -0,0 +1,68 @@
+# tests/test_ingest_sync.py
+"""Dataset sync (ingest.sync_dataset) when two processes open the same indexes at once."""
+import multiprocessing
+import os
+import time
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import ingest
+from bm25_index import BM25Index
+from ingest import MANIFEST_NAME, read_generation, sync_dataset
+from numpy_index import NumpyVectorStore
+
+ROWS = 12
+
+
+class _SlowEmbeddings(DeterministicFakeEmbedding):
+    """Signals when the first batch is being embedded (the ingest lock is held), then takes its time."""
+    started: object = None
+
+    def embed_documents(self, texts):
+        self.started.set()
+        time.sleep(0.5)
+        return super().embed_documents(texts)
+
+
+def _open(path):
+    store = NumpyVectorStore(path=str(path), embedding_function=DeterministicFakeEmbedding(size=8))
+    return store, BM25Index(path=str(path / "bm25_index.pkl"))
+
+
+def _sync(csv, path, store, lexical, **kwargs):
+    return sync_dataset(str(csv), store, manifest_path=str(path / MANIFEST_NAME), dataset_version="v1",
+                        lexical_index=lexical, **kwargs)
+
+
+def _writer(csv, path, started):
+    store, lexical = _open(path)
+    store.embedding_function = _SlowEmbeddings(size=8, started=started)
+    _sync(csv, path, store, lexical)
+
+
+@pytest.mark.skipif(ingest.fcntl is None, reason="no cross-process ingest lock on this platform")
+def test_store_opened_during_another_process_sync_is_reloaded(tmp_path):
+    csv = tmp_path / "dataset.csv"
+    csv.write_text("Topic,Subtopic,Detail,Date,Source\n"
+                   + "".join(f"Engine,Stage {i},Detail {i},2024,Site\n" for i in range(ROWS)))
+    path = tmp_path / "index"
+    os.makedirs(path)
+
+    ctx = multiprocessing.get_context("fork")
+    started = ctx.Event()
+    writer = ctx.Process(target=_writer, args=(csv, path, started))
+    writer.start()
+    try:
+        assert started.wait(10)   # the writer holds the ingest lock and has written nothing yet
+        loaded = read_generation(str(path))
+        store, lexical = _open(path)
+        assert not store._ids
+        stats = _sync(csv, path, store, lexical, loaded_generation=loaded)   # waits for the writer's lock
+    finally:
+        writer.join(10)
+    assert writer.exitcode == 0
+    assert stats["skipped"] and stats["added"] == 0
+    assert len(store._ids) == ROWS and len(lexical) == ROWS
+    assert store.similarity_search("Stage 3", k=3)
+    assert read_generation(str(path)) != loaded
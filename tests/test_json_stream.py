@@ -0,0 +1,32 @@
+# tests/test_json_stream.py
+"""The incremental JSON scanner (json_stream.py) used on streamed completions."""
+from json_stream import JsonStream
+
+
+def _feed(chunks):
+    parser = JsonStream()
+    values = [parser.feed(c) for c in chunks]
+    return parser, values
+
+
+def test_value_returned_as_soon_as_complete():
+    parser, values = _feed(['{"a": ', '[1, 2]', '} trailing'])
+    assert values == [None, None, {"a": [1, 2]}]
+    assert parser.text[:parser.end] == '{"a": [1, 2]}'
+
+
+def test_text_after_a_complete_value_is_kept():
+    parser, values = _feed(["Per ref [1] the system at SDSC ", "in May 2024.", " Done."])
+    assert values == [[1], [1], [1]]
+    assert parser.text == "Per ref [1] the system at SDSC in May 2024. Done."
+    assert parser.text[:parser.end] == "Per ref [1]"
+
+
+def test_braces_in_prose_are_skipped():
+    parser, values = _feed(["see {this} and ", '{"x": "}"}'])
+    assert values == [None, {"x": "}"}]
+
+
+def test_partial_answer_decodes_escapes_so_far():
+    parser, _ = _feed(['{"answer": "line\\n', 'two \\u00e9\\u00'])
+    assert parser.partial_answer() == "line\ntwo é"
@@ -0,0 +1,50 @@
+# tests/test_tool_calls.py
+"""Tool call execution in agent.py: cancellation frees circuit breaker trials."""
+import asyncio
+import types
+
+import pytest
+
+import agent
+from tools import cancel
+from tools.circuit import CircuitBreaker, breakers
+
+
+def _slow(tool_input):
+    for _ in range(50):
+        cancel.sleep(0.1)
+    return "ok"
+
+
+@pytest.fixture
+def half_open(monkeypatch):
+    """A slow tool whose breaker is half-open: the next call is its one trial."""
+    tool = types.SimpleNamespace(name="slow_tool", func=_slow)
+    monkeypatch.setattr(agent, "TOOLS", [*agent.TOOLS, tool])
+    breaker = CircuitBreaker(tool.name, failures=1, cooldown=0.0)
+    monkeypatch.setitem(breakers._breakers, tool.name, breaker)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    return breaker
+
+
+def test_cancelled_task_releases_half_open_trial(half_open):
+    async def main():
+        task = asyncio.create_task(agent._arun_tool_call({"tool": "slow_tool", "input": "q"}))
+        await asyncio.sleep(0.3)
+        assert half_open._trial
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert not half_open._trial
+    assert half_open.allow()
+
+
+def test_closed_steps_cancel_running_attempt(half_open):
+    steps = agent._tool_call_steps({"tool": "slow_tool", "input": "q"})
+    futures, _ = agent._advance(steps)
+    steps.close()
+    assert futures[0].scope.cancelled
+    assert not half_open._trial
@@ -0,0 +1,105 @@
+# tests/test_upload_stream.py
+"""Streaming multipart uploads (upload_stream.py) and the /v1/upload endpoint."""
+import asyncio
+import hashlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from upload_stream import MultipartUpload, UploadInvalid, UploadTooLarge
+
+BOUNDARY = "test-boundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def _form(data: bytes, filename: str = "notes.txt", ingest: str = None) -> bytes:
+    parts = []
+    if ingest is not None:
+        parts.append(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="ingest"\r\n\r\n{ingest}\r\n'.encode())
+    parts.append(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n'.encode() + data + b"\r\n")
+    return b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+
+
+def _read(body: bytes, path, max_bytes: int = 1 << 20, chunk: int = 1000) -> MultipartUpload:
+    """Feed `body` to a MultipartUpload in `chunk`-byte pieces."""
+    async def stream():
+        for i in range(0, len(body), chunk):
+            yield body[i:i + chunk]
+
+    upload = MultipartUpload(CONTENT_TYPE, path, max_bytes, overhead=1024, chunk_bytes=4096)
+    asyncio.run(upload.read(stream()))
+    return upload
+
+
+def test_file_written_and_hashed_in_one_pass(tmp_path):
+    data = bytes(range(256)) * 100
+    upload = _read(_form(data, ingest="true"), tmp_path / "f")
+    assert (tmp_path / "f").read_bytes() == data
+    assert upload.sha256 == hashlib.sha256(data).hexdigest()
+    assert upload.size == len(data)
+    assert upload.filename == "notes.txt"
+    assert upload.fields == {"ingest": "true"}
+
+
+def test_oversized_file_stops_reading_early(tmp_path):
+    body = _form(b"x" * 100_000)
+    with pytest.raises(UploadTooLarge):
+        _read(body, tmp_path / "f", max_bytes=5_000)
+    assert (tmp_path / "f").stat().st_size < 5_000
+
+
+def test_oversized_body_stops_at_the_limit(tmp_path):
+    consumed = []
+
+    async def stream():
+        yield f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="note"\r\n\r\n'.encode()
+        for i in range(1000):
+            consumed.append(i)
+            yield b"y" * 1000   # a form field that never ends: only the body limit stops it
+
+    upload = MultipartUpload(CONTENT_TYPE, tmp_path / "f", 5_000, overhead=1024)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(upload.read(stream()))
+    assert len(consumed) <= 7   # stopped within one chunk of 5000 + 1024 bytes
+
+
+@pytest.mark.parametrize("body", [_form(b"abc")[:-10], b"--" + BOUNDARY.encode() + b"--\r\n", b"y" * 100])
+def test_truncated_malformed_or_missing_file_is_invalid(tmp_path, body):
+    with pytest.raises(UploadInvalid):
+        _read(body, tmp_path / "f")
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "UPLOADS_DIR", tmp_path)
+    return TestClient(api.app)
+
+
+def test_upload_endpoint_streams_and_dedups(client):
+    data = b"a,b\n1,2\n"
+    first = client.post("/v1/upload", content=_form(data, "a.csv"), headers={"content-type": CONTENT_TYPE})
+    assert first.status_code == 200, first.text
+    again = client.post("/v1/upload", content=_form(data, "b.txt"), headers={"content-type": CONTENT_TYPE})
+    body = again.json()
+    assert body["sha256"] == hashlib.sha256(data).hexdigest() and body["size_bytes"] == len(data)
+    assert body["deduplicated"] and body["filepath"].endswith("b.txt")
+
+
+def test_upload_endpoint_rejects_chunked_oversize(client, monkeypatch):
+    monkeypatch.setattr(api, "UPLOAD_MAX_BYTES", 1000)
+    body = _form(b"z" * 5000)
+    resp = client.post("/v1/upload", content=iter([body[i:i + 512] for i in range(0, len(body), 512)]),
+                       headers={"content-type": CONTENT_TYPE})
+    assert resp.status_code == 413
+
+
+def test_upload_endpoint_validates_form(client):
+    resp = client.post("/v1/upload", content=_form(b"x", "run.exe", ingest="true"),
+                       headers={"content-type": CONTENT_TYPE})
+    assert resp.status_code == 400
+    resp = client.post("/v1/upload", content=_form(b"x", ingest="maybe"), headers={"content-type": CONTENT_TYPE})
+    assert resp.status_code == 422
+    resp = client.post("/v1/upload", json={"file": "x"})
+    assert resp.status_code == 422
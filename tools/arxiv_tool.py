@@ -1,27 +1,54 @@
+import os
+import re
+import xml.etree.ElementTree as ET
 
-from langchain_community.utilities.arxiv import ArxivAPIWrapper
+from tools.http_transport import transport
+from tools.cache import ToolError
+
+ARXIV_API_URL = os.getenv("ARXIV_API_URL", "https://export.arxiv.org/api/query")
+TOP_K_RESULTS = 3             # how many top results to summarize
+DOC_CONTENT_CHARS_MAX = 4000  # truncate long contents
+
+_ATOM = "{http://www.w3.org/2005/Atom}"
+# new-style (2101.00001v2) and old-style (hep-th/9901001) arXiv identifiers
+_ARXIV_ID_RE = re.compile(r"^(\d{4}\.\d{4,5}(v\d+)?|[a-z\-]+(\.[A-Z]{2})?/\d{7}(v\d+)?)$")
+
+
+def _text(entry, tag: str) -> str:
+    node = entry.find(_ATOM + tag)
+    return " ".join((node.text or "").split()) if node is not None else ""
 
-# Create a singleton wrapper like wiki_tool
-# Configure sensible defaults; adjust top_k_results or doc_content_chars_max as needed.
-_arxiv_wrapper = ArxivAPIWrapper(
-    top_k_results=3,          # how many top results to summarize
-    load_max_docs=3,          # maximum docs to fetch/load
-    doc_content_chars_max=4000  # truncate long contents
-)
 
 def arxiv_search(query: str) -> str:
     """
     Run an ArXiv lookup and return a cleaned string.
-    Uses langchain_community.utilities.arxiv.ArxivAPIWrapper.run under the hood.
+    One export-API request over the shared HTTP pool (rate limited to arXiv's
+    1 request / 3 s), formatted like ArxivAPIWrapper.run.
     Returns a short summary of top results or an error message.
     """
     try:
         if not query or not isinstance(query, str):
-            return "ERROR: Expected a non-empty query string for arXiv search."
-        # ArxivAPIWrapper.run returns a single string with summaries for the top-k results.
-        result = _arxiv_wrapper.run(query)
-        if not result:
+            return ToolError("ERROR: Expected a non-empty query string for arXiv search.")
+        ids = query.split()
+        if ids and all(_ARXIV_ID_RE.match(i) for i in ids):
+            params = {"id_list": ",".join(ids), "max_results": TOP_K_RESULTS}
+        else:
+            params = {"search_query": query[:300], "max_results": TOP_K_RESULTS, "sortBy": "relevance"}
+        resp = transport.get(ARXIV_API_URL, params=params)
+        resp.raise_for_status()
+        root = ET.fromstring(resp.content)
+
+        docs = []
+        for entry in root.findall(_ATOM + "entry"):
+            if "/api/errors" in _text(entry, "id"):
+                return ToolError(f"ArXiv lookup error: {_text(entry, 'summary')}")
+            authors = ", ".join(_text(a, "name") for a in entry.findall(_ATOM + "author"))
+            docs.append(f"Published: {_text(entry, 'published')[:10]}\n"
+                        f"Title: {_text(entry, 'title')}\n"
+                        f"Authors: {authors}\n"
+                        f"Summary: {_text(entry, 'summary')}")
+        if not docs:
             return "No arXiv results found."
-        return result
+        return "\n\n".join(docs)[:DOC_CONTENT_CHARS_MAX]
     except Exception as e:
-        return f"ArXiv lookup error: {e}"
+        return ToolError(f"ArXiv lookup error: {e}")
@@ -0,0 +1,333 @@
+# tools/bibtex_store.py
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from tools.cancel import check_cancelled
+
+# -------------------------------
+# CONFIG
+# -------------------------------
+BIBTEX_CACHE_MAX = int(os.getenv("BIBTEX_CACHE_MAX", "16"))        # parsed bibliographies kept in memory
+BIBTEX_DEFAULT_LIMIT = int(os.getenv("BIBTEX_DEFAULT_LIMIT", "10"))  # entries returned per query
+BIBTEX_MAX_LIMIT = 50
+MAX_AUTHORS_SHOWN = 3
+MAX_FIELD_CHARS = 600    # long fields (abstracts) are cut in full-entry output
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {"a", "an", "and", "for", "in", "of", "on", "the", "to", "with", "by", "at", "from"}
+
+
+def _words(text: str) -> List[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def _clean(value: str) -> str:
+    """Strip BibTeX braces and collapse whitespace."""
+    return " ".join(value.replace("{", "").replace("}", "").split())
+
+
+def _authors(entry: dict) -> List[str]:
+    raw = _clean(entry.get("author", ""))
+    return [a.strip() for a in re.split(r"\s+and\s+", raw) if a.strip()]
+
+
+def _last_name(author: str) -> str:
+    # "Last, First" or "First Middle Last"
+    return author.split(",")[0].strip() if "," in author else author.split()[-1]
+
+
+class BibIndex:
+    """One parsed bibliography, indexed by citation key, author, year and title words."""
+
+    def __init__(self, entries: List[dict]):
+        self.entries = entries
+        self.by_key: Dict[str, int] = {}
+        self.by_author: Dict[str, Set[int]] = {}
+        self.by_year: Dict[str, Set[int]] = {}
+        self.by_word: Dict[str, Set[int]] = {}
+        for i, e in enumerate(entries):
+            key = e.get("ID", "")
+            if key:
+                self.by_key[key.lower()] = i
+            for author in _authors(e):
+                for w in _words(author):
+                    self.by_author.setdefault(w, set()).add(i)
+            year = _clean(e.get("year", ""))[:4]
+            if year:
+                self.by_year.setdefault(year, set()).add(i)
+            for w in _words(_clean(e.get("title", ""))):
+                self.by_word.setdefault(w, set()).add(i)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _years(self, spec: str) -> Set[int]:
+        if "-" in spec:
+            lo, _, hi = spec.partition("-")
+            lo, hi = lo or "0000", hi or "9999"
+            hits = set()
+            for year, ids in self.by_year.items():
+                if lo <= year <= hi:
+                    hits |= ids
+            return hits
+        return set(self.by_year.get(spec, set()))
+
+    def search(self, terms: List[Tuple[str, str]]) -> List[int]:
+        """
+        Entry positions matching every term (AND). Terms are (field, value) with
+        field in key/author/year/title/"" ("" = title word, author or key).
+        """
+        result: Optional[Set[int]] = None
+        for field, value in terms:
+            value = value.lower()
+            if field == "key":
+                hits = {self.by_key[value]} if value in self.by_key else set()
+            elif field == "year":
+                hits = self._years(value)
+            else:
+                hits = None
+                for w in _words(value) or [value]:
+                    word_hits = set(self.by_author.get(w, set())) if field in ("author", "") else set()
+                    if field in ("title", ""):
+                        word_hits |= self.by_word.get(w, set())
+                    if field == "" and w in self.by_key:
+                        word_hits.add(self.by_key[w])
+                    hits = word_hits if hits is None else hits & word_hits
+            result = hits if result is None else result & hits
+            if not result:
+                return []
+        if result is None:
+            return list(range(len(self.entries)))
+        return sorted(result)
+
+
+def format_entry(entry: dict) -> str:
+    """Compact one-line form: [key] Authors (year). Title. Venue."""
+    authors = [_last_name(a) for a in _authors(entry)]
+    if len(authors) > MAX_AUTHORS_SHOWN:
+        authors = authors[:MAX_AUTHORS_SHOWN] + ["et al."]
+    venue = _clean(entry.get("journal") or entry.get("booktitle") or entry.get("publisher") or "")
+    parts = [f"[{entry.get('ID', '?')}]", ", ".join(authors) or "Unknown",
+             f"({_clean(entry.get('year', '')) or 'n.d.'}).", _clean(entry.get("title", "")) + "."]
+    if venue:
+        parts.append(venue + ".")
+    return " ".join(p for p in parts if p)
+
+
+def format_entry_full(entry: dict) -> str:
+    """Every field of one entry, long values cut at MAX_FIELD_CHARS."""
+    lines = [f"[{entry.get('ID', '?')}] ({entry.get('ENTRYTYPE', '')})"]
+    for field, value in entry.items():
+        if field in ("ID", "ENTRYTYPE"):
+            continue
+        value = _clean(str(value))
+        if len(value) > MAX_FIELD_CHARS:
+            value = value[:MAX_FIELD_CHARS] + "..."
+        lines.append(f"  {field}: {value}")
+    return "\n".join(lines)
+
+
+# -------------------------------
+# PARSER
+# -------------------------------
+# A small scanner instead of bibtexparser: same entry dicts (ID, ENTRYTYPE,
+# lower-case field names, outer delimiters stripped, first of duplicate fields)
+# and the same entries dropped as malformed, but it only jumps between braces
+# with a regex, so a multi-megabyte file parses in well under a second.
+# Unlike bibtexparser's defaults it keeps non-standard entry types (@online,
+# @software, ...) and leaves an undefined @string macro as its name instead of
+# failing the whole file. tests/test_bibtex_store.py compares the two.
+_ENTRY_RE = re.compile(r"@\s*([A-Za-z]+)\s*([{(])")
+_BRACE_RE = re.compile(r"[{}]")
+_PAREN_RE = re.compile(r'[{}()"]')
+_FIELD_RE = re.compile(r"\s*([\w.+\-]+)\s*=\s*")
+_SEP_RE = re.compile(r"\s*(,?)\s*")
+_BARE_RE = re.compile(r"[^,#\s}]+")
+_INDENT_RE = re.compile(r"\n +")
+_MONTHS = {m[:3].lower(): m for m in ("January", "February", "March", "April", "May", "June", "July",
+                                      "August", "September", "October", "November", "December")}
+
+
+def _match_brace(text: str, open_pos: int) -> int:
+    """Index of the brace closing text[open_pos] ("{"), or -1."""
+    depth = 0
+    for m in _BRACE_RE.finditer(text, open_pos):
+        depth += 1 if m.group() == "{" else -1
+        if depth == 0:
+            return m.start()
+    return -1
+
+
+def _match_paren(text: str, open_pos: int) -> int:
+    """Index of the ")" closing an @entry( ... ) (not inside braces or quotes), or -1."""
+    depth, quoted = 0, False
+    for m in _PAREN_RE.finditer(text, open_pos + 1):
+        c = m.group()
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+        elif depth == 0 and c == '"':
+            quoted = not quoted
+        elif depth == 0 and not quoted and c == ")":
+            return m.start()
+    return -1
+
+
+def _match_quote(text: str, open_pos: int) -> int:
+    """Index of the '"' closing a quoted value (quotes inside braces don't count), or -1."""
+    depth, i = 0, open_pos + 1
+    while i < len(text):
+        c = text[i]
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+        elif c == '"' and depth == 0:
+            return i
+        i += 1
+    return -1
+
+
+def _parse_value(body: str, pos: int, strings: dict) -> Tuple[Optional[str], int]:
+    """One field value (with # concatenation) starting at pos; returns (value, end), value None if malformed."""
+    parts = []
+    while True:
+        if pos >= len(body):
+            return None, pos
+        c = body[pos]
+        if c in "{\"":
+            end = _match_brace(body, pos) if c == "{" else _match_quote(body, pos)
+            if end < 0:
+                return None, pos
+            parts.append(body[pos + 1:end])
+            pos = end + 1
+        else:
+            m = _BARE_RE.match(body, pos)
+            if not m:
+                return None, pos
+            token = m.group()
+            parts.append(strings.get(token.lower(), token))
+            pos = m.end()
+        while pos < len(body) and body[pos].isspace():
+            pos += 1
+        if pos < len(body) and body[pos] == "#":
+            pos += 1
+            while pos < len(body) and body[pos].isspace():
+                pos += 1
+            continue
+        value = "".join(parts)
+        return (_INDENT_RE.sub("\n", value) if "\n" in value else value), pos
+
+
+def _parse_fields(body: str, strings: dict) -> Optional[dict]:
+    """`name = value, ...` (a trailing comma is fine); None if anything else is in the way."""
+    fields, pos = {}, 0
+    while True:
+        m = _FIELD_RE.match(body, pos)
+        if not m:
+            return None
+        value, pos = _parse_value(body, m.end(), strings)
+        if value is None:
+            return None
+        fields.setdefault(m.group(1).lower(), value)
+        sep = _SEP_RE.match(body, pos)
+        pos = sep.end()
+        if pos == len(body):
+            return fields
+        if not sep.group(1):
+            return None
+
+
+def _parse(text: str) -> List[dict]:
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    entries, strings, pos = [], dict(_MONTHS), 0
+    while True:
+        check_cancelled()   # a tool call given up on stops parsing at the next entry
+        m = _ENTRY_RE.search(text, pos)
+        if not m:
+            break
+        # an entry starts its line (or follows the previous one); "text @misc{...}" is a comment
+        if text[max(pos, text.rfind("\n", 0, m.start()) + 1):m.start()].strip():
+            pos = m.end()
+            continue
+        entry_type, opener = m.group(1).lower(), m.end() - 1
+        close = _match_paren(text, opener) if text[opener] == "(" else _match_brace(text, opener)
+        if close < 0:
+            break   # unterminated entry: ignore the rest
+        body = text[opener + 1:close]
+        pos = close + 1
+        if entry_type in ("comment", "preamble"):
+            continue
+        if entry_type == "string":
+            strings.update(_parse_fields(body, strings) or {})
+            continue
+        key, comma, rest = body.partition(",")
+        key = key.strip()
+        fields = _parse_fields(rest, strings) if comma and key and not any(c.isspace() for c in key) else None
+        if fields:   # malformed entries are dropped, as bibtexparser does
+            entries.append({"ENTRYTYPE": entry_type, "ID": key, **fields})
+    return entries
+
+
+class BibtexStore:
+    """
+    LRU cache of parsed + indexed bibliographies. Files are keyed by absolute
+    path and re-parsed only when mtime/size change; raw BibTeX text is keyed
+    by its content hash (nothing is written to disk).
+    """
+
+    def __init__(self, max_entries: int = BIBTEX_CACHE_MAX):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, Tuple[tuple, BibIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._parse_locks: Dict[str, threading.Lock] = {}
+
+    def _get(self, cache_key: str, stamp: tuple, load) -> BibIndex:
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached and cached[0] == stamp:
+                self._cache.move_to_end(cache_key)
+                return cached[1]
+            parse_lock = self._parse_locks.setdefault(cache_key, threading.Lock())
+        # one parse per bibliography, even with concurrent callers
+        with parse_lock:
+            with self._lock:
+                cached = self._cache.get(cache_key)
+                if cached and cached[0] == stamp:
+                    return cached[1]
+            index = BibIndex(_parse(load()))
+            with self._lock:
+                self._cache[cache_key] = (stamp, index)
+                self._cache.move_to_end(cache_key)
+                while len(self._cache) > self.max_entries:
+                    evicted, _ = self._cache.popitem(last=False)
+                    self._parse_locks.pop(evicted, None)
+            return index
+
+    def load_file(self, path: str) -> BibIndex:
+        path = os.path.abspath(path)
+        st = os.stat(path)
+
+        def read():
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                return f.read()
+
+        return self._get(f"file:{path}", (st.st_mtime_ns, st.st_size), read)
+
+    def load_text(self, text: str) -> BibIndex:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return self._get(f"text:{digest}", (), lambda: text)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._parse_locks.clear()
+
+
+# Shared instance used by tools/bibtex_tool.py
+bibtex_store = BibtexStore()
@@ -1,57 +1,88 @@
-
-from langchain_community.utilities.bibtex import BibtexparserWrapper
-import tempfile
+import re
 from pathlib import Path
-import json
 
-# Create a singleton wrapper 
-_bibtex_wrapper = BibtexparserWrapper()
+from tools.cache import ToolError
+from tools.bibtex_store import (
+    bibtex_store, format_entry, format_entry_full, BIBTEX_DEFAULT_LIMIT, BIBTEX_MAX_LIMIT,
+)
 
+QUERY_SEPARATOR = "::"
+_TERM_RE = re.compile(r'(?:(key|author|year|title|limit):)?("[^"]*"|\S+)', re.IGNORECASE)
+
+USAGE = (
+    "Input: '<path.bib> [query]' or '<raw BibTeX> :: [query]'. Query terms (all must match): "
+    "key:<citekey> author:<name> year:<yyyy> or year:<from>-<to> title:<word> limit:<n>, "
+    "plain words match title, author or key."
+)
+
+
+def _split_input(input_text: str):
+    """Separate the bibliography (path or raw BibTeX) from the query."""
+    if QUERY_SEPARATOR in input_text:
+        source, _, query = input_text.rpartition(QUERY_SEPARATOR)
+        return source.strip(), query.strip()
+    if input_text.startswith("@"):
+        return input_text, ""
+    # "<path>.bib query words": the path ends at the first ".bib"
+    match = re.match(r"(.+?\.bib)(\s+.*)?$", input_text, re.IGNORECASE | re.DOTALL)
+    if match:
+        return match.group(1).strip(), (match.group(2) or "").strip()
+    return input_text, ""
 
-def _write_temp_bib(content: str) -> str:
-    """
-    If the input is raw BibTeX text, write it to a temporary .bib file
-    and return the temp file path.
-    """
-    tf = tempfile.NamedTemporaryFile(delete=False, suffix=".bib", mode="w", encoding="utf-8")
-    tf.write(content)
-    tf.flush()
-    tf.close()
-    return tf.name
+
+def _parse_query(query: str):
+    """Returns ([(field, value)], limit)."""
+    terms, limit = [], BIBTEX_DEFAULT_LIMIT
+    for field, value in _TERM_RE.findall(query):
+        field, value = field.lower(), value.strip('"')
+        if not value:
+            continue
+        if field == "limit":
+            if value.isdigit():
+                limit = max(1, min(int(value), BIBTEX_MAX_LIMIT))
+            continue
+        terms.append((field, value))
+    return terms, limit
 
 
 def parse_bibtex_tool(input_text: str) -> str:
     """
-    Parse a .bib file OR raw BibTeX content.
+    Search a .bib file OR raw BibTeX content.
 
     Accepts:
-    - Path to a .bib file
-    - Raw BibTeX starting with '@'
+    - Path to a .bib file, optionally followed by a query
+    - Raw BibTeX starting with '@', optionally followed by ':: <query>'
 
     Returns:
-    - JSON string of parsed entries
+    - Matching entries, one compact line each (full fields for key: lookups)
     - Or an error message
     """
     if not input_text or not isinstance(input_text, str):
-        return "ERROR: Expected path to a .bib file or raw BibTeX content."
-
-    input_text = input_text.strip()
-
-    # Case 1: Raw BibTeX string
-    if input_text.startswith("@"):
-        try:
-            input_text = _write_temp_bib(input_text)
-        except Exception as e:
-            return f"ERROR writing temporary BibTeX file: {e}"
+        return ToolError("ERROR: Expected path to a .bib file or raw BibTeX content. " + USAGE)
 
-    # Case 2: Path to .bib file
-    path = Path(input_text)
-    if not path.exists():
-        return f"ERROR: BibTeX file not found: {input_text}"
+    source, query = _split_input(input_text.strip())
 
     try:
-        entries = _bibtex_wrapper.load_bibtex_entries(str(path))
-        return json.dumps(entries, indent=2, ensure_ascii=False)
-
+        if source.startswith("@"):
+            index = bibtex_store.load_text(source)
+        else:
+            path = Path(source)
+            if not path.exists():
+                return ToolError(f"ERROR: BibTeX file not found: {source}")
+            index = bibtex_store.load_file(str(path))
     except Exception as e:
-        return f"BibTeX parsing error: {e}"
+        return ToolError(f"BibTeX parsing error: {e}")
+
+    terms, limit = _parse_query(query)
+    matches = index.search(terms)
+    if not matches:
+        return f"No entries match '{query}' ({len(index)} entries in bibliography). {USAGE}"
+
+    shown = [index.entries[i] for i in matches[:limit]]
+    # Citation-key lookups are for details: show every field
+    full = bool(terms) and all(field == "key" for field, _ in terms)
+    lines = [format_entry_full(e) if full else format_entry(e) for e in shown]
+    header = f"{len(matches)} of {len(index)} entries match" + (f" '{query}'" if query else "")
+    if len(matches) > limit:
+        header += f" (showing {limit}; narrow the query or raise limit:)"
+    return header + ":\n" + "\n".join(lines)
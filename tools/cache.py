@@ -0,0 +1,185 @@
+# tools/cache.py
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+from tools.lazy import ToolSpec
+
+# -------------------------------
+# CONFIG
+# -------------------------------
+CACHE_PATH = os.getenv("TOOL_CACHE_PATH", "./tool_cache.sqlite3")
+CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "5000"))  # LRU bound per tool
+
+# Per-tool TTL in seconds (tools not listed here are never cached)
+CACHE_TTLS = {
+    "wikipedia_search": 7 * 24 * 3600,
+    "arxiv_search": 24 * 3600,
+    "duckduckgo_search": 3600,
+}
+
+# Tool outputs starting with these are errors too, for tools that return plain
+# strings rather than ToolError (see is_error_output)
+_ERROR_PREFIXES = ("ERROR", "Wikipedia lookup error", "ArXiv lookup error", "DDG error", "RAG retriever error",
+                   "BibTeX parsing error", "Summarization error")
+
+# Per-request switch (see bypass_cache)
+_bypass = contextvars.ContextVar("tool_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass_cache(enabled: bool = True):
+    """Within this block, cached tools go straight to their backend (results are still stored)."""
+    token = _bypass.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def cache_bypassed() -> bool:
+    """Whether the current request skips the tool result cache."""
+    return _bypass.get()
+
+
+def normalize_input(text: str) -> str:
+    """Cache key normalization: case, surrounding quotes and whitespace don't matter."""
+    text = (text or "").strip().strip("\"'").lower()
+    return re.sub(r"\s+", " ", text)
+
+
+class ToolResultCache:
+    """
+    SQLite-backed TTL + LRU cache for tool outputs.
+    Safe to share between threads and between worker processes (one connection per process).
+    Hit/miss counters are stored in the same file so every process sees the totals.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _db(self) -> sqlite3.Connection:
+        # Reconnect after fork: sqlite connections must not cross processes
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " tool TEXT, key TEXT, value TEXT, expires_at REAL, last_used REAL,"
+                " PRIMARY KEY (tool, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (tool, last_used)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters ("
+                " tool TEXT PRIMARY KEY, hits INTEGER DEFAULT 0, misses INTEGER DEFAULT 0)"
+            )
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(normalize_input(text).encode("utf-8")).hexdigest()
+
+    def _count(self, db, tool: str, column: str):
+        db.execute(f"INSERT INTO counters (tool, {column}) VALUES (?, 1) "
+                   f"ON CONFLICT(tool) DO UPDATE SET {column} = {column} + 1", (tool,))
+
+    def get(self, tool: str, text: str) -> Optional[str]:
+        now = time.time()
+        key = self._key(text)
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT value, expires_at FROM results WHERE tool = ? AND key = ?",
+                             (tool, key)).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    db.execute("DELETE FROM results WHERE tool = ? AND key = ?", (tool, key))
+                self._count(db, tool, "misses")
+                return None
+            db.execute("UPDATE results SET last_used = ? WHERE tool = ? AND key = ?", (now, tool, key))
+            self._count(db, tool, "hits")
+            return row[0]
+
+    def set(self, tool: str, text: str, value: str, ttl: float):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                       (tool, self._key(text), value, now + ttl, now))
+            # LRU bound: drop least recently used rows beyond max_entries
+            db.execute(
+                "DELETE FROM results WHERE tool = ? AND key IN ("
+                " SELECT key FROM results WHERE tool = ? ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (tool, tool, self.max_entries),
+            )
+
+    def clear(self, tool: Optional[str] = None):
+        with self._lock:
+            db = self._db()
+            if tool:
+                db.execute("DELETE FROM results WHERE tool = ?", (tool,))
+            else:
+                db.execute("DELETE FROM results")
+
+    def stats(self) -> dict:
+        with self._lock:
+            db = self._db()
+            counters = {t: {"hits": h, "misses": m}
+                        for t, h, m in db.execute("SELECT tool, hits, misses FROM counters")}
+            for t, n in db.execute("SELECT tool, COUNT(*) FROM results GROUP BY tool"):
+                counters.setdefault(t, {"hits": 0, "misses": 0})["entries"] = n
+        return counters
+
+
+# Shared instance used by the registry
+tool_cache = ToolResultCache()
+
+
+class ToolError(str):
+    """
+    A tool's failure message. The LLM sees it as the plain string it is, but it
+    is never cached and the agent's circuit breakers count it as a failure.
+    """
+
+
+def is_error_output(result) -> bool:
+    """True for a ToolError, a string with a known error prefix, or an empty result."""
+    if isinstance(result, ToolError):
+        return True
+    return not isinstance(result, str) or not result or result.startswith(_ERROR_PREFIXES)
+
+
+def cached_tool(tool: ToolSpec, ttl: float, cache: ToolResultCache = tool_cache) -> ToolSpec:
+    """Return a copy of `tool` whose func reads/writes the shared result cache."""
+    func = tool.func
+
+    def _cached(tool_input: str) -> str:
+        if not _bypass.get():
+            try:
+                hit = cache.get(tool.name, tool_input)
+            except sqlite3.Error as e:
+                print(f" Tool cache read failed for '{tool.name}': {e}")
+                hit = None
+            if hit is not None:
+                return hit
+        result = func(tool_input)
+        if not is_error_output(result):
+            try:
+                cache.set(tool.name, tool_input, result, ttl)
+            except sqlite3.Error as e:
+                print(f" Tool cache write failed for '{tool.name}': {e}")
+        return result
+
+    return ToolSpec(name=tool.name, func=_cached, description=tool.description)
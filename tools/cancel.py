@@ -0,0 +1,97 @@
+# tools/cancel.py
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Optional, Tuple, Union
+
+
+class ToolCancelled(Exception):
+    """The tool call was given up on (its deadline passed or every caller abandoned it)."""
+
+
+class CancelScope:
+    """
+    Deadline + cancel flag for one tool execution. The agent sets it for the
+    thread running the tool; blocking work checks it or clips its timeouts to it
+    (the HTTP transport's attempts, backoff and rate-limit waits, the DDGS
+    client's timeout, the RAG summarizer's stream, the BibTeX scanner), so a
+    call the agent has given up on stops at its deadline instead of running on
+    in the background. Code outside these (e.g. the embedding request of a RAG
+    lookup) still runs to completion.
+    """
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = deadline      # absolute time.time(); None = no deadline
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or (self.deadline is not None and time.time() >= self.deadline)
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else max(0.0, self.deadline - time.time())
+
+    def check(self):
+        if self._event.is_set():
+            raise ToolCancelled("tool call cancelled")
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise ToolCancelled("tool call deadline passed")
+
+    def sleep(self, seconds: float):
+        """Sleep, waking early (with ToolCancelled) if cancelled or past the deadline."""
+        remaining = self.remaining()
+        self._event.wait(seconds if remaining is None else min(seconds, remaining))
+        self.check()
+
+
+_scope: contextvars.ContextVar = contextvars.ContextVar("tool_cancel_scope", default=None)
+
+
+@contextmanager
+def cancel_scope(scope: CancelScope):
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def current_scope() -> Optional[CancelScope]:
+    return _scope.get()
+
+
+def check_cancelled():
+    """Raise ToolCancelled if the current tool call was given up on (no-op outside a scope)."""
+    scope = _scope.get()
+    if scope is not None:
+        scope.check()
+
+
+def sleep(seconds: float):
+    scope = _scope.get()
+    if scope is None:
+        time.sleep(seconds)
+    else:
+        scope.sleep(seconds)
+
+
+def remaining(default: float) -> float:
+    """Seconds left for the current tool call, at most `default`."""
+    scope = _scope.get()
+    left = None if scope is None else scope.remaining()
+    return default if left is None else min(default, left)
+
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+def bounded_timeout(timeout: Timeout) -> Timeout:
+    """A requests-style (connect, read) timeout clipped to the current call's deadline."""
+    check_cancelled()
+    if isinstance(timeout, tuple):
+        return tuple(max(0.01, remaining(t)) for t in timeout)
+    return max(0.01, remaining(timeout))
@@ -0,0 +1,114 @@
+# tools/circuit.py
+import os
+import time
+import threading
+from typing import Dict
+
+from tracing import metrics
+
+# -------------------------------
+# CONFIG (override with env vars)
+# -------------------------------
+CIRCUIT_FAILURES = int(os.getenv("CIRCUIT_FAILURES", "3"))       # consecutive failures that open a circuit
+CIRCUIT_COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", "30"))    # seconds open before one trial call
+
+CIRCUIT_TRANSITIONS = metrics.counter("agent_tool_circuit_transitions_total",
+                                      "Tool circuit breaker state changes (this process), by new state.",
+                                      ("tool", "state"))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker for one tool.
+
+    closed: calls go through; CIRCUIT_FAILURES failures in a row open it.
+    open: calls fail fast until `cooldown` has passed.
+    half_open: one trial call is let through; success closes the circuit,
+    failure opens it for another cooldown.
+    """
+
+    def __init__(self, name: str, failures: int = CIRCUIT_FAILURES, cooldown: float = CIRCUIT_COOLDOWN):
+        self.name = name
+        self.failures = max(1, failures)
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._streak = 0
+        self._opened = 0.0
+        self._trial = False
+
+    def _set(self, state: str):
+        if state != self._state:
+            self._state = state
+            CIRCUIT_TRANSITIONS.inc(tool=self.name, state=state)
+            print(f" Circuit for tool '{self.name}' is now {state}.")
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.time() - self._opened >= self.cooldown:
+                return "half_open"
+            return self._state
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit lets a trial call through."""
+        with self._lock:
+            return max(0.0, self._opened + self.cooldown - time.time()) if self._state == "open" else 0.0
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now (the caller must then report success or failure)."""
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open" and time.time() - self._opened >= self.cooldown:
+                self._set("half_open")
+            if self._state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._streak = 0
+            self._trial = False
+            self._set("closed")
+
+    def record_failure(self):
+        with self._lock:
+            self._streak += 1
+            self._trial = False
+            if self._state == "half_open" or self._streak >= self.failures:
+                self._opened = time.time()
+                self._set("open")
+
+    def release(self):
+        """The call was neither a success nor a failure (e.g. abandoned): free a half-open trial."""
+        with self._lock:
+            self._trial = False
+
+
+class CircuitBreakers:
+    """One CircuitBreaker per tool name, created on first use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name)
+            return breaker
+
+    def stats(self) -> dict:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {b.name: {"state": b.state, "retry_in": round(b.retry_in(), 1)} for b in breakers}
+
+
+# Shared per-process registry used by the agent
+breakers = CircuitBreakers()
+
+metrics.gauge("agent_tool_circuits_open", "Tool circuits currently open (this process).",
+              lambda: sum(1 for s in breakers.stats().values() if s["state"] == "open"))
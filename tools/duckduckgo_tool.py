@@ -1,15 +1,48 @@
+import os
+import threading
+
 from ddgs import DDGS
 
+from tools.http_transport import transport
+from tools.cancel import check_cancelled, remaining
+from tools.cache import ToolError
+from tracing import span
+
+DDG_HOST = "duckduckgo.com"
+MAX_RESULTS = 5
+DDG_TIMEOUT = float(os.getenv("DDG_TIMEOUT", "10"))   # seconds per DDGS request, clipped to the call's deadline
+
+# One DDGS client per thread, reused across calls (keeps its connections alive)
+_local = threading.local()
+
+
+def _client(timeout: float) -> DDGS:
+    """
+    This thread's client, or a one-off client with a shorter timeout when the
+    call's deadline is nearer than DDG_TIMEOUT. DDGS can't be interrupted once it
+    is waiting on the network; the timeout is what ends it at the deadline.
+    """
+    if timeout < DDG_TIMEOUT:
+        return DDGS(timeout=timeout)
+    client = getattr(_local, "client", None)
+    if client is None:
+        client = _local.client = DDGS(timeout=DDG_TIMEOUT)
+    return client
+
+
 def ddg_search(query: str) -> str:
     try:
-        with DDGS() as ddgs:
-            results = ddgs.text(query, max_results=5)
-            formatted = []
-            for r in results:
-                title = r.get("title")
-                href = r.get("href")
-                snippet = r.get("body") or ""
-                formatted.append(f"{title}\n{href}\n{snippet}\n")
-            return "\n".join(formatted) if formatted else "No results."
+        # DDGS brings its own HTTP client: apply the shared per-host limits around it
+        with span("http", host=DDG_HOST) as info, transport.limit(DDG_HOST, info):
+            check_cancelled()
+            results = _client(max(0.5, remaining(DDG_TIMEOUT))).text(query, max_results=MAX_RESULTS)
+            info["status"] = "ok"
+        formatted = []
+        for r in results:
+            title = r.get("title")
+            href = r.get("href")
+            snippet = r.get("body") or ""
+            formatted.append(f"{title}\n{href}\n{snippet}\n")
+        return "\n".join(formatted) if formatted else "No results."
     except Exception as e:
-        return f"DDG error: {str(e)}"
+        return ToolError(f"DDG error: {str(e)}")
@@ -0,0 +1,253 @@
+# tools/http_transport.py
+import os
+import time
+import random
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tracing import span
+from tools import cancel
+
+# -------------------------------
+# CONFIG
+# -------------------------------
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))            # keep-alive connections kept per host
+HTTP_HOST_CONCURRENCY = int(os.getenv("HTTP_HOST_CONCURRENCY", "4"))  # requests in flight per host
+HTTP_RATE = float(os.getenv("HTTP_RATE", "5"))                     # requests/second per host (token bucket)
+HTTP_BURST = int(os.getenv("HTTP_BURST", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))             # first retry delay, doubled per attempt
+HTTP_BACKOFF_MAX = 10.0
+HTTP_MAX_WAIT = float(os.getenv("HTTP_MAX_WAIT", "30"))            # longest we queue for a slot/token
+HTTP_TIMEOUT = (5, 20)                                             # (connect, read) seconds
+HTTP_USER_AGENT = os.getenv("HTTP_USER_AGENT", "agnikul-agent/1.0 (research assistant)")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Per-host overrides of rate/burst/concurrency (upstream usage policies)
+HOST_LIMITS = {
+    "export.arxiv.org": {"rate": 1 / 3, "burst": 1, "concurrency": 1},   # arXiv asks for 1 request / 3 s
+    "duckduckgo.com": {"rate": 1, "burst": 3, "concurrency": 2},
+}
+
+
+class HttpThrottled(Exception):
+    """A request would have to wait longer than HTTP_MAX_WAIT for a slot or token."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket; reserve() takes a token and says how long to sleep before using it."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float) -> float:
+        """Seconds to wait for the reserved token; raises HttpThrottled if more than max_wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if wait > max_wait:
+                raise HttpThrottled(f"rate limit: next slot in {wait:.1f}s")
+            self._tokens -= 1
+            return wait
+
+
+class _Host:
+    def __init__(self, name: str):
+        limits = HOST_LIMITS.get(name, {})
+        self.name = name
+        self.bucket = TokenBucket(limits.get("rate", HTTP_RATE), limits.get("burst", HTTP_BURST))
+        self.slots = threading.BoundedSemaphore(limits.get("concurrency", HTTP_HOST_CONCURRENCY))
+        self.in_flight = 0
+        self.waiting = 0
+
+
+class HttpTransport:
+    """
+    Shared HTTP client for the network tools: one pooled keep-alive Session per
+    process, a concurrency limit and a token bucket per host, and retries with
+    exponential backoff (honouring Retry-After) on connection errors and
+    429/5xx responses. limit(host) applies the same per-host limits to clients
+    that bring their own HTTP stack (DDGS). Inside a tool call's cancel scope
+    (tools/cancel.py), waits and timeouts are clipped to its deadline and a
+    cancelled call stops before its next attempt.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, _Host] = {}
+        self._session: Optional[requests.Session] = None
+        self._pid = None
+        self._reported: Dict[str, int] = {}   # host -> connections already put in a span
+
+    @property
+    def session(self) -> requests.Session:
+        # one Session per process (pool workers must not share sockets with their parent)
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.headers["User-Agent"] = HTTP_USER_AGENT
+                    self._session, self._pid = session, os.getpid()
+                    self._reported = {}
+        return self._session
+
+    def _host(self, name: str) -> _Host:
+        with self._lock:
+            host = self._hosts.get(name)
+            if host is None:
+                host = self._hosts[name] = _Host(name)
+            return host
+
+    def _pools(self):
+        """The urllib3 connection pools of this process's session."""
+        for adapter in set(self.session.adapters.values()):
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is not None:
+                    yield pool
+
+    def _connections_opened(self, name: str) -> int:
+        """
+        Connections the pool has opened to host `name` since the last call. Each is
+        reported once (by whichever request asks next), so the "connections" span
+        attributes add up to the pool's total, across worker processes too.
+        """
+        opened = sum(pool.num_connections for pool in self._pools() if pool.host == name)
+        with self._lock:
+            reported = self._reported.get(name, 0)
+            if opened < reported:   # a pool was evicted and recreated
+                reported = 0
+            self._reported[name] = opened
+        return opened - reported
+
+    def configure_host(self, name: str, rate: Optional[float] = None, burst: Optional[int] = None,
+                       concurrency: Optional[int] = None):
+        """Override one host's limits (benchmarks, stub servers); applies to new requests."""
+        limits = {**HOST_LIMITS.get(name, {})}
+        limits.update({k: v for k, v in (("rate", rate), ("burst", burst), ("concurrency", concurrency))
+                       if v is not None})
+        HOST_LIMITS[name] = limits
+        with self._lock:
+            self._hosts.pop(name, None)
+
+    @contextmanager
+    def limit(self, name: str, info: Optional[dict] = None):
+        """
+        Hold one of `name`'s concurrency slots and one rate token for the block.
+        info (a span's attribute dict) gets the seconds spent waiting and the throttle reasons.
+        """
+        info = {} if info is None else info
+        host = self._host(name)
+        started = time.monotonic()
+        with self._lock:
+            host.waiting += 1
+        try:
+            if not host.slots.acquire(blocking=False):
+                info.setdefault("throttled", []).append("concurrency")
+                if not host.slots.acquire(timeout=cancel.remaining(HTTP_MAX_WAIT)):
+                    cancel.check_cancelled()
+                    info.setdefault("throttled", []).append("refused")
+                    raise HttpThrottled(f"{name}: no free connection slot after {HTTP_MAX_WAIT:.0f}s")
+        finally:
+            with self._lock:
+                host.waiting -= 1
+        try:
+            try:
+                wait = host.bucket.reserve(cancel.remaining(max(0.0, HTTP_MAX_WAIT - (time.monotonic() - started))))
+            except HttpThrottled:
+                info.setdefault("throttled", []).append("refused")
+                raise
+            if wait > 0:
+                info.setdefault("throttled", []).append("rate_limit")
+                cancel.sleep(wait)
+            info["wait"] = round(info.get("wait", 0.0) + time.monotonic() - started, 4)
+            with self._lock:
+                host.in_flight += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    host.in_flight -= 1
+        finally:
+            host.slots.release()
+
+    def request(self, method: str, url: str, retries: int = HTTP_RETRIES, **kwargs) -> requests.Response:
+        """
+        Send one request through the pool. Retries connection errors and
+        RETRY_STATUSES; the last response is returned (callers raise_for_status).
+        Recorded as one "http" span (host, status, attempts, wait, throttled, and
+        connections: new TCP connections it opened, 0 on keep-alive reuse).
+        """
+        name = urlsplit(url).hostname or ""
+        timeout = kwargs.pop("timeout", HTTP_TIMEOUT)
+        with span("http", host=name, attempts=0, connections=0) as info:
+            for attempt in range(retries + 1):
+                info["attempts"] = attempt + 1
+                delay = None
+                try:
+                    with self.limit(name, info):
+                        try:
+                            resp = self.session.request(method, url, timeout=cancel.bounded_timeout(timeout),
+                                                        **kwargs)
+                        finally:
+                            info["connections"] += self._connections_opened(name)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    info["status"] = "error"
+                    if attempt >= retries:
+                        raise
+                    info.setdefault("retried", []).append(type(e).__name__)
+                else:
+                    info["status"] = resp.status_code
+                    if resp.status_code not in RETRY_STATUSES or attempt >= retries:
+                        return resp
+                    if resp.status_code in (429, 503):
+                        info.setdefault("throttled", []).append("upstream")
+                    info.setdefault("retried", []).append(str(resp.status_code))
+                    delay = _retry_after(resp)
+                    resp.close()
+                if delay is None:
+                    delay = min(HTTP_BACKOFF_MAX, HTTP_BACKOFF * 2 ** attempt) * random.uniform(0.5, 1.0)
+                cancel.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def stats(self) -> dict:
+        """Per-host slots in use/queued, plus connections opened and requests sent over them."""
+        with self._lock:
+            hosts = {name: {"in_flight": h.in_flight, "waiting": h.waiting} for name, h in self._hosts.items()}
+            session = self._session if self._pid == os.getpid() else None
+        if session is not None:
+            for pool in self._pools():
+                entry = hosts.setdefault(pool.host, {"in_flight": 0, "waiting": 0})
+                entry["connections_opened"] = entry.get("connections_opened", 0) + pool.num_connections
+                entry["requests_sent"] = entry.get("requests_sent", 0) + pool.num_requests
+        return hosts
+
+
+def _retry_after(resp: requests.Response) -> Optional[float]:
+    value = resp.headers.get("Retry-After", "")
+    try:
+        return min(HTTP_BACKOFF_MAX, max(0.0, float(value)))
+    except ValueError:
+        return None
+
+
+# Shared instance used by the network tools
+transport = HttpTransport()
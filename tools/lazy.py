@@ -0,0 +1,64 @@
+# tools/lazy.py
+import importlib
+import threading
+from typing import Callable, Optional
+
+
+class LazyFunc:
+    """
+    Callable that imports `module.attr` on first use.
+    Thread-safe: the import runs exactly once even if many threads call at the same time.
+    """
+
+    def __init__(self, module: str, attr: str):
+        self.module = module
+        self.attr = attr
+        self._func: Optional[Callable] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._func is not None
+
+    def resolve(self) -> Callable:
+        if self._func is None:
+            with self._lock:
+                if self._func is None:
+                    self._func = getattr(importlib.import_module(self.module), self.attr)
+        return self._func
+
+    def override(self, func: Callable):
+        """Replace the backend without importing it (benchmarks, fakes)."""
+        with self._lock:
+            self._func = func
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"LazyFunc({self.module}.{self.attr}, loaded={self.loaded})"
+
+
+class ToolSpec:
+    """
+    Lightweight tool descriptor (name, description, func) used by the registry.
+    Has the attributes the agent reads from a langchain Tool, without importing
+    langchain; as_tool() builds the real Tool when one is needed.
+    """
+
+    __slots__ = ("name", "description", "func")
+
+    def __init__(self, name: str, func: Callable, description: str = ""):
+        self.name = name
+        self.func = func
+        self.description = description
+
+    def invoke(self, tool_input: str) -> str:
+        return self.func(tool_input)
+
+    def as_tool(self):
+        from langchain_core.tools import Tool
+        return Tool(name=self.name, func=self.func, description=self.description)
+
+    def __repr__(self):
+        return f"ToolSpec({self.name!r})"
@@ -0,0 +1,142 @@
+# tools/rag_context.py
+import os
+import re
+from typing import List, Optional
+
+import numpy as np
+
+from bm25_index import tokenize
+
+# -------------------------------
+# CONFIG (override with env vars)
+# -------------------------------
+RAG_TOKEN_BUDGET = int(os.getenv("RAG_TOKEN_BUDGET", "600"))                 # context tokens passed on
+RAG_PASSAGE_TOKENS = int(os.getenv("RAG_PASSAGE_TOKENS", "160"))             # cap per passage (compacted beyond)
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))                   # relevance vs novelty
+RAG_DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.92"))        # cosine that counts as a near-duplicate
+RAG_RERANK_DENSE_WEIGHT = float(os.getenv("RAG_RERANK_DENSE_WEIGHT", "0.6"))  # dense similarity vs query-term coverage
+CHARS_PER_TOKEN = 4
+MIN_PASSAGE_TOKENS = 24     # don't add a passage squeezed below this
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+|\n+")
+_STOP = {"a", "an", "the", "of", "to", "in", "on", "for", "is", "are", "was", "what", "who", "how", "does",
+         "do", "and", "about", "its", "it", "any", "me", "can", "this", "which", "has", "with", "from", "when",
+         "where", "did", "tell"}
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def query_terms(query: str) -> set:
+    return {t for t in tokenize(query) if t not in _STOP}
+
+
+def _normalize_rows(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def coverage(terms: set, texts: List[str]) -> np.ndarray:
+    """Share of the query terms each text contains."""
+    if not terms:
+        return np.zeros(len(texts), dtype=np.float32)
+    return np.array([len(terms & set(tokenize(t))) / len(terms) for t in texts], dtype=np.float32)
+
+
+def rerank_scores(query_vec: Optional[np.ndarray], doc_vecs: Optional[np.ndarray], terms: set,
+                  texts: List[str], dense_weight: float = RAG_RERANK_DENSE_WEIGHT) -> np.ndarray:
+    """
+    Relevance per passage: cosine to the query blended with query-term coverage
+    (a cheap stand-in for a cross-encoder: exact names, years and part numbers
+    weigh in even when the embedding glosses over them).
+    """
+    lexical = coverage(terms, texts)
+    if query_vec is None or doc_vecs is None:
+        return lexical
+    return dense_weight * (doc_vecs @ query_vec) + (1.0 - dense_weight) * lexical
+
+
+def mmr_order(relevance: np.ndarray, sims: np.ndarray, k: int, lam: float = RAG_MMR_LAMBDA,
+              dedup_threshold: float = RAG_DEDUP_THRESHOLD) -> List[int]:
+    """
+    Maximal marginal relevance over a precomputed passage similarity matrix:
+    each pick maximizes lam * relevance - (1 - lam) * (max similarity to the
+    picks so far). Passages at or above `dedup_threshold` to a pick are dropped.
+    """
+    n = len(relevance)
+    redundancy = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    picks: List[int] = []
+    while len(picks) < k and available.any():
+        score = np.where(available, lam * relevance - (1.0 - lam) * redundancy, -np.inf)
+        best = int(np.argmax(score))
+        picks.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, sims[best])
+        available &= sims[best] < dedup_threshold
+    return picks
+
+
+def compact(text: str, terms: set, max_tokens: int) -> str:
+    """
+    Fit a passage into `max_tokens`: keep the sentences with the most query
+    terms (in their original order), hard-cut as a last resort.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    sentences = [s.strip() for s in _SENTENCE_RE.split(text) if s and s.strip()]
+    ranked = sorted(range(len(sentences)),
+                    key=lambda i: (-len(terms & set(tokenize(sentences[i]))), i))
+    keep, used = [], 0
+    for i in ranked:
+        cost = estimate_tokens(sentences[i]) + 1
+        if used + cost > max_tokens:
+            continue
+        keep.append(i)
+        used += cost
+    if not keep:
+        return text[:max_tokens * CHARS_PER_TOKEN].rstrip() + " …"
+    return " … ".join(sentences[i] for i in sorted(keep))
+
+
+def select_context(query: str, texts: List[str], embeddings=None, k: int = 5,
+                   token_budget: int = RAG_TOKEN_BUDGET,
+                   passage_tokens: int = RAG_PASSAGE_TOKENS) -> List[dict]:
+    """
+    Rerank retrieved passages, drop near-duplicates, pick a diverse top `k` by
+    MMR and compact them into `token_budget`. Returns [{"index", "text",
+    "score"}] in pick order; `index` points into `texts`.
+
+    Passage vectors come from `embeddings` (the shared disk cache already holds
+    them for indexed documents). Without embeddings, or if embedding fails,
+    ranking is by term coverage and only exact duplicates are dropped.
+    """
+    if not texts:
+        return []
+    terms = query_terms(query)
+    query_vec = doc_vecs = sims = None
+    if embeddings is not None:
+        try:
+            doc_vecs = _normalize_rows(np.asarray(embeddings.embed_documents(texts), dtype=np.float32))
+            query_vec = _normalize_rows(np.asarray(embeddings.embed_query(query), dtype=np.float32))
+            sims = doc_vecs @ doc_vecs.T
+        except Exception as e:
+            print(f" RAG rerank without embeddings: {e}")
+            query_vec = doc_vecs = sims = None
+    if sims is None:
+        # exact duplicates (e.g. the same row from the dense and lexical lists)
+        keys = [" ".join(tokenize(t)) for t in texts]
+        sims = np.array([[float(a == b) for b in keys] for a in keys], dtype=np.float32)
+
+    relevance = rerank_scores(query_vec, doc_vecs, terms, texts)
+    selected, remaining = [], token_budget
+    for i in mmr_order(relevance, sims, k):
+        limit = min(passage_tokens, remaining)
+        if limit < MIN_PASSAGE_TOKENS:
+            break
+        text = compact(texts[i], terms, limit)
+        remaining -= estimate_tokens(text)
+        selected.append({"index": i, "text": text, "score": round(float(relevance[i]), 4)})
+    return selected
@@ -1,21 +1,56 @@
 # tools/rag_tool.py
 from langchain_core.tools import Tool
+import os
 import traceback
 
+from tracing import span
+from tools.cancel import check_cancelled, remaining
+from tools.cache import ToolError
+from tools.rag_context import select_context, estimate_tokens
+
 # retrieval
 from vector import retriever
 try:
     from vector import vector_store
 except Exception:
     vector_store = None
+try:
+    from vector import lexical_index
+except Exception:
+    lexical_index = None
+try:
+    from vector import refresh_indexes
+except Exception:
+    refresh_indexes = None
+try:
+    from vector import embeddings
+except Exception:
+    embeddings = None
+
+# Hybrid retrieval: dense + BM25 combined by weighted reciprocal rank fusion
+HYBRID_DENSE_WEIGHT = float(os.getenv("HYBRID_DENSE_WEIGHT", "1.0"))
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Context: RAG_CANDIDATES retrieved, reranked and MMR-deduplicated down to
+# RAG_TOP_K passages within a token budget (see rag_context.py).
+# RAG_MODE "summarize" runs the summarizer LLM over them; "extractive" returns
+# the passages with sources to the agent directly (one generation fewer).
+RAG_MODE = os.getenv("RAG_MODE", "summarize")
+RAG_CANDIDATES = int(os.getenv("RAG_CANDIDATES", "10"))
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+SUMMARIZE_TIMEOUT = float(os.getenv("SUMMARIZE_TIMEOUT", "60"))   # seconds; clipped to the tool call's deadline
 
 # local LLM (used to summarize retrieved docs)
 from langchain_ollama.llms import OllamaLLM
 from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+import ollama
 
 # instantiate a short-lived local model for summarization
-_summarizer_llm = OllamaLLM(model="gemma3:latest", base_url="http://localhost")
+_summarizer_llm = OllamaLLM(
+    model=os.getenv("OLLAMA_MODEL", "gemma3:latest"),
+    base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost"),
+)
 _summary_template = """You are a concise, factual assistant. Use ONLY the CONTEXT to answer the QUESTION below.
 If the context does not contain the answer, say "I don't know (not in context)."
 
@@ -31,11 +66,40 @@ If the context does not contain the answer, say "I don't know (not in context)."
 """
 
 _prompt = PromptTemplate.from_template(_summary_template)
-_summary_chain = _prompt | _summarizer_llm | StrOutputParser()
 
 
+def _summarize(context_text: str, question: str) -> str:
+    """
+    Stream the summary with a timeout clipped to the tool call's deadline, checking
+    its cancel scope between chunks: a call given up on closes the HTTP stream (Ollama
+    stops generating), and one still waiting for the first chunk times out at the
+    deadline. Same request the pinned OllamaLLM makes (model from _summarizer_llm,
+    host from OLLAMA_HOST), whose own client has no timeout.
+    """
+    client = ollama.Client(timeout=max(0.5, remaining(SUMMARIZE_TIMEOUT)))
+    prompt = _prompt.format(context=context_text, question=question)
+    stream = client.generate(model=_summarizer_llm.model, prompt=prompt, stream=True)
+    chunks = []
+    try:
+        for part in stream:
+            check_cancelled()
+            chunks.append(part["response"])
+    finally:
+        stream.close()
+    return "".join(chunks)
+
 
 def _call_retriever(query: str, k: int = 5):
+    """
+    Top-k dense matches. The vector store is asked for `k` directly; the
+    retriever (built with a fixed k in vector.py) is only the fallback.
+    """
+    if vector_store is not None and hasattr(vector_store, "similarity_search"):
+        try:
+            return vector_store.similarity_search(query, k=k)
+        except Exception:
+            pass
+
     candidates = [
         "get_relevant_documents",
         "retrieve",
@@ -59,59 +123,81 @@ def _call_retriever(query: str, k: int = 5):
                     continue
             except Exception:
                 continue
-
-    # fallback to vector_store methods
-    if vector_store is not None:
-        try:
-            if hasattr(vector_store, "similarity_search"):
-                return vector_store.similarity_search(query, k=k)
-            if hasattr(vector_store, "search"):
-                return vector_store.search(query, k=k)
-        except Exception:
-            return []
     return []
 
 
+def _reciprocal_rank_fusion(ranked_lists, weights, k: int):
+    """Weighted RRF over lists of documents; documents are matched by their text."""
+    scores, docs = {}, {}
+    for ranked, weight in zip(ranked_lists, weights):
+        for rank, d in enumerate(ranked):
+            key = getattr(d, "page_content", None) or str(d)
+            docs.setdefault(key, d)
+            scores[key] = scores.get(key, 0.0) + weight / (RRF_K + rank + 1)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in best]
+
+
+def _hybrid_retrieve(query: str, k: int = 5):
+    """Dense retriever results fused with BM25 results (dense only if no lexical index)."""
+    if refresh_indexes is not None:
+        refresh_indexes()   # pick up uploads ingested by the API process
+    dense = _call_retriever(query, k=k) or []
+    if lexical_index is None or HYBRID_LEXICAL_WEIGHT <= 0:
+        return dense
+    lexical = [d for d, _ in lexical_index.search(query, k=k)]
+    return _reciprocal_rank_fusion([dense, lexical], [HYBRID_DENSE_WEIGHT, HYBRID_LEXICAL_WEIGHT], k)
+
+
+def _source(doc) -> str:
+    meta = getattr(doc, "metadata", None) or {}
+    return meta.get("source", "") if isinstance(meta, dict) else ""
+
+
+def _extractive_result(passages: list, unique_sources: str) -> str:
+    blocks = [f"[{i}] {p['text']}" + (f" (Source: {p['source']})" if p["source"] else "")
+              for i, p in enumerate(passages, 1)]
+    return "Relevant passages:\n\n" + "\n\n".join(blocks) + f"\n\nSources: {unique_sources}"
+
+
 def rag_search(query: str) -> str:
     """
-    Retrieve top docs, then ask the LLM to synthesize an answer (with sources).
-    Returns a short, LLM-generated summary + Sources line.
+    Retrieve candidate docs, keep a reranked, deduplicated few within the token
+    budget, then either ask the LLM to synthesize an answer (summarize mode)
+    or return the passages themselves (extractive mode). Both end with a
+    Sources line.
     """
     try:
-        docs = _call_retriever(query, k=5)
+        with span("retrieval") as info:
+            docs = _hybrid_retrieve(query, k=max(RAG_CANDIDATES, RAG_TOP_K))
+            info["candidates"] = len(docs)
+            texts = [getattr(d, "page_content", None) or getattr(d, "content", None) or str(d) for d in docs]
+            passages = select_context(query, texts, embeddings, k=RAG_TOP_K)
+            for p in passages:
+                p["source"] = _source(docs[p["index"]])
+            info["docs"] = len(passages)
+            info["context_tokens"] = sum(estimate_tokens(p["text"]) for p in passages)
     except Exception as e:
-        return f"RAG retriever error: {e}\n\nTraceback:\n{traceback.format_exc()}"
+        return ToolError(f"RAG retriever error: {e}\n\nTraceback:\n{traceback.format_exc()}")
 
-    if not docs:
+    if not passages:
         return "No relevant documents found in the local dataset."
 
-    # Build a concise context and collect sources
-    snippets = []
-    sources = []
-    for d in docs:
-        text = getattr(d, "page_content", None) or getattr(d, "content", None) or str(d)
-        snippets.append(text)
-        meta = getattr(d, "metadata", None) or {}
-        if isinstance(meta, dict):
-            src = meta.get("source")
-            if src:
-                sources.append(src)
-
-    context_text = "\n\n".join(snippets)
     # distill unique, short source names
+    sources = [p["source"] for p in passages if p["source"]]
     unique_sources = ", ".join(sorted(set(sources))) if sources else "no source metadata"
 
-    # Run the summarization chain (safe: truncate context if huge)
-    MAX_CHARS = 12000
-    if len(context_text) > MAX_CHARS:
-        context_text = context_text[:MAX_CHARS] + "\n\n[TRUNCATED]"
+    if RAG_MODE == "extractive":
+        return _extractive_result(passages, unique_sources)
 
+    context_text = "\n\n".join(f"[{p['source']}] {p['text']}" if p["source"] else p["text"] for p in passages)
     try:
-        result = _summary_chain.invoke({"context": context_text, "question": query})
+        with span("summarize", context_chars=len(context_text)) as info:
+            result = _summarize(context_text, query)
+            info["response_chars"] = len(result)
     except Exception as e:
-        # if summarization fails, fall back to returning short combined passages with provenance
-        fallback = "\n\n".join(snippets[:3])
-        return f"Summarization error: {e}\n\nFallback passages:\n\n{fallback}\n\nSources: {unique_sources}"
+        # if summarization fails, fall back to the passages with provenance
+        return ToolError(f"Summarization error: {e}\n\n" + _extractive_result(passages[:3], unique_sources))
 
     # Guarantee a Sources line exists
     if "Sources:" not in result:
@@ -1,34 +1,74 @@
-from langchain_core.tools import Tool
-from tools.wiki_tool import wiki_search
-from tools.rag_tool import rag_search
-from tools.duckduckgo_tool import ddg_search
-from tools.bibtex_tool import parse_bibtex_tool
-from tools.arxiv_tool import arxiv_search 
+import threading
 
+from tools.lazy import LazyFunc, ToolSpec
+from tools.cache import cached_tool, CACHE_TTLS
+
+# Backends (Wikipedia/arXiv/BibTeX wrappers, vector store + summarizer LLM) are
+# imported on first use, so importing the registry stays cheap.
 TOOLS = [
-    Tool(
+    ToolSpec(
         name="wikipedia_search",
-        func=wiki_search,
+        func=LazyFunc("tools.wiki_tool", "wiki_search"),
         description="Search Wikipedia and return a summary and source URL."
     ),
-    Tool(
+    ToolSpec(
         name="agnikul_rag_search",
-        func=rag_search,
+        func=LazyFunc("tools.rag_tool", "rag_search"),
         description="Search internal Agnikul dataset for relevant passages and return them with sources."
     ),
-    Tool(
+    ToolSpec(
         name="duckduckgo_search",
-        func=ddg_search,
+        func=LazyFunc("tools.duckduckgo_tool", "ddg_search"),
         description="Use this tool to search the web using DuckDuckGo. Best for real-time information."
     ),
-    Tool(
+    ToolSpec(
         name="bibtex",
-        func=parse_bibtex_tool,
-        description="Parse a .bib file or raw BibTeX text and return entries as JSON (input: path or raw content)."
+        func=LazyFunc("tools.bibtex_tool", "parse_bibtex_tool"),
+        description="Search a .bib file or raw BibTeX. Input: '<path.bib> [query]' or '<raw BibTeX> :: [query]'; "
+                    "query terms: key:<citekey> author:<name> year:<yyyy> or year:<from>-<to> title:<word> "
+                    "limit:<n>, or plain words. Returns matching entries, one line each."
     ),
-    Tool(
-        name="arxiv_search",                  
-        func=arxiv_search,
+    ToolSpec(
+        name="arxiv_search",
+        func=LazyFunc("tools.arxiv_tool", "arxiv_search"),
         description="Search arXiv for academic papers and return summaries of top results."
     )
 ]
+
+# Lazy backends by tool name (captured before cache wrapping)
+_BACKENDS = {t.name: t.func for t in TOOLS}
+
+# Network tools go through the shared result cache (see tools/cache.py)
+TOOLS = [cached_tool(t, CACHE_TTLS[t.name]) if t.name in CACHE_TTLS else t for t in TOOLS]
+
+
+def warm_up(names=None, background: bool = False):
+    """
+    Build tool backends ahead of the first request.
+    names: tool names to load (default: all). background=True returns immediately.
+    """
+    def _load():
+        for name, func in _BACKENDS.items():
+            if names and name not in names:
+                continue
+            try:
+                func.resolve()
+            except Exception as e:
+                print(f" Warm-up of tool '{name}' failed: {e}")
+
+    if not background:
+        _load()
+        return None
+    t = threading.Thread(target=_load, name="tools-warm-up", daemon=True)
+    t.start()
+    return t
+
+
+def loaded_backends() -> dict:
+    """Which tool backends have been imported so far."""
+    return {name: func.loaded for name, func in _BACKENDS.items()}
+
+
+def override_backend(name: str, func):
+    """Swap a tool's backend (e.g. a deterministic fake); caching/wrappers stay in place."""
+    _BACKENDS[name].override(func)
@@ -1,23 +1,39 @@
 # tools/wiki_tool.py
-from langchain_community.utilities import WikipediaAPIWrapper
+import os
+
+from tools.http_transport import transport
+from tools.cache import ToolError
+
+WIKI_API_URL = os.getenv("WIKI_API_URL", "https://en.wikipedia.org/w/api.php")
+TOP_K_RESULTS = 2
+DOC_CONTENT_CHARS_MAX = 4000
 
-# Create a singleton wrapper so we don't recreate it on every call
-_wiki_wrapper = WikipediaAPIWrapper(
-    top_k_results=2,
-    doc_content_chars_max=4000
-)
 
 def wiki_search(query: str) -> str:
     """
     Run a Wikipedia lookup and return a cleaned string.
-    Uses langchain_community.utilities.WikipediaAPIWrapper under the hood.
+    One MediaWiki API request (search + intro extracts + URLs) over the shared
+    HTTP pool, formatted like WikipediaAPIWrapper ("Page: ...\\nSummary: ...").
     Returns a short summary or an error message.
     """
     try:
-        # WikipediaAPIWrapper exposes a run() method that returns text
-        result = _wiki_wrapper.run(query)
-        if not result:
+        params = {
+            "action": "query", "format": "json", "formatversion": "2",
+            "generator": "search", "gsrsearch": query[:300], "gsrlimit": TOP_K_RESULTS,
+            "prop": "extracts|info", "exintro": "1", "explaintext": "1", "exlimit": "max", "inprop": "url",
+        }
+        resp = transport.get(WIKI_API_URL, params=params)
+        resp.raise_for_status()
+        data = resp.json()
+        if "error" in data:
+            return ToolError(f"Wikipedia lookup error: {data['error'].get('info', data['error'])}")
+        pages = sorted(data.get("query", {}).get("pages", []), key=lambda p: p.get("index", 0))
+        summaries = [
+            f"Page: {p['title']}\nSummary: {p.get('extract', '').strip()}\nURL: {p.get('fullurl', '')}"
+            for p in pages if p.get("extract")
+        ]
+        if not summaries:
             return "No Wikipedia results found."
-        return result
+        return "\n\n".join(summaries)[:DOC_CONTENT_CHARS_MAX]
     except Exception as e:
-        return f"Wikipedia lookup error: {e}"
+        return ToolError(f"Wikipedia lookup error: {e}")
@@ -0,0 +1,256 @@
+# tracing.py
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# -------------------------------
+# METRICS (Prometheus text format, no client library needed)
+# -------------------------------
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _label_str(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = ()):
+        self.name, self.doc, self.labels = name, doc, labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labels, key)} {v}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name, self.doc, self.labels = name, doc, labels
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[tuple, list] = {}   # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            state = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            idx = bisect.bisect_left(self.buckets, value)
+            if idx < len(self.buckets):
+                state[idx] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, state):
+                    cumulative += n
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_label_str(self.labels, key, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labels, key, le)} {state[-1]}")
+                lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {state[-2]}")
+                lines.append(f"{self.name}_count{_label_str(self.labels, key)} {state[-1]}")
+        return lines
+
+
+class Gauge:
+    """Gauge read from a callback at scrape time (e.g. pool idle workers)."""
+
+    def __init__(self, name: str, doc: str, fn: Callable[[], float]):
+        self.name, self.doc, self.fn = name, doc, fn
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self.fn())
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name: str, doc: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._get(Counter, name, doc, labels)
+
+    def histogram(self, name: str, doc: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, doc, labels, buckets)
+
+    def gauge(self, name: str, doc: str, fn: Callable[[], float]) -> Gauge:
+        return self._get(Gauge, name, doc, fn)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+REQUESTS = metrics.counter("agent_requests_total", "Agent API requests by endpoint and outcome.", ("endpoint", "status"))
+REQUEST_SECONDS = metrics.histogram("agent_request_duration_seconds", "End-to-end request time.", ("endpoint",))
+STAGE_SECONDS = metrics.histogram("agent_stage_duration_seconds",
+                                  "Time per stage: route, llm, tool, http, retrieval, summarize, queue_wait, run.", ("stage",))
+TOOL_CALLS = metrics.counter("agent_tool_calls_total",
+                             "Tool executions by tool and outcome (ok/timeout/error, circuit_open = skipped, "
+                             "cancelled = a hedge answered first, session = reused from an earlier turn).",
+                             ("tool", "status"))
+TOOL_SECONDS = metrics.histogram("agent_tool_duration_seconds", "Tool call time by tool.", ("tool",))
+TOOL_HEDGES = metrics.counter("agent_tool_hedges_total", "Hedge executions started for slow or failing tools, "
+                              "by hedge tool and outcome.", ("tool", "status"))
+LLM_CALLS = metrics.counter("agent_llm_calls_total", "LLM generations.")
+LLM_PROMPT_CHARS = metrics.counter("agent_llm_prompt_chars_total", "Characters sent to the LLM.")
+LLM_RESPONSE_CHARS = metrics.counter("agent_llm_response_chars_total", "Characters generated by the LLM.")
+LLM_PROMPT_TOKENS = metrics.counter("agent_llm_prompt_tokens_total",
+                                    "Prompt tokens the LLM evaluated (cached prefix excluded).")
+LLM_COMPLETION_TOKENS = metrics.counter("agent_llm_completion_tokens_total", "Tokens generated by the LLM.")
+ROUTER_DECISIONS = metrics.counter("agent_router_decisions_total",
+                                   "Tool router outcomes: the routed tool, or llm when it deferred to the LLM.",
+                                   ("outcome",))
+HTTP_REQUESTS = metrics.counter("agent_http_requests_total", "Outbound HTTP requests by host and final status.",
+                                ("host", "status"))
+HTTP_SECONDS = metrics.histogram("agent_http_request_duration_seconds",
+                                 "Outbound HTTP request time, retries and throttle waits included.", ("host",))
+HTTP_RETRIES = metrics.counter("agent_http_retries_total", "Outbound HTTP retries by host and reason.",
+                               ("host", "reason"))
+HTTP_CONNECTIONS = metrics.counter("agent_http_connections_opened_total",
+                                   "TCP connections the shared HTTP pool opened, by host (keep-alive misses).",
+                                   ("host",))
+HTTP_THROTTLED = metrics.counter("agent_http_throttled_total",
+                                 "Outbound requests held back: concurrency/rate_limit (our limits), upstream "
+                                 "(429/503 from the host), refused (over HTTP_MAX_WAIT).", ("host", "reason"))
+
+
+# -------------------------------
+# PER-REQUEST TRACES
+# -------------------------------
+class Trace:
+    """Spans recorded during one request (shared by the threads working on it)."""
+
+    def __init__(self, request_id: Optional[str] = None):
+        self.request_id = request_id
+        self.started = time.time()
+        self.spans: List[dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, duration: float, start: Optional[float] = None, **attrs):
+        start = time.time() - duration if start is None else start
+        with self._lock:
+            self.spans.append({"name": name, "start": round(start - self.started, 4),
+                               "duration": round(duration, 4), **attrs})
+
+    def breakdown(self) -> dict:
+        """Seconds per stage name, summed over spans."""
+        totals = {}
+        with self._lock:
+            for s in self.spans:
+                totals[s["name"]] = round(totals.get(s["name"], 0.0) + s["duration"], 4)
+        return totals
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        return {"request_id": self.request_id, "stages": self.breakdown(), "spans": spans}
+
+
+_current = contextvars.ContextVar("agent_trace", default=None)
+
+
+@contextmanager
+def start_trace(request_id: Optional[str] = None):
+    """Make a new Trace current for this context (copied into tool threads)."""
+    trace = Trace(request_id)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Time a block and record it on the current trace (if any). The yielded dict
+    can be filled with attributes (sizes, status) before the block ends.
+    """
+    info = dict(attrs)
+    start = time.time()
+    try:
+        yield info
+    except BaseException as e:
+        info.setdefault("status", "error")
+        info.setdefault("error", type(e).__name__)
+        raise
+    finally:
+        trace = _current.get()
+        if trace is not None:
+            trace.add(name, time.time() - start, start=start, **info)
+
+
+def record_span(name: str, duration: float, **attrs):
+    """Record an already-measured span on the current trace."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, duration, **attrs)
+
+
+def observe_spans(spans: List[dict]):
+    """Feed finished spans (possibly from a worker process) into the metrics."""
+    for s in spans:
+        STAGE_SECONDS.observe(s["duration"], stage=s["name"])
+        if s["name"] == "tool":
+            TOOL_CALLS.inc(tool=s.get("tool", ""), status=s.get("status", "ok"))
+            TOOL_SECONDS.observe(s["duration"], tool=s.get("tool", ""))
+            if s.get("hedge"):
+                TOOL_HEDGES.inc(tool=s.get("tool", ""), status=s.get("status", "ok"))
+        elif s["name"] == "llm":
+            LLM_CALLS.inc()
+            LLM_PROMPT_CHARS.inc(s.get("prompt_chars", 0))
+            LLM_RESPONSE_CHARS.inc(s.get("response_chars", 0))
+            LLM_PROMPT_TOKENS.inc(s.get("prompt_tokens") or 0)
+            LLM_COMPLETION_TOKENS.inc(s.get("completion_tokens") or 0)
+        elif s["name"] == "route":
+            ROUTER_DECISIONS.inc(outcome=s.get("tool") if s.get("routed") else "llm")
+        elif s["name"] == "http":
+            host = s.get("host", "")
+            HTTP_REQUESTS.inc(host=host, status=s.get("status", ""))
+            HTTP_SECONDS.observe(s["duration"], host=host)
+            if s.get("connections"):
+                HTTP_CONNECTIONS.inc(s["connections"], host=host)
+            for reason in s.get("retried", ()):
+                HTTP_RETRIES.inc(host=host, reason=reason)
+            for reason in s.get("throttled", ()):
+                HTTP_THROTTLED.inc(host=host, reason=reason)
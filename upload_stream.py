@@ -0,0 +1,140 @@
+# upload_stream.py
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+try:
+    from python_multipart.exceptions import FormParserError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:   # python-multipart < 0.0.13
+    from multipart.exceptions import FormParserError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+
+class UploadTooLarge(Exception):
+    """The upload passed its size limit (raised while it is still being received)."""
+
+
+class UploadInvalid(Exception):
+    """The body is not a multipart/form-data form with one file part."""
+
+
+class MultipartUpload:
+    """
+    Single-pass reader for a multipart/form-data upload, fed straight from the
+    request body stream. The file part goes to `path` and is hashed (sha256) as
+    it arrives, in writes of up to `chunk_bytes` off the event loop; other form
+    fields are kept as strings. Reading stops with UploadTooLarge as soon as the
+    file passes max_bytes or the whole body passes max_bytes + overhead, so an
+    oversized upload is never received in full, chunked transfer encoding included.
+    """
+
+    def __init__(self, content_type: str, path: Path, max_bytes: int, overhead: int,
+                 chunk_bytes: int = 1024 * 1024):
+        kind, params = parse_options_header(content_type)
+        if kind.lower() != b"multipart/form-data" or not params.get(b"boundary"):
+            raise UploadInvalid("Expected a multipart/form-data body.")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_body = max_bytes + overhead
+        self.chunk_bytes = chunk_bytes
+        self.filename: Optional[str] = None   # as sent by the client (may be "")
+        self.fields: Dict[str, str] = {}
+        self.size = 0                          # bytes of the file part
+        self.received = 0                      # bytes of the whole body
+        self._digest = hashlib.sha256()
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+        self._part: Optional[dict] = None
+        self._header_name = self._header_value = b""
+        self._ended = False
+        self._parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_end": self._on_end,
+        })
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    async def read(self, stream: AsyncIterator[bytes]):
+        """Consume the body; the file is complete on `path` when this returns."""
+        with self.path.open("wb") as out:
+            async for chunk in stream:
+                self.received += len(chunk)
+                if self.received > self.max_body:
+                    raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes.")
+                self._write(chunk)
+                if self._pending_bytes >= self.chunk_bytes:
+                    await asyncio.to_thread(self._flush, out)
+            self._write(None)
+            await asyncio.to_thread(self._flush, out)
+        if not self._ended:
+            raise UploadInvalid("Truncated multipart body.")
+        if self.filename is None:
+            raise UploadInvalid("Missing file part.")
+
+    def _write(self, chunk: Optional[bytes]):
+        """Feed the parser (None = end of body); malformed bodies raise UploadInvalid."""
+        try:
+            if chunk is None:
+                self._parser.finalize()
+            else:
+                self._parser.write(chunk)
+        except FormParserError as e:
+            raise UploadInvalid(f"Malformed multipart body: {e}") from e
+
+    def _flush(self, out):
+        data = b"".join(self._pending)
+        self._pending, self._pending_bytes = [], 0
+        self._digest.update(data)
+        out.write(data)
+
+    # ---- parser callbacks (run inside parser.write) ----
+    def _on_part_begin(self):
+        self._part = {"headers": {}, "name": None, "file": False, "data": bytearray()}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._part["headers"][self._header_name.lower()] = self._header_value
+        self._header_name = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._part["headers"].get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise UploadInvalid('Form part without a Content-Disposition "name".')
+        self._part["name"] = options[b"name"].decode("utf-8", "replace")
+        if b"filename" in options:
+            if self.filename is not None:
+                raise UploadInvalid("Only one file per upload.")
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            self._part["file"] = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if not self._part["file"]:
+            self._part["data"] += data[start:end]
+            return
+        self.size += end - start
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes.")
+        self._pending.append(data[start:end])
+        self._pending_bytes += end - start
+
+    def _on_part_end(self):
+        if not self._part["file"]:
+            self.fields[self._part["name"]] = self._part["data"].decode("utf-8", "replace")
+
+    def _on_end(self):
+        self._ended = True
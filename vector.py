@@ -1,68 +1,98 @@
-# vector.py
-import os
-import pandas as pd
-
-# LangChain-style imports
-from langchain_ollama import OllamaEmbeddings
-from langchain_chroma import Chroma
-from langchain_core.documents import Document
-
-# Load dataset (expects dataset.csv in repo root)
-df = pd.read_csv("dataset.csv", quotechar='"', escapechar='\\')
-
-# Embedding model (Ollama embeddings running locally)
-embeddings = OllamaEmbeddings(
-    model="mxbai-embed-large"
-    )
-
-db_location = "./chroma_langchain_db"
-add_documents = not os.path.exists(db_location)
-
-# Prepare documents list if first run
-documents = []
-ids = []
-
-if add_documents:
-    for i, row in df.iterrows():
-        # combine all columns as a single text block
-        combined_text = (
-            f"Topic: {row.get('Topic','')}\n"
-            f"Subtopic: {row.get('Subtopic','')}\n"
-            f"Detail: {row.get('Detail','')}\n"
-            f"Date: {row.get('Date','')}\n"
-            f"Source: {row.get('Source','')}"
-        )
-
-        doc = Document(
-            page_content=combined_text,
-            metadata={
-                "topic": row.get("Topic", ""),
-                "subtopic": row.get("Subtopic", ""),
-                "date": row.get("Date", ""),
-                "source": row.get("Source", "")
-            }
-        )
-        documents.append(doc)
-        ids.append(str(i))
-
-# Create / Load Chroma DB
-# Note: Chroma constructor parameters may vary by langchain version;
-# this pattern should work for modern LangChain where Chroma accepts persist_directory & embedding_function.
-vector_store = Chroma(
-    persist_directory=db_location,
-    embedding_function=embeddings,
-    collection_name="agnikul_data"
-)
-
-# Only add documents on first run
-if add_documents and documents:
-    vector_store.add_documents(documents=documents, ids=ids)
-    # ensure persistence
-    try:
-        vector_store.persist()
-    except Exception:
-        # some Chroma wrappers auto-persist; ignore if not available
-        pass
-
-# Retriever with top-k results
-retriever = vector_store.as_retriever(search_kwargs={"k": 5})
+# vector.py
+import os
+import hashlib
+
+# LangChain-style imports
+from langchain_ollama import OllamaEmbeddings
+
+from ingest import sync_dataset, read_generation, reload_indexes, MANIFEST_NAME
+from embedding_service import CachedEmbeddings
+from bm25_index import BM25Index
+
+# Dataset (expects dataset.csv in repo root); streamed by ingest.sync_dataset
+DATASET_PATH = "dataset.csv"
+
+_version_cache = {}
+
+
+def dataset_version(path: str = DATASET_PATH) -> str:
+    """Content hash of the dataset file (recomputed only when mtime/size change)."""
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _version_cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    _version_cache[path] = (stamp, h.hexdigest())
+    return _version_cache[path][1]
+
+# Embedding model (Ollama embeddings running locally), behind the shared
+# batched + disk-cached embedding service (see embedding_service.py)
+EMBED_MODEL = "mxbai-embed-large"
+embeddings = CachedEmbeddings(
+    OllamaEmbeddings(model=EMBED_MODEL),
+    model_name=EMBED_MODEL,
+)
+
+# Vector backend: "chroma" (default) or "numpy" (in-process memory-mapped index, see numpy_index.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+
+if VECTOR_BACKEND == "numpy":
+    db_location = "./numpy_index"
+else:
+    db_location = "./chroma_langchain_db"
+
+# Generation the stores below are loaded at; pool workers reload when it changes.
+# Read first: another process may rewrite the indexes while these load (see sync_dataset).
+_generation = read_generation(db_location)
+
+if VECTOR_BACKEND == "numpy":
+    from numpy_index import NumpyVectorStore
+
+    vector_store = NumpyVectorStore(path=db_location, embedding_function=embeddings)
+else:
+    from langchain_chroma import Chroma
+
+    # Create / Load Chroma DB
+    # Note: Chroma constructor parameters may vary by langchain version;
+    # this pattern should work for modern LangChain where Chroma accepts persist_directory & embedding_function.
+    vector_store = Chroma(
+        persist_directory=db_location,
+        embedding_function=embeddings,
+        collection_name="agnikul_data"
+    )
+
+# Lexical (BM25) index over the same documents, used for hybrid retrieval in rag_tool
+lexical_index = BM25Index(path=os.path.join(db_location, "bm25_index.pkl"))
+
+# Incremental ingestion: only new/changed rows are embedded, removed rows are deleted,
+# and an unchanged dataset.csv is a no-op (see ingest.py)
+_ingest_stats = sync_dataset(
+    DATASET_PATH,
+    vector_store,
+    manifest_path=os.path.join(db_location, MANIFEST_NAME),
+    dataset_version=dataset_version(),
+    lexical_index=lexical_index,
+    loaded_generation=_generation,
+)
+if not _ingest_stats["skipped"]:
+    print(f" Ingest: {_ingest_stats}")
+
+# Retriever with top-k results
+retriever = vector_store.as_retriever(search_kwargs={"k": 5})
+
+# Uploads are ingested by the API process; pool workers pick them up here
+_generation = read_generation(db_location)   # the stores are current as of the sync
+
+
+def refresh_indexes():
+    """Reload the lexical index (and numpy vectors) if another process wrote to them. Cheap when unchanged."""
+    global _generation
+    current = read_generation(db_location)
+    if current == _generation:
+        return
+    if reload_indexes(vector_store, lexical_index):
+        _generation = current
@@ -0,0 +1,46 @@
+# worker_node.py
+#
+#   JOB_STORE=redis://queue-host:6379/0 python worker_node.py [--concurrency 4] [--drain 30]
+#
+# Agent worker node without the HTTP API: claims jobs from the shared job store
+# (jobstore.py) that any API replica accepted, runs them on a local warm worker
+# pool and stores the results, which every replica can then serve. Run one per
+# host (or more); API replicas with JOB_STORE_WORKER=off only accept jobs.
+# SIGTERM / Ctrl-C stop claiming, wait up to --drain seconds for running jobs,
+# then hand the unfinished ones back to the queue.
+import os
+import signal
+import argparse
+import threading
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Agent worker node for a shared JOB_STORE.")
+    ap.add_argument("--store", default=os.getenv("JOB_STORE", ""),
+                    help="job store url: sqlite:///jobs.sqlite3 or redis://host:port/db (default: $JOB_STORE)")
+    ap.add_argument("--concurrency", type=int, help="jobs run at once (default: JOB_CONCURRENCY)")
+    ap.add_argument("--drain", type=float, default=30.0, help="seconds to let running jobs finish on shutdown")
+    args = ap.parse_args()
+    if not args.store:
+        ap.error("set JOB_STORE or pass --store")
+
+    # api reads these at import time
+    os.environ["JOB_STORE"] = args.store
+    os.environ["JOB_STORE_WORKER"] = "on"
+    os.environ.setdefault("TOOLS_WARM_UP", "off")   # tools are loaded by the pool's workers
+    if args.concurrency:
+        os.environ["JOB_CONCURRENCY"] = str(args.concurrency)
+        os.environ.setdefault("AGENT_POOL_SIZE", str(args.concurrency))
+    import api
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    api.agent_pool.start()
+    api.job_queue.start()
+    try:
+        while not stop.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    print(f" Worker node stopping (waiting up to {args.drain:g}s for running jobs).")
+    api.job_queue.shutdown(drain=args.drain)
+    api.agent_pool.shutdown()
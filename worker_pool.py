@@ -0,0 +1,285 @@
+# worker_pool.py
+import os
+import time
+import queue
+import threading
+import traceback
+import multiprocessing
+from typing import Callable, Optional
+
+from tracing import metrics
+
+# -------------------------------
+# CONFIG (override with env vars)
+# -------------------------------
+POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", "4"))                    # warm worker processes
+POOL_MAX_REQUESTS = int(os.getenv("AGENT_POOL_MAX_REQUESTS", "100"))  # recycle a worker after N requests (0 = never)
+POOL_MAX_QUEUE = int(os.getenv("AGENT_POOL_MAX_QUEUE", "32"))         # requests allowed to wait for a free worker
+CANCEL_POLL_SECONDS = 0.1   # how often a cancellable request checks its cancel event
+# Workers must not be forked from the API process directly: by then it runs threads
+# (uvicorn, warm-up, executors) and holds HTTP connections that a plain fork would copy.
+POOL_START_METHOD = os.getenv(
+    "AGENT_POOL_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn",
+)
+
+WORKER_SPAWNS = metrics.counter("agent_worker_spawns_total",
+                                "Worker processes started, by reason (start/timeout/cancel/crash/recycle/warmup_failed).",
+                                ("reason",))
+WORKER_WARMUP_SECONDS = metrics.histogram("agent_worker_warmup_seconds",
+                                          "Process start + initializer time until a worker reports ready.")
+
+
+def _worker_main(target: Callable, initializer: Optional[Callable], conn):
+    """
+    Worker process loop: warm up once, report ready, then serve payloads
+    from the pipe until the parent sends None (or goes away).
+    """
+    if initializer is not None:
+        try:
+            initializer()
+        except Exception:
+            traceback.print_exc()
+    conn.send("ready")
+
+    while True:
+        try:
+            payload = conn.recv()
+        except (EOFError, OSError):
+            break
+        if payload is None:
+            break
+        try:
+            conn.send({"ok": True, "result": target(payload)})
+        except Exception:
+            conn.send({"ok": False, "error": traceback.format_exc()})
+
+
+class _Worker:
+    """One pre-started process plus the parent end of its pipe."""
+
+    def __init__(self, ctx, target: Callable, initializer: Optional[Callable], name: str):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(target, initializer, child_conn),
+            name=name,
+            daemon=True,
+        )
+        self.started = time.time()
+        self.process.start()
+        child_conn.close()
+        self.served = 0
+
+    def stop(self, kill: bool = False):
+        if kill:
+            if self.process.is_alive():
+                self.process.terminate()
+        else:
+            try:
+                self.conn.send(None)
+            except Exception:
+                pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=1)
+        self.conn.close()
+
+
+class PoolSaturated(Exception):
+    """Raised when the pool's wait queue is already at POOL_MAX_QUEUE."""
+
+
+class WorkerPool:
+    """
+    Fixed-size pool of warm worker processes.
+
+    A worker joins the idle queue only after its initializer has run, so
+    requests never pay for warm-up. Each request is sent to an idle worker
+    over its pipe. A worker that goes over the request timeout is killed and
+    replaced; a worker that has served
+    `max_requests` payloads is retired and replaced. At most `max_queue`
+    requests may wait for a free worker; beyond that `submit` raises
+    PoolSaturated.
+    """
+
+    def __init__(
+        self,
+        target: Callable,
+        size: int = POOL_SIZE,
+        max_requests: int = POOL_MAX_REQUESTS,
+        max_queue: int = POOL_MAX_QUEUE,
+        initializer: Optional[Callable] = None,
+        name: str = "agent-worker",
+        start_method: str = POOL_START_METHOD,
+    ):
+        self.target = target
+        self.size = max(1, size)
+        self.max_requests = max_requests
+        self.max_queue = max_queue
+        self.initializer = initializer
+        self.name = name
+
+        self._ctx = multiprocessing.get_context(start_method)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._spawned = 0
+        self._started = False
+
+    # ---- lifecycle ----
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.size):
+            self._spawn("start")
+
+    def shutdown(self):
+        with self._lock:
+            self._started = False
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.stop()
+
+    def _spawn(self, reason: str):
+        """Start a worker; it is added to the idle queue once it reports ready."""
+        WORKER_SPAWNS.inc(reason=reason)
+        with self._lock:
+            self._spawned += 1
+            n = self._spawned
+        worker = _Worker(self._ctx, self.target, self.initializer, f"{self.name}-{n}")
+        threading.Thread(target=self._await_ready, args=(worker,), name=f"{self.name}-{n}-ready",
+                         daemon=True).start()
+
+    def _await_ready(self, worker: _Worker):
+        try:
+            worker.conn.recv()
+        except (EOFError, OSError):
+            print(f" Worker {worker.process.name} died during warm-up; starting another.")
+            worker.stop(kill=True)
+            time.sleep(1)
+            if self._started:
+                self._spawn("warmup_failed")
+            return
+        WORKER_WARMUP_SECONDS.observe(time.time() - worker.started)
+        if self._started:
+            self._idle.put(worker)
+        else:
+            worker.stop()
+
+    def _replace(self, worker: _Worker, kill: bool, reason: str):
+        worker.stop(kill=kill)
+        if self._started:
+            self._spawn(reason)
+
+    # ---- stats ----
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": self._idle.qsize(),
+                "waiting": self._waiting,
+                "max_queue": self.max_queue,
+                "max_requests": self.max_requests,
+                "spawned": self._spawned,
+            }
+
+    # ---- requests ----
+    def _get_idle(self, timeout: float, cancel: Optional[threading.Event]) -> Optional[_Worker]:
+        """Next idle worker, or None on timeout / cancel."""
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0 or (cancel is not None and cancel.is_set()):
+                return None
+            try:
+                return self._idle.get(timeout=remaining if cancel is None else min(remaining, CANCEL_POLL_SECONDS))
+            except queue.Empty:
+                continue
+
+    @staticmethod
+    def _poll(worker: _Worker, timeout: float, cancel: Optional[threading.Event]) -> bool:
+        """True once the worker has replied; False on timeout / cancel."""
+        if cancel is None:
+            return worker.conn.poll(timeout)
+        deadline = time.time() + timeout
+        while not cancel.is_set():
+            remaining = deadline - time.time()
+            if worker.conn.poll(max(0.0, min(remaining, CANCEL_POLL_SECONDS))):
+                return True
+            if remaining <= 0:
+                return False
+        return False
+
+    def submit(self, payload, timeout: float, cancel: Optional[threading.Event] = None) -> dict:
+        """
+        Run `target(payload)` on a warm worker.
+
+        Returns a dict with "status" ("ok" | "error" | "timeout" | "cancelled"),
+        "result" or "error", and "queue_wait_seconds" / "run_seconds". The
+        timeout covers queue wait + run time. Setting `cancel` stops the wait;
+        a worker already running the payload is killed and replaced.
+        """
+        if not self._started:
+            self.start()
+
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                raise PoolSaturated(f"{self._waiting} requests already waiting for a worker.")
+            self._waiting += 1
+
+        enqueued = time.time()
+        try:
+            worker = self._get_idle(timeout, cancel)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if worker is None:
+            cancelled = cancel is not None and cancel.is_set()
+            return {
+                "status": "cancelled" if cancelled else "timeout",
+                "error": "Cancelled while waiting for a worker." if cancelled
+                else f"No worker became free within {timeout} seconds.",
+                "queue_wait_seconds": round(time.time() - enqueued, 4),
+                "run_seconds": 0.0,
+            }
+
+        queue_wait = time.time() - enqueued
+        remaining = max(0.0, timeout - queue_wait)
+        timing = {"queue_wait_seconds": round(queue_wait, 4)}
+
+        run_start = time.time()
+        try:
+            worker.conn.send(payload)
+            if not self._poll(worker, remaining, cancel):
+                timing["run_seconds"] = round(time.time() - run_start, 4)
+                if cancel is not None and cancel.is_set():
+                    self._replace(worker, kill=True, reason="cancel")
+                    return {"status": "cancelled", "error": "Cancelled while running.", **timing}
+                # Over budget: kill the worker, start a fresh one in its place
+                self._replace(worker, kill=True, reason="timeout")
+                return {"status": "timeout", "error": f"Agent timed out after {timeout} seconds.", **timing}
+            reply = worker.conn.recv()
+        except (EOFError, OSError, BrokenPipeError) as e:
+            # Worker died mid-request
+            self._replace(worker, kill=True, reason="crash")
+            timing["run_seconds"] = round(time.time() - run_start, 4)
+            return {"status": "error", "error": f"Worker process failed: {e!r}", **timing}
+
+        timing["run_seconds"] = round(time.time() - run_start, 4)
+
+        worker.served += 1
+        if self.max_requests and worker.served >= self.max_requests:
+            self._replace(worker, kill=False, reason="recycle")
+        else:
+            self._idle.put(worker)
+
+        if reply.get("ok"):
+            return {"status": "ok", "result": reply.get("result"), **timing}
+        return {"status": "error", "error": reply.get("error"), **timing}